@@ -1,9 +1,13 @@
+import os
 import sys
 import serial
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel
 from PySide6.QtCore import Qt, QTimer
 from pynput.keyboard import Controller, Key
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Project Day 2"))
+from scan_engine import ScanEngine, EMIT
+
 # ----------------- CONFIG -----------------
 SERIAL_PORT = "COM3"   # Change this to your actual COM port
 BAUD_RATE = 115200
@@ -19,6 +23,9 @@ keyboard_rows = [
 
 kb = Controller()
 
+# Row 0 (digits) is skipped in the row scan; only codes 1 and 2 are used.
+SCAN = ScanEngine(keyboard_rows, first_row=1, allow_back=False)
+
 class CenteredBlinkKeyboard(QWidget):
     def __init__(self, port_name, baud_rate):
         super().__init__()
@@ -31,9 +38,7 @@ class CenteredBlinkKeyboard(QWidget):
         print(f"Connected to {self.serial.name}")
 
         self.current_word = ""
-        self.row = 1  # start scanning top letters
-        self.col = 0
-        self.selecting_row = True
+        self.scan = SCAN.new_state()  # start scanning top letters
 
         self.layout = QVBoxLayout()
         self.layout.setContentsMargins(20, 20, 20, 20)
@@ -84,48 +89,36 @@ class CenteredBlinkKeyboard(QWidget):
             print("Serial error:", e)
 
     def process_blink(self, blink):
-        if blink == 1:  # advance
-            if self.selecting_row:
-                self.row = (self.row + 1) % len(keyboard_rows)
-                if self.row == 0:
-                    self.row = 1
-            else:
-                self.col = (self.col + 1) % len(keyboard_rows[self.row])
-        elif blink == 2:  # confirm
-            if self.selecting_row:
-                self.selecting_row = False
-                self.col = 0
-            else:
-                item = keyboard_rows[self.row][self.col]
-                if item == "SPACE":
-                    self.current_word += " "
-                    kb.press(Key.space); kb.release(Key.space)
-                elif item == "DEL" and self.current_word:
-                    self.current_word = self.current_word[:-1]
-                    kb.press(Key.backspace); kb.release(Key.backspace)
-                elif item == "ENTER":
-                    print("Final word:", self.current_word)
-                    self.current_word = ""
-                    kb.press(Key.enter); kb.release(Key.enter)
-                else:
-                    self.current_word += item
-                    kb.press(item.lower()); kb.release(item.lower())
-                # reset scanning
-                self.selecting_row = True
-                self.row = 1
-                self.col = 0
-
+        action = SCAN.step(self.scan, blink)
+        if action.kind == EMIT:
+            self.type_key(action.key)
         self.update_display()
 
+    def type_key(self, item):
+        if item == "SPACE":
+            self.current_word += " "
+            kb.press(Key.space); kb.release(Key.space)
+        elif item == "DEL" and self.current_word:
+            self.current_word = self.current_word[:-1]
+            kb.press(Key.backspace); kb.release(Key.backspace)
+        elif item == "ENTER":
+            print("Final word:", self.current_word)
+            self.current_word = ""
+            kb.press(Key.enter); kb.release(Key.enter)
+        elif item != "DEL":
+            self.current_word += item
+            kb.press(item.lower()); kb.release(item.lower())
+
     def update_display(self):
         self.word_label.setText(f"Current word: {self.current_word}")
+        scan = self.scan
         for r, row_items in enumerate(self.labels):
             for c, lbl in enumerate(row_items):
                 base_style = "color: white; font-size: 20px; border-radius: 8px;"
-                if self.selecting_row and r == self.row:
+                if scan.selecting_row and r == scan.row:
                     bg = "#222" if r != 0 else "#333"
                     lbl.setStyleSheet(f"{base_style} border: 2px solid #00f; background-color: {bg};")
-                elif not self.selecting_row and r == self.row and c == self.col:
+                elif not scan.selecting_row and r == scan.row and c == scan.col:
                     bg = "#008000" if r != 0 else "#556B2F"
                     lbl.setStyleSheet(f"{base_style} border: 2px solid #0f0; background-color: {bg};")
                 else:
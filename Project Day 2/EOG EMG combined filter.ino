@@ -14,6 +14,22 @@ const float BlinkResetNegative   = -15;
 const unsigned long BLINK_DEBOUNCE_MS = 200;
 const unsigned long BLINK_SEQUENCE_TIMEOUT_MS = 1000;
 
+// Output format
+// 0: text lines ("code,emg"), 1: binary frames with every raw sample (see protocol.py)
+#define BINARY_PROTOCOL 0
+
+// Blink output
+// 0: one code per sequence, BLINK_SEQUENCE_TIMEOUT_MS after its first blink
+// 1: every blink as it is detected ("B,millis,emg" or FRAME_BLINK); the host
+//    groups them into codes with learned timing (blink_decoder.py)
+#define RAW_BLINKS 0
+
+// EMG level between codes, "E,emg" every EMG_REPORT_MS in text mode (0: off).
+// The host uses it for jaw-clench control (emg_control.py): set it to 50 to
+// use that with the text protocol. In binary mode the host works the level
+// out of the raw samples itself.
+#define EMG_REPORT_MS 0
+
 // ---------------- GLOBAL ----------------
 float eogEnvBuffer[ENVELOPE_WINDOW_SIZE] = {0};
 int eogEnvIndex = 0;
@@ -26,11 +42,56 @@ float emgEnvSum = 0;
 unsigned long lastBlinkTime = 0;
 unsigned long firstBlinkTime = 0;
 int blinkSequenceCount = 0;
+unsigned long lastEmgReport = 0;
 
 float eogBaseline = 0;
 bool eogCalibrated = false;
 unsigned long calibrationStart = 0;
 
+// ---------------- BINARY FRAMES ----------------
+// [A5 5A][seq lo][seq hi][type][len][payload...][sum1][sum2]
+// Fletcher-16 over seq..payload. Must match protocol.py.
+#define FRAME_SAMPLE 1
+#define FRAME_EVENT  2
+#define FRAME_TEXT   3
+#define FRAME_BLINK  4
+
+uint16_t frameSeq = 0;
+
+void sendFrame(uint8_t type, const uint8_t *payload, uint8_t len) {
+  uint8_t header[6] = { 0xA5, 0x5A, (uint8_t)(frameSeq & 0xFF), (uint8_t)(frameSeq >> 8), type, len };
+  uint16_t sum1 = 0, sum2 = 0;
+  for (int i = 2; i < 6; i++) { sum1 = (sum1 + header[i]) % 255; sum2 = (sum2 + sum1) % 255; }
+  for (int i = 0; i < len; i++) { sum1 = (sum1 + payload[i]) % 255; sum2 = (sum2 + sum1) % 255; }
+  uint8_t trailer[2] = { (uint8_t)sum1, (uint8_t)sum2 };
+  Serial.write(header, 6);
+  Serial.write(payload, len);
+  Serial.write(trailer, 2);
+  frameSeq++;
+}
+
+void sendSample(int eogRaw, int emgRaw) {
+  uint8_t p[4] = { (uint8_t)(eogRaw & 0xFF), (uint8_t)(eogRaw >> 8), (uint8_t)(emgRaw & 0xFF), (uint8_t)(emgRaw >> 8) };
+  sendFrame(FRAME_SAMPLE, p, 4);
+}
+
+void sendEvent(int code, float emgNormalized) {
+  uint16_t emg = (uint16_t)(max(emgNormalized, 0.0f) * 1000.0f + 0.5f);
+  uint8_t p[3] = { (uint8_t)code, (uint8_t)(emg & 0xFF), (uint8_t)(emg >> 8) };
+  sendFrame(FRAME_EVENT, p, 3);
+}
+
+void sendBlink(unsigned long ms, float emgNormalized) {
+  uint16_t emg = (uint16_t)(max(emgNormalized, 0.0f) * 1000.0f + 0.5f);
+  uint8_t p[6] = { (uint8_t)(ms & 0xFF), (uint8_t)(ms >> 8), (uint8_t)(ms >> 16), (uint8_t)(ms >> 24),
+                   (uint8_t)(emg & 0xFF), (uint8_t)(emg >> 8) };
+  sendFrame(FRAME_BLINK, p, 6);
+}
+
+void sendText(const char *text) {
+  sendFrame(FRAME_TEXT, (const uint8_t *)text, strlen(text));
+}
+
 // ---------------- FILTERS ----------------
 struct Biquad {
   float b0, b1, b2;
@@ -76,7 +137,11 @@ float calibrate(float env) {
     if (millis() - calibrationStart > 1000) {
       eogBaseline = sum / count;
       eogCalibrated = true;
+#if BINARY_PROTOCOL
+      sendText("EOG Calibration complete.");
+#else
       Serial.println("EOG Calibration complete.");
+#endif
     }
   }
   return env - eogBaseline;
@@ -104,40 +169,73 @@ void setup() {
   Serial.begin(115200);
   pinMode(EMG_PIN, INPUT);
   pinMode(EOG_PIN, INPUT);
+#if BINARY_PROTOCOL
+  sendText("EMG + EOG 4th-Order Butterworth Ready!");
+#else
   Serial.println("EMG + EOG 4th-Order Butterworth Ready!");
+#endif
 }
 
 // ---------------- LOOP ----------------
 void loop() {
   // --- EOG Processing ---
-  float eogRaw = (float)analogRead(EOG_PIN);
+  int eogAdc = analogRead(EOG_PIN);
+  float eogRaw = (float)eogAdc;
   float eogFiltered = HPFilter4th(eogBiquad1, eogBiquad2, eogRaw);
   float eogEnv = updateEnvelope(eogEnvBuffer, eogEnvIndex, eogEnvSum, eogFiltered);
   float eogAdjusted = calibrate(eogEnv);
 
   // --- EMG Processing ---
-  float emgRaw = (float)analogRead(EMG_PIN);
+  int emgAdc = analogRead(EMG_PIN);
+  float emgRaw = (float)emgAdc;
   float emgFiltered = HPFilter4th(emgBiquad1, emgBiquad2, emgRaw);
   float emgEnv = updateEnvelope(emgEnvBuffer, emgEnvIndex, emgEnvSum, emgFiltered);
   float emgNormalized = emgEnv / 1023.0;  // normalize to 0-1
 
+#if BINARY_PROTOCOL
+  sendSample(eogAdc, emgAdc);
+#endif
+
   // Blink detection
   if (eogCalibrated && detectBlink(eogAdjusted)) {
+#if RAW_BLINKS
+#if BINARY_PROTOCOL
+    sendBlink(lastBlinkTime, emgNormalized);
+#else
+    Serial.print("B,");
+    Serial.print(lastBlinkTime);         // detection time (ms)
+    Serial.print(",");
+    Serial.println(emgNormalized, 3);
+#endif
+#else
     if (blinkSequenceCount == 0) firstBlinkTime = millis();
     blinkSequenceCount++;
+#endif
   }
 
-  if (blinkSequenceCount > 0 && (millis() - firstBlinkTime) >= BLINK_SEQUENCE_TIMEOUT_MS) {
+  if (!RAW_BLINKS && blinkSequenceCount > 0 && (millis() - firstBlinkTime) >= BLINK_SEQUENCE_TIMEOUT_MS) {
     int blinksInSequence = blinkSequenceCount;
     blinkSequenceCount = 0;
 
     // Only send 1 or 2 blinks
     if (blinksInSequence == 2 || blinksInSequence == 3 || blinksInSequence == 4) {
+#if BINARY_PROTOCOL
+      sendEvent(blinksInSequence - 1, emgNormalized);
+#else
       Serial.print(blinksInSequence - 1);  // blink code
       Serial.print(",");
       Serial.println(emgNormalized, 3);    // normalized EMG
+#endif
     }
   }
 
+#if !BINARY_PROTOCOL && EMG_REPORT_MS > 0
+  if (millis() - lastEmgReport >= EMG_REPORT_MS) {
+    lastEmgReport = millis();
+    Serial.print("E,");
+    Serial.println(emgNormalized, 3);
+  }
+#endif
+
   delay(2);  // ~500 Hz
 }
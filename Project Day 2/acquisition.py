@@ -0,0 +1,359 @@
+import sys
+import time
+import signal
+import struct
+import argparse
+from multiprocessing import shared_memory, resource_tracker
+
+from recorder import Recorder, REC_SERIAL, REC_EVENT, REC_SAMPLES
+from blink_decoder import blink_line, parse_blink_line, RAW_PREFIX
+from emg_control import EMG_PREFIX, emg_line
+
+# -----------------------------
+# Shared-memory serial acquisition daemon
+#
+# One process owns the Arduino port, splits the byte stream into lines,
+# timestamps them and publishes fixed-size event records into a ring
+# buffer in shared memory. Any number of readers (Qt GUI, Streamlit,
+# loggers) attach by name and keep their own cursor, so a slow reader
+# never blocks the daemon or the other readers; it only loses the
+# oldest events once it falls a full ring behind.
+#
+# Layout:  [header][slot 0][slot 1]...[slot capacity-1]
+# Each slot carries its own sequence number (seqlock style): the writer
+# zeroes it, fills the payload and then stores seq = event index + 1,
+# so a reader can tell a committed slot from a half-written or
+# overwritten one without any lock.
+# -----------------------------
+
+MAGIC = b"BLNK"
+VERSION = 2
+DEFAULT_NAME = "blinkshift"
+DEFAULT_CAPACITY = 4096
+
+HEADER = struct.Struct("<4sIIIQ")         # magic, version, capacity, slot size, head
+SLOT = struct.Struct("<QdqiqfH58s")        # seq, wall time, monotonic ns, kind, code, emg, len, line
+HEAD_OFFSET = 16                           # byte offset of `head` inside HEADER
+SEQ = struct.Struct("<Q")
+
+KIND_CODE = 1   # blink code, optionally with the EMG level ("2" or "2,0.153")
+KIND_TEXT = 2   # anything else the firmware prints (banners, calibration messages)
+KIND_SAMPLE = 3 # raw sample from a binary stream: code = EOG ADC value, emg = EMG ADC value
+KIND_BLINK = 4  # one blink from RAW_BLINKS firmware ("B,<millis>,<emg>"): code = firmware millis()
+KIND_EMG = 5    # EMG level between codes ("E,<emg>", EMG_REPORT_MS)
+
+MAX_LINE = 58
+MAX_CODE = 2 ** 63 - 1          # largest code (or firmware millis) a slot holds
+MAX_EMG = 3.4028234663852886e38 # largest EMG level a slot holds (float32)
+
+
+def _fits(code, emg):
+    return 0 <= code <= MAX_CODE and (emg != emg or abs(emg) <= MAX_EMG)
+
+
+def parse_line(line):
+    """Return (kind, code, emg) for one decoded serial line. Anything that
+    does not parse, or does not fit a slot, is KIND_TEXT."""
+    blink = parse_blink_line(line)
+    if blink and _fits(*blink):
+        return KIND_BLINK, blink[0], blink[1]
+    if line.startswith(EMG_PREFIX):
+        try:
+            emg = float(line[len(EMG_PREFIX):])
+        except ValueError:
+            return KIND_TEXT, -1, float("nan")
+        if _fits(0, emg):
+            return KIND_EMG, -1, emg
+        return KIND_TEXT, -1, float("nan")
+    head, _, tail = line.partition(",")
+    if head.isdecimal():
+        emg = float("nan")
+        if tail:
+            try:
+                emg = float(tail)
+            except ValueError:
+                pass
+        try:
+            code = int(head)
+        except ValueError:
+            return KIND_TEXT, -1, float("nan")
+        if _fits(code, emg):
+            return KIND_CODE, code, emg
+    return KIND_TEXT, -1, float("nan")
+
+
+def is_firmware_text(line):
+    """A line of the firmware's own text (banner, calibration message), not
+    garbage from noise or a wrong baud rate, nor a malformed data line."""
+    return (line[:1].isalpha() and line.isascii() and line.isprintable()
+            and not line.startswith((EMG_PREFIX, RAW_PREFIX)))
+
+
+def parse_event(line):
+    """(kind, code, emg) of a line as the keyboards read it, or None for a
+    line that is neither data nor firmware text:
+
+      "2", "2,0.153"   KIND_CODE, 2, EMG level or None
+      "E,0.153"        KIND_EMG, None, EMG level
+      "...Ready!"      KIND_TEXT, None, None
+
+    Never raises: whatever comes off the wire is at worst a parse error.
+    """
+    try:
+        kind, code, emg = parse_line(line)
+    except Exception:
+        return None
+    if kind == KIND_CODE:
+        return kind, code, None if emg != emg else emg
+    if kind == KIND_EMG:
+        return kind, None, emg
+    if kind == KIND_TEXT and is_firmware_text(line):
+        return kind, None, None
+    return None
+
+
+class BlinkEvent:
+    __slots__ = ("seq", "t", "mono_ns", "kind", "code", "emg", "line")
+
+    def __init__(self, seq, t, mono_ns, kind, code, emg, line):
+        self.seq, self.t, self.mono_ns = seq, t, mono_ns
+        self.kind, self.code, self.emg, self.line = kind, code, emg, line
+
+    def __repr__(self):
+        return f"BlinkEvent(seq={self.seq}, kind={self.kind}, code={self.code}, line={self.line!r})"
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Readers must not unlink the segment when they exit; only the
+    # daemon that created it owns it (Python < 3.13 tracks every attach).
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+# -----------------------------
+# Writer side (used only by the daemon)
+# -----------------------------
+class RingWriter:
+    def __init__(self, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY):
+        size = HEADER.size + capacity * SLOT.size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a daemon that crashed; take it over.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.capacity = capacity
+        self.buf = self.shm.buf
+        self.head = 0
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, capacity, SLOT.size, 0)
+
+    def publish(self, line, kind, code=-1, emg=float("nan"), t=None, mono_ns=None):
+        raw = line.encode(errors="ignore")[:MAX_LINE] if isinstance(line, str) else line[:MAX_LINE]
+        n = self.head
+        offset = HEADER.size + (n % self.capacity) * SLOT.size
+        SEQ.pack_into(self.buf, offset, 0)
+        SLOT.pack_into(self.buf, offset, 0,
+                       time.time() if t is None else t,
+                       time.monotonic_ns() if mono_ns is None else mono_ns,
+                       kind, code, emg, len(raw), raw)
+        SEQ.pack_into(self.buf, offset, n + 1)
+        self.head = n + 1
+        SEQ.pack_into(self.buf, HEAD_OFFSET, self.head)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# -----------------------------
+# Reader side (any number of processes)
+# -----------------------------
+class RingReader:
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        magic, version, capacity, slot_size, head = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+            self.close()
+            raise ValueError(f"Shared memory segment {name!r} is not a blink event ring")
+        self.capacity = capacity
+        # New readers start at the live edge unless they want the backlog.
+        self.cursor = max(0, head - capacity) if from_start else head
+        self.dropped = 0
+
+    def head(self):
+        return SEQ.unpack_from(self.buf, HEAD_OFFSET)[0]
+
+    def pending(self):
+        return self.head() - self.cursor
+
+    def poll(self, max_events=None):
+        """Return every event published since the last poll (oldest first)."""
+        head = self.head()
+        if head - self.cursor > self.capacity:
+            self.dropped += head - self.capacity - self.cursor
+            self.cursor = head - self.capacity
+        if max_events is not None:
+            head = min(head, self.cursor + max_events)
+
+        events = []
+        buf = self.buf
+        while self.cursor < head:
+            n = self.cursor
+            offset = HEADER.size + (n % self.capacity) * SLOT.size
+            seq, t, mono_ns, kind, code, emg, length, raw = SLOT.unpack_from(buf, offset)
+            if seq != n + 1 or SEQ.unpack_from(buf, offset)[0] != n + 1:
+                # Overwritten (or being overwritten) while we were behind.
+                self.dropped += 1
+            else:
+                events.append(BlinkEvent(n, t, mono_ns, kind, code, emg, raw[:length]))
+            self.cursor = n + 1
+        return events
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+# -----------------------------
+# Daemon
+# -----------------------------
+def publish_lines(writer, state, chunk, t, mono_ns, recorder=None):
+    state["pending"] += chunk
+    *lines, state["pending"] = state["pending"].split(b"\n")
+    for raw in lines:
+        line = raw.decode(errors="ignore").strip()
+        if not line:
+            continue
+        try:
+            kind, code, emg = parse_line(line)
+            writer.publish(line, kind, code, emg, t, mono_ns)
+        except (ValueError, OverflowError, struct.error):
+            # One bad line from a noisy port must not stop the daemon
+            # that every reader shares.
+            state["bad"] += 1
+            continue
+        if recorder:
+            recorder.write(REC_EVENT, line, mono_ns)
+
+
+def publish_frames(writer, decoder, chunk, t, mono_ns, recorder=None, classifier=None, emg_level=None):
+    decoded = decoder.feed(chunk)
+    for eog, emg in decoded.samples.tolist():
+        writer.publish(b"", KIND_SAMPLE, eog, emg, t, mono_ns)
+    if recorder and len(decoded.samples):
+        recorder.write(REC_SAMPLES, decoded.samples.tobytes(), mono_ns)
+    if emg_level and len(decoded.samples):
+        # Line readers get the EMG level the text firmware would print.
+        for level in emg_level.process(decoded.samples[:, 1]):
+            writer.publish(emg_line(level), KIND_EMG, -1, level, t, mono_ns)
+    if classifier:
+        # The host finds the blinks in the raw samples (blink_classifier.py)
+        # instead of the firmware; they go out as raw blinks, timed by
+        # sample count, and get grouped into codes like RAW_BLINKS ones.
+        samples = decoded.samples
+        level = emg_level.level if emg_level else 0.0
+        for sample in classifier.process(samples[:, 0], samples[:, 1]):
+            ms = sample * 1000 // classifier.model.fs
+            line = blink_line(ms, level)
+            writer.publish(line, KIND_BLINK, ms, level, t, mono_ns)
+            if recorder:
+                recorder.write(REC_EVENT, line, mono_ns)
+        for _, text in decoded.texts:
+            writer.publish(text, KIND_TEXT, -1, float("nan"), t, mono_ns)
+        return
+    for _, code, emg in decoded.events:
+        # Consumers that read lines see exactly what the text firmware prints.
+        line = f"{code},{emg:.3f}"
+        writer.publish(line, KIND_CODE, code, emg, t, mono_ns)
+        if recorder:
+            recorder.write(REC_EVENT, line, mono_ns)
+    for _, ms, emg in decoded.blinks:
+        line = blink_line(ms, emg)
+        writer.publish(line, KIND_BLINK, ms, emg, t, mono_ns)
+        if recorder:
+            recorder.write(REC_EVENT, line, mono_ns)
+    for _, text in decoded.texts:
+        writer.publish(text, KIND_TEXT, -1, float("nan"), t, mono_ns)
+
+
+def run_daemon(port, baud, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY, quiet=False, binary=False, record=None,
+               classifier=None):
+    from transport import open_serial
+
+    writer = RingWriter(name, capacity)
+    ser = open_serial(port, baud, timeout=0.1, decode=False)   # raw blinks are published as they are
+    recorder = Recorder(record) if record else None
+    # Make `kill` clean up the segment just like Ctrl+C does.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if not quiet:
+        print(f"Publishing {port} @ {baud} on shared memory '{name}' ({capacity} slots)")
+
+    decoder = None
+    emg_level = None
+    state = {"pending": b"", "bad": 0}
+    if binary:
+        from protocol import FrameDecoder
+        from emg_control import EmgLevel
+        decoder = FrameDecoder()
+        emg_level = EmgLevel()
+    if classifier:
+        from blink_classifier import BlinkClassifier, Model
+        classifier = BlinkClassifier(Model.load(classifier))
+    try:
+        while True:
+            chunk = ser.read(ser.in_waiting or 1)
+            if not chunk:
+                continue
+            t, mono_ns = time.time(), time.monotonic_ns()
+            if recorder:
+                recorder.write(REC_SERIAL, chunk, mono_ns)
+            if decoder:
+                publish_frames(writer, decoder, chunk, t, mono_ns, recorder, classifier, emg_level)
+            else:
+                publish_lines(writer, state, chunk, t, mono_ns, recorder)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        ser.close()
+        writer.close()
+        if recorder:
+            recorder.close()
+        if state["bad"] and not quiet:
+            print(f"{state['bad']} unreadable lines skipped")
+        if decoder and not quiet:
+            print(f"{decoder.frames} frames, {decoder.dropped} dropped, {decoder.bad_checksum} bad checksums")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Own the Arduino serial port and publish blink events to shared memory.")
+    parser.add_argument("--port", default=None, help="serial port (auto-detected if omitted)")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--name", default=DEFAULT_NAME, help="shared memory segment name")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="ring size in events")
+    parser.add_argument("--binary", action="store_true", help="firmware built with BINARY_PROTOCOL 1")
+    parser.add_argument("--record", default=None, help="also record the session to this file")
+    parser.add_argument("--classifier", default=None,
+                        help="find blinks on the host with this blink_classifier.py model (needs --binary)")
+    args = parser.parse_args()
+    if args.classifier and not args.binary:
+        parser.error("--classifier needs the raw samples of --binary")
+
+    from device_manager import find_arduino_port
+    port = args.port or find_arduino_port()
+    if port is None:
+        print("No Arduino serial port found. Plug in your Arduino and restart.")
+        sys.exit(1)
+    run_daemon(port, args.baud, args.name, args.capacity, binary=args.binary, record=args.record,
+               classifier=args.classifier)
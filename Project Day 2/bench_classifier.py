@@ -0,0 +1,78 @@
+import sys
+import time
+import argparse
+
+import dsp
+from blink_classifier import BlinkClassifier, Model, train, synthetic_session, match, firmware_labels
+
+# -----------------------------
+# Blink classifier vs the firmware's threshold detector
+#
+# Trains on --train synthetic minutes (blinks plus saccades, EMG bursts
+# leaking into the EOG and electrode pops), then finds blinks in other
+# --test minutes with both detectors: blinks found, false blinks per
+# minute. Also times inference per window for blocks of 1 sample (one
+# binary frame at a time) up to a whole read.
+#
+#   python bench_classifier.py
+#   python bench_classifier.py --model blink_model.npz --clean
+# -----------------------------
+
+
+def detect(model, eog, emg, block):
+    clf = BlinkClassifier(model)
+    found = []
+    for s in range(0, len(eog), block):
+        found += clf.process(eog[s:s + block], emg[s:s + block])
+    return found
+
+
+def per_window_us(model, eog, emg, block, seconds=0.5):
+    clf = BlinkClassifier(model)
+    n, s = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if s + block > len(eog):
+            s = 0
+        clf.process(eog[s:s + block], emg[s:s + block])
+        s += block
+        n += block
+    return (time.perf_counter() - start) / n * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the blink classifier with the firmware threshold.")
+    parser.add_argument("--fs", type=int, default=dsp.SAMPLE_RATE)
+    parser.add_argument("--train", type=int, default=10, help="synthetic minutes to train on")
+    parser.add_argument("--test", type=int, default=5, help="synthetic minutes to test on")
+    parser.add_argument("--model", default=None, help="use this trained model instead")
+    parser.add_argument("--clean", action="store_true", help="test sessions without artifacts")
+    args = parser.parse_args()
+
+    if args.model:
+        model = Model.load(args.model)
+    else:
+        start = time.perf_counter()
+        model = train([synthetic_session(args.fs, 60, seed=100 + i) for i in range(args.train)], args.fs)
+        print(f"Trained on {args.train} min in {time.perf_counter() - start:.1f} s, threshold {model.threshold:.2f}")
+
+    tests = [synthetic_session(args.fs, 60, seed=1 + i, artifacts=not args.clean) for i in range(args.test)]
+    minutes = args.test
+    results = {"firmware threshold": [0, 0], "classifier": [0, 0]}
+    blinks = 0
+    for eog, emg, centres in tests:
+        blinks += len(centres)
+        for name, found in (("firmware threshold", firmware_labels(eog, args.fs)),
+                            ("classifier", detect(model, eog, emg, 10))):
+            tp, fp = match(found, centres, args.fs)
+            results[name][0] += tp
+            results[name][1] += fp
+    print(f"\n{blinks} blinks in {minutes} min ({'clean' if args.clean else 'with artifacts'}):")
+    for name, (tp, fp) in results.items():
+        print(f"  {name:>18}: {tp / blinks * 100:5.1f}% of blinks found, {fp / minutes:5.1f} false blinks/min")
+
+    eog, emg, _ = tests[0]
+    print("\nInference per window (one window per sample):")
+    for block in (1, 10, 50, 500):
+        print(f"  block {block:>4} samples: {per_window_us(model, eog, emg, block):7.1f} us")
+    sys.exit(0)
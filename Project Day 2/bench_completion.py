@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+import completion
+from scan_engine import ScanEngine
+from bench_serial import percentile
+
+# -----------------------------
+# Word completion: lookup latency, index size and how many blinks the
+# prediction row saves when typing a held-out part of the corpus.
+#
+# Blinks are counted on the Qt layout (row 0 skipped, no back code):
+# reaching key (r, c) from the home row costs the row advances, one
+# select, the column advances and one select. A word is typed letter by
+# letter followed by SPACE; with predictions, after each letter (and
+# before the first) the word is taken from the prediction row as soon as
+# that is cheaper than typing the rest. A prediction types the word and
+# the space.
+#
+#   python bench_completion.py                      # stand-in corpus
+#   python bench_completion.py --corpus book.txt --slots 4
+# -----------------------------
+
+letter_rows = [
+    list("1234567890"),
+    list("QWERTYUIOP"),
+    list("ASDFGHJKL"),
+    list("ZXCVBNM"),
+    ["SPACE", "DEL", "ENTER"]
+]
+
+
+def key_costs(rows, first_row):
+    engine = ScanEngine(rows, first_row=first_row, allow_back=False)
+    costs = {}
+    for r in range(first_row, len(rows)):
+        for c, key in enumerate(rows[r]):
+            costs[key] = (r - first_row) + 1 + c + 1
+    return engine, costs
+
+
+def blinks_for(words, completer, rows, first_row, slots):
+    _, costs = key_costs(rows, first_row)
+    total = letters_typed = 0
+    for word in words:
+        spent = 0
+        for typed in range(len(word) + 1):
+            rest = sum(costs[ch] for ch in word[typed:]) + costs["SPACE"]
+            if completer is not None and typed < len(word):
+                options = completer.complete(word[:typed], slots)
+                if word in options:
+                    pick = costs[completion.slot_keys(slots)[options.index(word)]]
+                    if pick < rest:
+                        spent += pick
+                        letters_typed += typed
+                        break
+            if typed == len(word):
+                spent += costs["SPACE"]
+                letters_typed += typed
+                break
+            spent += costs[word[typed]]
+        total += spent
+    return total, letters_typed
+
+
+def lookup_latency(completer, words, slots):
+    prefixes = [w[:i] for w in words for i in range(1, len(w) + 1)]
+    times = []
+    for prefix in prefixes:
+        start = time.perf_counter_ns()
+        completer.complete(prefix, slots)
+        times.append((time.perf_counter_ns() - start) / 1e3)
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the word completion index.")
+    parser.add_argument("--corpus", default=None, help="text file (default: Python docs text)")
+    parser.add_argument("--slots", type=int, default=4, help="words on the prediction row")
+    parser.add_argument("--test", type=float, default=0.2, help="fraction of the corpus held out")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = completion.standin_corpus()
+    words = completion.corpus_words(text)
+    split = int(len(words) * (1 - args.test))
+    train, test = words[:split], words[split:]
+
+    path = os.path.join(tempfile.mkdtemp(), "words.idx")
+    start = time.perf_counter()
+    nodes, n_words = completion.build_index(Counter(train), path)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    completer = completion.Completer(path)
+    open_ms = (time.perf_counter() - start) * 1e3
+    print(f"Index: {n_words} words, {nodes} nodes, {completer.size / 1024:.0f} KiB, "
+          f"built in {build_s:.2f} s, opened in {open_ms:.2f} ms")
+
+    times = lookup_latency(completer, test[:5000], args.slots)
+    print(f"Lookup: p50 {percentile(times, 50):.1f} us, p99 {percentile(times, 99):.1f} us, "
+          f"max {max(times):.1f} us over {len(times)} prefixes")
+
+    chars = sum(len(w) + 1 for w in test)
+    slots = completion.slot_keys(args.slots)
+    base, _ = blinks_for(test, None, letter_rows, 1, args.slots)
+    print(f"Typing {len(test)} held-out words ({chars} characters incl. spaces):")
+    print(f"  no predictions           {base / chars:5.2f} blinks/char")
+    for name, rows in (("prediction row first", letter_rows[:1] + [slots] + letter_rows[1:]),
+                       ("prediction row last", letter_rows + [slots])):
+        blinks, typed = blinks_for(test, completer, rows, 1, args.slots)
+        print(f"  {name:<24} {blinks / chars:5.2f} blinks/char, {1 - blinks / base:6.1%} fewer blinks, "
+              f"{1 - typed / sum(len(w) for w in test):6.1%} of letters not typed")
+    completer.close()
+    sys.exit(0)
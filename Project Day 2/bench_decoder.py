@@ -0,0 +1,137 @@
+import sys
+import math
+import random
+import argparse
+
+from blink_decoder import SequenceDecoder, FIXED_TIMEOUT_MS, DEBOUNCE_MS, MIN_BLINKS, MAX_BLINKS
+from bench_serial import percentile
+
+# -----------------------------
+# Blink sequence decoding: fixed timeout vs host-side adaptive decoder
+#
+# Simulates users blinking codes (code + 1 blinks, gaps between blinks
+# drawn from a per-user log-normal, a pause of --think seconds between
+# codes) and decodes the blinks twice:
+#
+#   fixed      the firmware: a code BLINK_SEQUENCE_TIMEOUT_MS after the
+#              first blink of a sequence, blinks after that start a new one
+#   adaptive   blink_decoder.SequenceDecoder on the raw blinks, polled
+#              every --poll-ms like the frontends do (--link-ms serial delay)
+#
+# Reported per user: codes decoded as meant, and for those the wait, last
+# blink -> code on the host (how long the keyboard takes to react once
+# the user is done blinking), and the whole command, first blink -> code.
+# A fixed 1 s window misreads users whose sequences take longer than it,
+# so its waits are over the (shorter) codes it got right.
+#
+#   python bench_decoder.py
+#   python bench_decoder.py --codes 5000 --users fast:250:0.15 slow:500:0.3
+# -----------------------------
+
+USERS = ("fast:260:0.15", "typical:350:0.2", "slow:480:0.25")
+
+
+def blink_times(rng, codes, gap_ms, sigma, think_s, weights):
+    """[(intended code, [blink times ms])], the firmware's debounce applied."""
+    t = 1000.0
+    sequences = []
+    for _ in range(codes):
+        code = rng.choices((1, 2, 3), weights=weights)[0]
+        times = [t]
+        for _ in range(code):
+            times.append(times[-1] + max(gap_ms * math.exp(rng.gauss(0, sigma)), DEBOUNCE_MS))
+        sequences.append((code, [round(x) for x in times]))
+        t = times[-1] + rng.uniform(*think_s) * 1e3
+    return sequences
+
+
+def decode_fixed(sequences):
+    """[(code, first blink ms, committed ms)] like the firmware loop()."""
+    out = []
+    blinks = [b for _, times in sequences for b in times]
+    first, count = None, 0
+    for b in blinks + [math.inf]:
+        if count and b - first >= FIXED_TIMEOUT_MS:
+            if MIN_BLINKS <= count <= MAX_BLINKS:
+                out.append((count - 1, first, first + FIXED_TIMEOUT_MS))
+            count = 0
+        if b == math.inf:
+            break
+        if not count:
+            first = b
+        count += 1
+    return out
+
+
+def decode_adaptive(sequences, poll_ms, link_ms, decoder):
+    out = []
+    ns = 1e6
+    blinks = [b for _, times in sequences for b in times]
+
+    def commit(done, at_ms):
+        if done:
+            code, first_ns = done
+            out.append((code, round(first_ns / ns - link_ms), at_ms))
+
+    for b in blinks + [math.inf]:
+        arrived = b + link_ms
+        deadline = decoder.deadline_ns()
+        if deadline is not None:
+            tick = math.ceil(deadline / ns / poll_ms) * poll_ms      # the first poll at or after it
+            if tick <= arrived:
+                commit(decoder.poll(int(tick * ns)), tick)
+        if b == math.inf:
+            break
+        commit(decoder.blink(b, int(arrived * ns)), arrived)
+    return out
+
+
+def score(sequences, decoded):
+    """(share decoded as meant, [last blink -> code ms], [first blink -> code ms] of those)."""
+    owner = {times[0]: i for i, (_, times) in enumerate(sequences)}
+    got = {}
+    for code, first, at in decoded:
+        got.setdefault(owner.get(first), []).append((code, at))
+    right, waits, commands = 0, [], []
+    for i, (code, times) in enumerate(sequences):
+        if [c for c, _ in got.get(i, [])] == [code]:
+            right += 1
+            waits.append(got[i][0][1] - times[-1])
+            commands.append(got[i][0][1] - times[0])
+    return right / len(sequences), waits, commands
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Command latency of fixed-timeout vs adaptive blink decoding.")
+    parser.add_argument("--users", nargs="+", default=list(USERS), help="name:median gap ms:log-normal sigma")
+    parser.add_argument("--codes", type=int, default=2000, help="codes per user")
+    parser.add_argument("--think", type=float, nargs=2, default=(1.5, 4.0), help="seconds between codes (uniform)")
+    parser.add_argument("--weights", default="0.6,0.3,0.1", help="probabilities of codes 1,2,3")
+    parser.add_argument("--poll-ms", type=float, default=20, help="how often the frontend polls the port")
+    parser.add_argument("--link-ms", type=float, default=2, help="serial delay of a blink line")
+    parser.add_argument("--risk", type=float, default=0.01, help="accepted chance of cutting a sequence short")
+    parser.add_argument("--factor", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    weights = tuple(float(w) for w in args.weights.split(","))
+    print(f"{args.codes} codes per user, polled every {args.poll_ms:.0f} ms\n")
+    print(f"{'user':>8}  {'decoder':>8}  {'as meant':>8}  {'wait p50':>8}  {'p95':>6}  {'mean':>6}  "
+          f"{'command':>7}  gap learned")
+    for spec in args.users:
+        name, gap_ms, sigma = spec.split(":")
+        rng = random.Random(args.seed)
+        sequences = blink_times(rng, args.codes, float(gap_ms), float(sigma), args.think, weights)
+        decoder = SequenceDecoder(risk=args.risk, factor=args.factor)
+        runs = [("fixed", decode_fixed(sequences), ""),
+                ("adaptive", decode_adaptive(sequences, args.poll_ms, args.link_ms, decoder),
+                 "after 2/3 blinks " + "/".join(f"{decoder.gap_after[n]:.0f}" for n in (2, 3)) + " ms"
+                 + f", {decoder.early} at 4 blinks")]
+        means = []
+        for label, decoded, note in runs:
+            ok, waits, commands = score(sequences, decoded)
+            means.append(sum(waits) / len(waits))
+            print(f"{name:>8}  {label:>8}  {ok * 100:7.1f}%  {percentile(waits, 50):6.0f}ms  "
+                  f"{percentile(waits, 95):4.0f}ms  {means[-1]:4.0f}ms  {sum(commands) / len(commands):5.0f}ms  {note}")
+        print(f"{'':>8}  wait {means[1] - means[0]:+.0f} ms per command on average\n")
+    sys.exit(0)
@@ -0,0 +1,163 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import dsp
+
+# -----------------------------
+# Checks dsp.BlinkEngine against a line-by-line port of the firmware
+# loop() and measures how much of a core it needs.
+#
+#   python bench_dsp.py              # 500 Hz, 60 s of synthetic EOG+EMG
+#   python bench_dsp.py --fs 512     # EOG Filter.ino rate
+# -----------------------------
+
+
+class FirmwareReference:
+    """The .ino code, sample by sample, in 32-bit float like the Arduino."""
+
+    def __init__(self, fs):
+        f32 = np.float32
+        self.fs = fs
+        self.sections = [[f32(c) for c in sec] for sec in dsp.HP_SECTIONS]
+        self.state = [[f32(0), f32(0)] for _ in self.sections]
+        self.emg_state = [[f32(0), f32(0)] for _ in self.sections]
+        w = dsp.envelope_window_size(fs)
+        self.w = w
+        self.buf, self.idx, self.sum = [f32(0)] * w, 0, f32(0)
+        self.emg_buf, self.emg_idx, self.emg_sum = [f32(0)] * w, 0, f32(0)
+        self.cal_sum, self.cal_count = f32(0), 0
+        self.baseline, self.calibrated = f32(0), False
+        self.waiting, self.last_blink_ms = False, 0.0
+        self.count, self.first_ms = 0, 0.0
+        self.n = 0
+
+    def _hp(self, state, x):
+        for (b0, b1, b2, a1, a2), s in zip(self.sections, state):
+            y = b0 * x + s[0]
+            s[0] = b1 * x - a1 * y + s[1]
+            s[1] = b2 * x - a2 * y
+            x = y
+        return x
+
+    def step(self, raw, emg_raw=0.0):
+        f32 = np.float32
+        now = self.n * 1000.0 / self.fs
+        filtered = self._hp(self.state, f32(raw))
+        self.sum = self.sum - self.buf[self.idx] + filtered
+        self.buf[self.idx] = filtered
+        self.idx = (self.idx + 1) % self.w
+        env = self.sum / f32(self.w)
+
+        if not self.calibrated:
+            self.cal_sum += env
+            self.cal_count += 1
+            if now > dsp.CALIBRATION_MS:
+                self.baseline = self.cal_sum / f32(self.cal_count)
+                self.calibrated = True
+        adjusted = env - self.baseline
+
+        emg_f = self._hp(self.emg_state, f32(emg_raw))
+        self.emg_sum = self.emg_sum - self.emg_buf[self.emg_idx] + emg_f
+        self.emg_buf[self.emg_idx] = emg_f
+        self.emg_idx = (self.emg_idx + 1) % self.w
+        emg_norm = (self.emg_sum / f32(self.w)) / f32(dsp.EMG_FULL_SCALE)
+
+        out = None
+        if self.calibrated:
+            blink = False
+            if not self.waiting and adjusted < dsp.BLINK_TRIGGER_NEGATIVE and now - self.last_blink_ms >= dsp.BLINK_DEBOUNCE_MS:
+                self.waiting, self.last_blink_ms, blink = True, now, True
+            elif self.waiting and adjusted > dsp.BLINK_RESET_NEGATIVE:
+                self.waiting = False
+            if blink:
+                if self.count == 0:
+                    self.first_ms = now
+                self.count += 1
+        if self.count > 0 and now - self.first_ms >= dsp.BLINK_SEQUENCE_TIMEOUT_MS:
+            count, self.count = self.count, 0
+            if 2 <= count <= 4:
+                out = (self.n, count - 1, float(emg_norm))
+        self.n += 1
+        return filtered, out
+
+
+def synthetic_session(fs, seconds, seed=1):
+    """Raw ADC-like EOG + EMG with blink sequences of 1-5 blinks."""
+    rng = np.random.default_rng(seed)
+    n = int(fs * seconds)
+    t = np.arange(n) / fs
+    eog = 512 + 40 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 2, n)
+    emg = 512 + rng.normal(0, 20, n)
+    blink = -250 * np.hanning(int(0.25 * fs))
+    pos = int(2.5 * fs)
+    while pos < n - 3 * fs:
+        for _ in range(rng.integers(1, 6)):
+            eog[pos:pos + len(blink)] += blink
+            pos += int(rng.uniform(0.3, 0.45) * fs)
+        if rng.random() < 0.3:  # a clench during this command
+            emg[pos - fs:pos] += rng.normal(0, 150, fs)
+        pos += int(rng.uniform(1.5, 3.0) * fs)
+    return np.round(eog).clip(0, 1023), np.round(emg).clip(0, 1023)
+
+
+def check_equivalence(fs, eog, emg):
+    ref = FirmwareReference(fs)
+    ref_filtered = np.empty(len(eog))
+    ref_codes = []
+    for i in range(len(eog)):
+        ref_filtered[i], out = ref.step(eog[i], emg[i])
+        if out:
+            ref_codes.append(out)
+
+    ok = True
+    for block in (1, 7, 50, 256, len(eog)):
+        engine = dsp.BlinkEngine(fs)
+        codes = []
+        for start in range(0, len(eog), block):
+            seg = slice(start, start + block)
+            codes += engine.process(eog[seg], emg[seg])
+        got = [(c.sample, c.code) for c in codes]
+        want = [(s, c) for s, c, _ in ref_codes]
+        emg_err = max((abs(c.emg - r[2]) for c, r in zip(codes, ref_codes)), default=0.0)
+        same = got == want
+        ok &= same
+        print(f"  block {block:>6}: {len(got)} codes, "
+              f"{'identical to firmware' if same else 'MISMATCH'} (max EMG diff {emg_err:.2e})")
+
+    engine = dsp.BlinkEngine(fs)
+    filtered, _ = engine.filter(eog)
+    scale = np.max(np.abs(ref_filtered))
+    err = np.max(np.abs(filtered - ref_filtered)) / scale
+    print(f"  high-pass output vs float32 firmware: max error {err:.2e} of full scale")
+    return ok and err < 1e-4
+
+
+def throughput(fs, eog, emg, block):
+    engine = dsp.BlinkEngine(fs)
+    n = len(eog)
+    start_cpu, start = time.process_time(), time.perf_counter()
+    for s in range(0, n, block):
+        engine.process(eog[s:s + block], emg[s:s + block])
+    cpu, wall = time.process_time() - start_cpu, time.perf_counter() - start
+    signal_seconds = n / fs
+    return n / wall, 100.0 * cpu / signal_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify and benchmark the host-side blink DSP engine.")
+    parser.add_argument("--fs", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    eog, emg = synthetic_session(args.fs, args.seconds)
+    print(f"Equivalence with the firmware loop ({args.fs} Hz, {args.seconds:.0f} s):")
+    ok = check_equivalence(args.fs, eog[:int(args.fs * 30)], emg[:int(args.fs * 30)])
+
+    print("Throughput (EOG + EMG channels):")
+    for block in (10, 50, 100, 512, 4096):
+        rate, core = throughput(args.fs, eog, emg, block)
+        print(f"  block {block:>5} samples ({1000 * block / args.fs:6.1f} ms): "
+              f"{rate / 1e6:6.2f} M samples/s, {core:.3f}% of one core at {args.fs} Hz")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,221 @@
+import sys
+import random
+import argparse
+
+import completion
+import layout_optimizer as lo
+from scan_engine import ScanEngine, EMIT, ADVANCE, SELECT
+from scheduler import ScanScheduler, AutoScan, BLINK_LAG_MS
+from emg_control import EmgControl, EMG_REPORT_MS, SKIP
+import emg_control
+
+# -----------------------------
+# Characters per minute with and without jaw-clench (EMG) control
+#
+# A simulated user types a sample text on the Qt keyboard (QWERTY rows,
+# digit row not scanned) through the real ScanEngine, AutoScan and
+# EmgControl, in 10 ms steps:
+#
+#   blinks     every step is a blink code; the firmware sends it
+#              BLINK_SEQUENCE_TIMEOUT_MS after the first blink
+#   blink+EMG  manual scan: hold a clench to skip to the row/key (released
+#              once the highlight is seen on it), a short clench selects;
+#              auto scan: tense while the target is far off (faster scan),
+#              a short clench selects what is highlighted
+#
+# The user only acts --reaction ms (log-normal) after the display changed,
+# so a skip can overshoot and an auto scan pick can land on the next item;
+# wrong rows are left with code 2 (auto scan), wrong keys are deleted.
+# EMG levels are reported every EMG_REPORT_MS, through the firmware's
+# 100 ms envelope and with noise, like the "E,<level>" lines.
+#
+#   python bench_emg.py
+#   python bench_emg.py --chars 600 --reaction 350 --dwell 700
+# -----------------------------
+
+STEP_MS = 10
+ENVELOPE_STEPS = 10             # the firmware's 100 ms moving average
+REST, CLENCH = 0.02, 0.2        # settings.json defaults (emg_rest, emg_clench)
+
+
+def sample_text(chars):
+    words = completion.standin_corpus().upper().split()
+    keys = []
+    for word in words:
+        word = [ch for ch in word if ch in lo.LETTERS]
+        if word:
+            keys.extend(word + ["SPACE"])
+        if len(keys) >= chars:
+            break
+    return keys[:chars]
+
+
+class Run:
+    def __init__(self, keys, auto, emg, args, seed):
+        self.keys = keys
+        self.args = args
+        self.rng = random.Random(seed)
+        self.engine = ScanEngine(lo.QWERTY, first_row=1, allow_back=False)
+        self.state = self.engine.new_state()
+        self.now = 0
+        self.auto = None
+        if auto:
+            self.auto = AutoScan(self.engine, self.state,
+                                 ScanScheduler(args.dwell, clock=lambda: self.now * 1_000_000))
+        self.emg = EmgControl(REST, CLENCH) if emg else None
+        self.typed = []
+        self.wrong = 0
+        self.codes = 0
+        self.pending = []           # (arrival ms, code) of blink codes on their way
+        self.busy_until = 0         # blinking, or holding a short clench
+        self.holding = False        # a long (skip) clench
+        self.release_at = 0         # end of a short clench
+        self.effort = 0.0           # jaw activation, scaled 0..1 (1 = calibrated clench)
+        self.activation = [0.0] * ENVELOPE_STEPS
+        self.changed(0)
+
+    # -- user ------------------------------------------------------------
+    def changed(self, t):
+        self.last_node = self.state.node
+        self.seen = t + self.args.reaction * self.rng.lognormvariate(0, self.args.spread)
+
+    def target(self):
+        typed = self.typed
+        if typed != self.keys[:len(typed)]:
+            return "DEL"
+        return self.keys[len(typed)]
+
+    def steps_to(self, key):
+        """(row steps, key steps) from the highlight to `key`, or None from a wrong row."""
+        rows = self.engine.rows
+        r = next(i for i in range(1, len(rows)) if key in rows[i])
+        if self.state.selecting_row:
+            return (r - self.state.row) % (len(rows) - 1), None
+        if self.state.row != r:
+            return None
+        return 0, (rows[r].index(key) - self.state.col) % len(rows[r])
+
+    def blink(self, code, t):
+        """First blink of a code at t; the line arrives when the firmware's timeout runs out."""
+        self.codes += 1
+        self.pending.append((t + BLINK_LAG_MS + self.args.link_ms, code))
+        self.busy_until = t + BLINK_LAG_MS + self.args.link_ms + 1
+
+    def act(self, t):
+        if t < self.seen or t < self.busy_until or self.pending:
+            return
+        steps = self.steps_to(self.target())
+        far = steps is not None and (steps[1] if steps[1] is not None else steps[0])
+        if self.holding:
+            if not far:
+                self.holding = False        # on it: let go, and relax before the next clench
+                self.effort = 0.0
+                self.seen = t + self.args.relax_ms
+            return
+        if self.auto:
+            if steps is None:
+                self.blink(SELECT, t)       # back to the first row
+            elif far == 0:
+                if self.emg:
+                    self.clench(t)
+                else:
+                    self.blink(ADVANCE, t)
+            elif self.emg:
+                self.effort = self.args.tension if far >= 2 else 0.0
+            return
+        if self.emg:
+            if far:
+                self.holding = True
+                self.effort = 1.0
+            else:
+                self.clench(t)
+        else:
+            self.blink(ADVANCE if far else SELECT, t)
+
+    def clench(self, t):
+        """A short clench; the user waits for the display to change (or tries again after a second)."""
+        self.effort = 1.0
+        self.busy_until = self.release_at = t + self.args.clench_ms
+        self.seen = self.release_at + 1000
+
+    # -- keyboard --------------------------------------------------------
+    def code(self, code, arrived, blinked=None):
+        ns = 1_000_000
+        if self.auto:
+            action = self.auto.code(code, arrived * ns, blinked * ns if blinked is not None else None)
+        else:
+            action = self.engine.step(self.state, code)
+        if action.kind == EMIT:
+            if action.key == "DEL":
+                self.typed = self.typed[:-1]
+            else:
+                self.typed.append(action.key)
+                self.wrong += self.typed != self.keys[:len(self.typed)]
+
+    def run(self, limit_s=36000):
+        t = 0
+        ns = 1_000_000
+        while self.typed != self.keys and t < limit_s * 1000:
+            self.now = t
+            if self.auto:
+                self.auto.tick(t * ns)
+            for arrival, code in [p for p in self.pending if p[0] <= t]:
+                self.pending.remove((arrival, code))
+                self.code(code, arrival)
+            if self.emg:
+                if self.effort == 1.0 and not self.holding and t >= self.release_at:
+                    self.effort = 0.0
+                self.activation = self.activation[1:] + [self.effort]
+                if t % EMG_REPORT_MS == 0:
+                    x = sum(self.activation) / ENVELOPE_STEPS + self.rng.gauss(0, self.args.noise)
+                    for action, started in self.emg.update(REST + x * (CLENCH - REST), t * ns):
+                        emg_control.apply(action, started // ns, self.auto,
+                                          lambda c, blinked: self.code(c, t, blinked))
+                    if self.auto:
+                        self.auto.scheduler.set_speed(self.emg.speed)
+            if self.state.node != self.last_node:
+                self.changed(t)
+            self.act(t)
+            t += STEP_MS
+        minutes = t / 60000
+        return {"cpm": len(self.keys) / minutes, "wrong": self.wrong, "codes": self.codes,
+                "confirms": self.emg.actions["confirm"] if self.emg else 0,
+                "skips": self.emg.actions[SKIP] if self.emg else 0, "seconds": t / 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Characters per minute with blink codes alone vs with EMG control.")
+    parser.add_argument("--chars", type=int, default=300, help="keys of sample text to type")
+    parser.add_argument("--reaction", type=float, default=300, help="median ms from a display change to acting")
+    parser.add_argument("--spread", type=float, default=0.2, help="log-normal sigma of the reaction")
+    parser.add_argument("--dwell", type=float, default=600, help="auto scan dwell, ms (settings: scan_speed)")
+    parser.add_argument("--clench-ms", type=float, default=200, help="a short (confirm) clench")
+    parser.add_argument("--relax-ms", type=float, default=350, help="pause between letting go and the next clench")
+    parser.add_argument("--tension", type=float, default=0.4,
+                        help="scaled effort of a light tension (EmgControl's speed band ends at release, 0.5)")
+    parser.add_argument("--noise", type=float, default=0.05, help="EMG noise, in units of the calibrated clench")
+    parser.add_argument("--link-ms", type=float, default=2)
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    keys = sample_text(args.chars)
+    print(f"{len(keys)} keys of sample text, reaction {args.reaction:.0f} ms, dwell {args.dwell:.0f} ms, "
+          f"{args.seeds} runs each\n")
+    print(f"{'scan':>6}  {'input':>9}  {'cpm':>6}  {'wrong keys':>10}  {'blink codes':>11}  "
+          f"{'confirms':>8}  {'skips':>6}")
+    for auto in (False, True):
+        cpm, wrong = [], []
+        for emg in (False, True):
+            runs = [Run(keys, auto, emg, args, seed).run() for seed in range(args.seeds)]
+
+            def mean(field):
+                return sum(r[field] for r in runs) / len(runs)
+
+            cpm.append(mean("cpm"))
+            wrong.append(mean("wrong"))
+
+            print(f"{'auto' if auto else 'manual':>6}  {'blink+EMG' if emg else 'blinks':>9}  {cpm[-1]:6.2f}  "
+                  f"{mean('wrong'):10.1f}  {mean('codes'):11.0f}  {mean('confirms'):8.0f}  {mean('skips'):6.0f}")
+        print(f"{'':>6}  EMG: {cpm[1] / cpm[0]:.2f}x characters per minute, "
+              f"wrong keys {wrong[0]:.1f} -> {wrong[1]:.1f}\n")
+    sys.exit(0)
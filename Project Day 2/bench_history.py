@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+from history_store import HistoryStore, SCHEMA, INSERTS, connect
+from bench_serial import percentile
+
+# -----------------------------
+# Session history write throughput
+#
+# sustained   --seconds at each of --rates (blink + key pairs per second,
+#             like that many codes/s from hub devices), paced in 10 ms
+#             ticks: cost of a call on the producer (serial/UI) thread,
+#             rows written per second, deepest queue, queued -> committed
+#             latency, rows dropped
+# direct      the same calls as one INSERT + COMMIT each on the producer
+#             thread, what writing without the queue would cost it
+# flood       --flood rows queued as fast as possible: the writer's ceiling
+#
+#   python bench_history.py
+#   python bench_history.py --rates 100 1000 10000 50000 --seconds 5
+# -----------------------------
+
+
+def sustained(path, rate, seconds, batch_ms, tick=0.01):
+    history = HistoryStore(path, batch_ms=batch_ms)
+    sid = history.start_session("bench", "bench")
+    calls, depth, n = [], 0, 0
+    start = next_tick = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(int((time.perf_counter() - start) * rate) - n):
+            t0 = time.perf_counter_ns()
+            history.blink(sid, 1 + n % 3, 12.5)
+            history.key(sid, "A", 1)
+            calls.append((time.perf_counter_ns() - t0) / 2)
+            n += 1
+        depth = max(depth, len(history.pending))
+        next_tick += tick
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    history.flush()
+    history.close()
+    return n, elapsed, calls, depth, history.stats()
+
+
+def direct(path, count):
+    conn = connect(path)
+    conn.executescript(SCHEMA)
+    calls = []
+    for n in range(count):
+        t0 = time.perf_counter_ns()
+        with conn:
+            conn.execute(INSERTS["blink"], (1, time.time(), 1 + n % 3, 12.5))
+        with conn:
+            conn.execute(INSERTS["key"], (1, time.time(), "A", 1))
+        calls.append((time.perf_counter_ns() - t0) / 2)
+    conn.close()
+    return calls
+
+
+def flood(path, rows, batch_ms):
+    history = HistoryStore(path, batch_ms=batch_ms, limit=rows + 10)
+    sid = history.start_session("bench", "bench")
+    start = time.perf_counter()
+    for n in range(rows // 2):
+        history.blink(sid, 1, None)
+        history.key(sid, "A", 1)
+    queued = time.perf_counter() - start
+    history.flush()
+    elapsed = time.perf_counter() - start
+    history.close()
+    return history.stats(), queued, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write throughput of the session history store.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 100, 1000, 10000],
+                        help="blink + key pairs per second")
+    parser.add_argument("--seconds", type=float, default=3.0, help="per rate")
+    parser.add_argument("--batch-ms", type=float, default=250)
+    parser.add_argument("--direct", type=int, default=2000, help="pairs written directly")
+    parser.add_argument("--flood", type=int, default=500_000, help="rows queued at once")
+    parser.add_argument("--dir", default=None, help="where the test databases go (default: a temp dir)")
+    args = parser.parse_args()
+
+    folder = args.dir or tempfile.mkdtemp(prefix="history-bench-")
+    print(f"databases in {folder}, writer batches every {args.batch_ms:.0f} ms\n")
+    print(f"{'pairs/s':>8}  {'call p50':>8}  {'p99':>7}  {'max':>8}  {'rows/s':>8}  {'queue max':>9}  "
+          f"{'commit p99':>10}  {'dropped':>7}")
+    for rate in args.rates:
+        path = os.path.join(folder, f"sustained-{rate:g}.db")
+        n, elapsed, calls, depth, stats = sustained(path, rate, args.seconds, args.batch_ms)
+        print(f"{n / elapsed:8.0f}  {percentile(calls, 50) / 1e3:6.2f}us  {percentile(calls, 99) / 1e3:5.2f}us  "
+              f"{max(calls) / 1e3:6.0f}us  {stats['written'] / elapsed:8.0f}  {depth:9}  "
+              f"{stats['latency_p99_ms']:8.0f}ms  {stats['dropped']:7}")
+
+    calls = direct(os.path.join(folder, "direct.db"), args.direct)
+    print(f"\ndirect INSERT + COMMIT per call: p50 {percentile(calls, 50) / 1e3:.1f} us, "
+          f"p99 {percentile(calls, 99) / 1e3:.1f} us, max {max(calls) / 1e3:.0f} us")
+
+    stats, queued, elapsed = flood(os.path.join(folder, "flood.db"), args.flood, args.batch_ms)
+    print(f"flood: {stats['written']} rows queued in {queued:.2f} s, written in {elapsed:.2f} s "
+          f"({stats['written'] / elapsed:.0f} rows/s, {stats['batches']} batches)")
+
+    conn = sqlite3.connect(os.path.join(folder, "flood.db"))
+    print("journal mode:", conn.execute("PRAGMA journal_mode").fetchone()[0])
+    conn.close()
+    sys.exit(0)
@@ -0,0 +1,103 @@
+import sys
+import json
+import socket
+import time
+import asyncio
+import argparse
+
+from websockets.asyncio.client import connect
+
+from hub import Hub, simulate, serve_hub, listen_socket, FIRMWARE_RATE_HZ
+from bench_serial import percentile
+
+# -----------------------------
+# Hub load test
+#
+# One asyncio loop (one core) runs the hub, N simulated devices sending
+# codes at --rate per second each, and N WebSocket clients, one per
+# device (the clients' own decoding is counted too). Reported per run:
+# codes handled, code -> client latency, and the share of one core the
+# whole process used (CPU time / wall time).
+#
+# --slow adds a client following every device that takes --slow-ms per
+# frame, to show backpressure: its changes are merged while it reads,
+# the others stay fast.
+#
+#   python bench_hub.py --sessions 12 24 48 96 --rate 1 --seconds 10
+#   python bench_hub.py --sessions 48 --rate 10 --slow
+# -----------------------------
+
+
+async def client(url, port, latencies, stop, delay_s=0.0):
+    frames = 0
+    sock = None
+    if delay_s:
+        # A slow reader with small buffers, so TCP flow control reaches
+        # the hub as it would for a client on a slow link.
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+        sock.connect(("127.0.0.1", port))
+        sock.setblocking(False)
+    async with connect(url, sock=sock, max_queue=2 if delay_s else None) as ws:
+        while not stop.is_set():
+            try:
+                frame = await asyncio.wait_for(ws.recv(), 0.2)
+            except asyncio.TimeoutError:
+                continue
+            now = time.monotonic_ns()
+            frames += 1
+            for message in json.loads(frame):
+                if message["type"] == "delta":
+                    latencies.append((now - message["t"]) / 1e6)
+            if delay_s:
+                await asyncio.sleep(delay_s)
+    return frames
+
+
+async def run(sessions, rate, seconds, slow_ms=None):
+    hub = Hub()
+    devices = [f"sim{i}" for i in range(sessions)]
+    for device in devices:
+        hub.add_device(device)
+    latencies, slow_latencies = [], []
+    stop = asyncio.Event()
+    sock = listen_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    async with serve_hub(hub, sock):
+        clients = [asyncio.create_task(client(f"ws://127.0.0.1:{port}/{d}", port, latencies, stop)) for d in devices]
+        if slow_ms is not None:
+            clients.append(asyncio.create_task(
+                client(f"ws://127.0.0.1:{port}/", port, slow_latencies, stop, slow_ms / 1e3)))
+        while len(hub.clients) < len(clients):
+            await asyncio.sleep(0.01)
+        feeders = [asyncio.create_task(simulate(hub, d, rate, seed=i)) for i, d in enumerate(devices)]
+        cpu, wall = time.process_time(), time.monotonic()
+        await asyncio.sleep(seconds)
+        cpu, wall = time.process_time() - cpu, time.monotonic() - wall
+        stats = hub.stats()
+        for task in feeders:
+            task.cancel()
+        stop.set()
+        await asyncio.gather(*clients)
+    return stats, latencies, slow_latencies, cpu / wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the blink hub.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[12, 24, 48, 96])
+    parser.add_argument("--rate", type=float, default=FIRMWARE_RATE_HZ, help="codes/s per device")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--slow", action="store_true", help="add a slow client following every device")
+    parser.add_argument("--slow-ms", type=float, default=200.0, help="time the slow client takes per frame")
+    args = parser.parse_args()
+
+    print(f"{args.rate} codes/s per device, {args.seconds:.0f} s per run")
+    for n in args.sessions:
+        stats, latencies, slow, core = asyncio.run(run(n, args.rate, args.seconds, args.slow_ms if args.slow else None))
+        print(f"  {n:4d} sessions: {stats['codes']:6d} codes ({stats['codes'] / args.seconds:7.1f}/s)   "
+              f"latency p50 {percentile(latencies, 50):5.2f} ms, p99 {percentile(latencies, 99):6.2f} ms   "
+              f"CPU {core * 100:5.1f}% of one core")
+        if args.slow:
+            print(f"       slow client: {stats['merged']} deltas merged, {stats['resyncs']} resyncs, "
+                  f"latency p50 {percentile(slow, 50):.0f} ms, p99 {percentile(slow, 99):.0f} ms")
+    sys.exit(0)
@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import subprocess
+from collections import deque
+
+import serial
+
+from virtual_arduino import VirtualArduino
+from output_sink import OutputSink, make_backend
+from bench_serial import percentile
+
+# -----------------------------
+# End-to-end latency of the frontends: blink code printed by the
+# (virtual) Arduino -> keystroke injected / highlight moved.
+#
+# Each frontend runs its real code against virtual_arduino.py on a pty,
+# with light instrumentation around it:
+#
+#   qt         blink_keyboard.py, offscreen, one run per poll interval (poll_ms)
+#              read       readline() returned the code line
+#              decode     process_blink() entered with the int
+#              inject     the output sink sent the keystroke (only for committed keys)
+#              transition update_display() entered (state already changed)
+#              render     update_display() + repaint() finished
+#
+#   streamlit  webs.py under streamlit.testing AppTest, one run per
+#              poll_interval (legacy reruns) plus the push reader
+#              read       readline() returned the code line
+#              render     render_keyboard() built the keyboard that shows it
+#
+# Every stage is reported as latency from the moment the code was written
+# to the pty. Push mode is driven with one AppTest run per PUSH_TICK; AppTest
+# cannot run a fragment on its own, so that is a full rerun per tick (an
+# upper bound on the fragment cost).
+#
+#   python bench_latency.py --json latency.json
+#   python bench_latency.py --json new.json --compare latency.json
+# -----------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEBS = os.path.join(HERE, "..", "webs.py")
+STAGES = ("read", "decode", "inject", "transition", "render")
+
+
+# -----------------------------
+# Instrumented serial port
+# -----------------------------
+class StampedSerial:
+    """Wraps the pty and stamps every code line as readline() returns it."""
+
+    def __init__(self, ser):
+        self.serial = ser
+        self.traces = []
+        self.current = None
+
+    def __getattr__(self, name):
+        return getattr(self.serial, name)
+
+    def readline(self):
+        data = self.serial.readline()
+        now = time.monotonic_ns()
+        line = data.decode(errors="ignore").strip()
+        if line.partition(",")[0].isdigit():
+            self.current = {"line": line, "read": now}
+            self.traces.append(self.current)
+        return data
+
+    def close(self):
+        self.serial.close()
+
+
+def attach_emits(traces, emitted):
+    # No noise on the pty, so the n-th code read is the n-th code sent.
+    # (Matched afterwards: the device thread notes a send only after the
+    # write, and the reader can get there first.)
+    for trace, (t, code) in zip(traces, emitted):
+        if trace["line"] == str(code):
+            trace["emit"] = t
+
+
+def open_device(args, interval):
+    device = VirtualArduino(fmt="code", interval=interval, jitter=args.jitter, count=args.count,
+                            baud=115200, calibration_s=0.1, seed=args.seed)
+    ser = StampedSerial(serial.Serial(device.port, 115200, timeout=0.1))
+    device.start()
+    # Banner and calibration text go by before the frontend sees the port.
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        if "Calibration" in ser.serial.readline().decode(errors="ignore"):
+            break
+    return device, ser
+
+
+def summarize(frontend, setting, traces, stages):
+    done = [t for t in traces if t.get("emit") is not None and "render" in t]
+    result = {"frontend": frontend, "setting": setting, "events": len(done), "lost": len(traces) - len(done),
+              "events_per_s": 0.0, "stages": {}}
+    if done:
+        span = (max(t["render"] for t in done) - min(t["emit"] for t in done)) / 1e9
+        result["events_per_s"] = len(done) / span if span > 0 else 0.0
+    for stage in stages:
+        values = [(t[stage] - t["emit"]) / 1e6 for t in done if stage in t]
+        result["stages"][stage] = {"n": len(values)}
+        for p in (50, 95, 99):
+            result["stages"][stage][f"p{p}_ms"] = percentile(values, p) if values else None
+    return result
+
+
+# -----------------------------
+# Qt frontend (blink_keyboard.py)
+# -----------------------------
+class StampingBackend:
+    """Output sink backend (output_sink.py) that stamps injection, optionally forwards."""
+
+    def __init__(self, ser, inner=None):
+        self.ser = ser
+        self.inner = inner
+
+    def type(self, text):
+        if self.inner:
+            self.inner.type(text)
+        self._stamp()
+
+    def key(self, name):
+        if self.inner:
+            self.inner.key(name)
+        self._stamp()
+
+    def _stamp(self):
+        if self.ser.current is not None:
+            self.ser.current["inject"] = time.monotonic_ns()
+
+
+def import_blink_keyboard():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import blink_keyboard
+    return blink_keyboard
+
+
+def run_qt(args, scan_speed):
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    bk = import_blink_keyboard()
+    app = QApplication.instance() or QApplication([])
+
+    device, ser = open_device(args, args.interval)
+    # Without --real-keys keystrokes are only stamped, so pynput (and a display for it) is not needed.
+    output = OutputSink(StampingBackend(ser, make_backend("pynput") if args.real_keys else None))
+    gui = bk.CenteredBlinkKeyboard(device.port, output=output)
+    if gui.serial:
+        gui.serial.close()
+    gui.serial = ser
+    gui.timer.setInterval(scan_speed)
+    gui.show()
+
+    process_blink, update_display = gui.process_blink, gui.update_display
+
+    def timed_process_blink(*args):
+        if ser.current is not None:
+            ser.current["decode"] = time.monotonic_ns()
+        process_blink(*args)
+
+    def timed_update_display():
+        trace = ser.current
+        if trace is not None and "render" not in trace:
+            trace["transition"] = time.monotonic_ns()
+        update_display()
+        gui.repaint()
+        if trace is not None and "render" not in trace:
+            trace["render"] = time.monotonic_ns()
+
+    gui.process_blink = timed_process_blink
+    gui.update_display = timed_update_display
+
+    idle = [None]
+
+    def check_done():
+        if device.thread.is_alive() or ser.serial.in_waiting:
+            idle[0] = None
+        elif idle[0] is None:
+            idle[0] = time.monotonic()
+        elif time.monotonic() - idle[0] > 0.3 + scan_speed / 1000:
+            app.quit()
+
+    checker = QTimer()
+    checker.timeout.connect(check_done)
+    checker.start(50)
+    app.exec()
+
+    checker.stop()
+    gui.timer.stop()
+    gui.close()
+    ser.close()
+    device.close()
+    attach_emits(ser.traces, device.emitted)
+    return summarize("qt", {"scan_speed_ms": scan_speed}, ser.traces, STAGES)
+
+
+# -----------------------------
+# Streamlit frontend (webs.py)
+# -----------------------------
+class PushReader:
+    """Same interface webs.py uses for its BlinkReader, over the stamped port."""
+
+    def __init__(self, ser):
+        self.serial = ser
+        self.lines = deque()
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            line = self.serial.readline().decode(errors="ignore").strip()
+            if line:
+                # (line, arrival, first blink) like BlinkReader; the pty sends codes, not raw blinks
+                arrived = self.serial.current["read"] if self.serial.current else time.monotonic_ns()
+                self.lines.append((line, arrived, None))
+
+    def drain(self):
+        lines = []
+        while self.lines:
+            lines.append(self.lines.popleft())
+        return lines
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1)
+
+
+def run_streamlit(args, poll_interval, push):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(WEBS, default_timeout=30)
+    at.run()
+    at.sidebar.radio[1].set_value("Push (background reader)" if push else "Timed rerun (legacy)")
+    if not push:
+        at.sidebar.slider[0].set_value(poll_interval)
+    at.run()
+
+    device, ser = open_device(args, args.interval)
+    at.session_state["refresh_stats"]["latency_ms"] = deque()
+    at.session_state["connected"] = True
+    at.session_state["scanning"] = True
+    duration = args.count * args.interval + 5 * args.jitter + 0.5
+    reader = None
+    if push:
+        tick = poll_interval
+        reader = PushReader(ser)
+        at.session_state["reader"] = reader
+        end = time.monotonic() + duration
+        while time.monotonic() < end or reader.lines:
+            start = time.monotonic()
+            at.run()
+            time.sleep(max(tick - (time.monotonic() - start), 0))
+        reader.close()
+    else:
+        at.session_state["serial"] = ser
+        try:
+            at.run(timeout=duration + poll_interval)   # reruns itself until the timeout
+        except RuntimeError:
+            pass
+    latencies = list(at.session_state["refresh_stats"]["latency_ms"])
+    ser.close()
+    device.close()
+
+    # render_keyboard() records (render - arrival) per line, in order, and
+    # the arrival it sees is the readline() stamp.
+    traces = ser.traces
+    attach_emits(traces, device.emitted)
+    for trace, ms in zip(traces, latencies):
+        trace["render"] = trace["read"] + int(ms * 1e6)
+    setting = {"update_mode": "push", "tick_s": poll_interval} if push else \
+        {"update_mode": "legacy", "poll_interval_s": poll_interval}
+    return summarize("streamlit", setting, traces, ("read", "render"))
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def label(result):
+    return f"{result['frontend']} " + " ".join(f"{k}={v}" for k, v in result["setting"].items())
+
+
+def print_result(result):
+    print(f"{label(result)}: {result['events']} events ({result['lost']} lost), "
+          f"{result['events_per_s']:.1f} events/s")
+    for stage, s in result["stages"].items():
+        if s["n"]:
+            print(f"    {stage:<10} p50 {s['p50_ms']:8.2f}  p95 {s['p95_ms']:8.2f}  p99 {s['p99_ms']:8.2f} ms  (n={s['n']})")
+
+
+def compare(results, path):
+    with open(path) as f:
+        old = {label(r): r for r in json.load(f)["results"]}
+    print(f"Change in p95 against {path}:")
+    for result in results:
+        before = old.get(label(result))
+        if not before:
+            continue
+        for stage, s in result["stages"].items():
+            b = before["stages"].get(stage)
+            if b and s["n"] and b["n"]:
+                print(f"    {label(result)} {stage:<10} {b['p95_ms']:8.2f} -> {s['p95_ms']:8.2f} ms "
+                      f"({s['p95_ms'] - b['p95_ms']:+.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blink-to-keystroke latency of the frontends.")
+    parser.add_argument("--frontend", choices=["qt", "streamlit", "all"], default="all")
+    parser.add_argument("--scan-speeds", default="5,20,50,100", help="Qt serial poll periods in ms (poll_ms)")
+    parser.add_argument("--poll-intervals", default="0.05,0.2,0.5", help="webs.py legacy poll_interval values")
+    parser.add_argument("--push-tick", type=float, default=0.05, help="webs.py PUSH_TICK; 0 skips push mode")
+    parser.add_argument("--count", type=int, default=100, help="codes per run")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between codes")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--real-keys", action="store_true", help="also send keystrokes through pynput")
+    parser.add_argument("--json", default=None, help="write results to this file ('-' for stdout)")
+    parser.add_argument("--compare", default=None, help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    results = []
+    if args.frontend in ("qt", "all"):
+        for speed in [int(s) for s in args.scan_speeds.split(",") if s]:
+            results.append(run_qt(args, speed))
+            print_result(results[-1])
+    if args.frontend in ("streamlit", "all"):
+        for poll in [float(s) for s in args.poll_intervals.split(",") if s]:
+            results.append(run_streamlit(args, poll, push=False))
+            print_result(results[-1])
+        if args.push_tick:
+            results.append(run_streamlit(args, args.push_tick, push=True))
+            print_result(results[-1])
+
+    report = {
+        "commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "count": args.count, "interval_s": args.interval, "results": results,
+    }
+    if args.compare:
+        compare(results, args.compare)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+    sys.exit(0 if results and all(r["events"] for r in results) else 1)
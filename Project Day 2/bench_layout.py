@@ -0,0 +1,105 @@
+import sys
+import heapq
+import random
+import argparse
+
+import completion
+import layout_optimizer as lo
+from scan_engine import ScanEngine, EMIT, STRIDE
+
+# -----------------------------
+# Expected vs simulated characters per minute for the current keyboard
+# rows, keyboard.c's alphabetical rows and optimized layouts.
+#
+# The layouts are optimized on the first part of the corpus; the
+# simulation types the held-out rest through the real ScanEngine. The
+# simulated user takes the cheapest code sequence to each key (found on
+# the engine's transition table), code durations get timing jitter, and
+# a code the firmware misses (--miss) is noticed and repeated.
+#
+#   python bench_layout.py --chars 20000 --miss 0.05
+# -----------------------------
+
+
+def key_paths(engine, timing):
+    """Cheapest code sequence from the home position to the commit of every key."""
+    dist, paths = {engine.home: 0.0}, {engine.home: []}
+    heap, out = [(0.0, engine.home)], {}
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist.get(node, float("inf")):
+            continue
+        for code in range(1, STRIDE):
+            action = engine.table[node * STRIDE + code]
+            nd = d + timing[code]
+            if action.kind == EMIT:
+                if nd < out.get(action.key, (float("inf"),))[0]:
+                    out[action.key] = (nd, paths[node] + [code])
+            elif action.node != node and nd < dist.get(action.node, float("inf")):
+                dist[action.node] = nd
+                paths[action.node] = paths[node] + [code]
+                heapq.heappush(heap, (nd, action.node))
+    return {key: path for key, (_, path) in out.items()}
+
+
+def simulate(rows, first_row, allow_back, text_keys, miss, jitter, seed):
+    engine = ScanEngine(rows, first_row=first_row, allow_back=allow_back)
+    timing = {code: lo.code_time(code) for code in range(1, STRIDE)}
+    paths = key_paths(engine, timing)
+    rng = random.Random(seed)
+    state = engine.new_state()
+    seconds = blinks = typed = 0
+    for key in text_keys:
+        if key not in paths:
+            continue                    # not on this layout
+        for code in paths[key]:
+            while True:
+                seconds += max(timing[code] + rng.gauss(0, jitter), 0.0)
+                blinks += code + 1
+                if rng.random() >= miss:
+                    break
+            action = engine.step(state, code)
+        assert action.kind == EMIT and action.key == key
+        typed += 1
+    return {"blinks_per_char": blinks / typed, "chars_per_minute": 60 * typed / seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scanning layouts by expected and simulated speed.")
+    parser.add_argument("--corpus", default=None, help="text file (default: Python docs text)")
+    parser.add_argument("--chars", type=int, default=20000, help="held-out characters to simulate")
+    parser.add_argument("--miss", type=float, default=0.0, help="probability a code is missed and repeated")
+    parser.add_argument("--jitter", type=float, default=0.2, help="std-dev of a code's duration, seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = completion.standin_corpus()
+    split = int(len(text) * 0.8)
+    train, test = text[:split], text[split:]
+    freqs = lo.char_frequencies(train)
+    test_freqs = lo.char_frequencies(test)
+    keys = set(lo.DEFAULT_KEYS)
+    test_keys = [lo.SPECIAL.get(ch, ch) for ch in test.upper()]
+    test_keys = [k for k in test_keys if k in keys][:args.chars]
+
+    layouts = [
+        ("QWERTY rows (Qt)", lo.QWERTY, 1, False),
+        ("QWERTY rows (webs.py)", lo.QWERTY, 0, True),
+        ("keyboard.c alphabetical", lo.ALPHABETICAL, 0, False),
+        ("huffman", lo.optimize(freqs, "huffman"), 0, False),
+        ("search", lo.optimize(freqs, "search"), 0, False),
+        ("search, back code", lo.optimize(freqs, "search", allow_back=True), 0, True),
+    ]
+    print(f"{len(test_keys)} held-out characters, code times: advance {lo.code_time(1):.2f} s, "
+          f"select {lo.code_time(2):.2f} s, back {lo.code_time(3):.2f} s")
+    print(f"{'layout':<26}{'expected':>22}{'simulated':>22}  unreachable")
+    for name, rows, first_row, back in layouts:
+        exp = lo.expected_cost(rows, test_freqs, first_row, back)
+        sim = simulate(rows, first_row, back, test_keys, args.miss, args.jitter, args.seed)
+        print(f"{name:<26}{exp['chars_per_minute']:8.2f} cpm {exp['blinks_per_char']:5.1f} b/ch"
+              f"{sim['chars_per_minute']:8.2f} cpm {sim['blinks_per_char']:5.1f} b/ch  {exp['unreachable']:6.1%}")
+    sys.exit(0)
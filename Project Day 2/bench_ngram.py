@@ -0,0 +1,71 @@
+import sys
+import time
+import argparse
+
+import completion
+import ngram
+import layout_optimizer as lo
+from bench_serial import percentile
+
+# -----------------------------
+# Adaptive key order: blinks per character on held-out text with the
+# keys re-ranked after every commit, and the cost of re-ranking.
+#
+# Uses the Qt rules on the QWERTY rows (row 0 not scanned); a key costs
+# what layout_optimizer.position_cost() says for the slot it is on when
+# it is typed. "learning" also feeds every typed key to observe().
+#
+#   python bench_ngram.py --chars 20000
+# -----------------------------
+
+
+def type_text(layout, keys, learn):
+    shape = [len(r) for r in lo.QWERTY]
+    blinks = seconds = 0.0
+    typed = ""
+    times = []
+    for key in keys:
+        start = time.perf_counter_ns()
+        rows = layout.arrange(typed) if layout else lo.QWERTY
+        times.append((time.perf_counter_ns() - start) / 1e3)
+        pos = next(((r, c) for r in range(1, len(rows)) for c, k in enumerate(rows[r]) if k == key), None)
+        if pos is None:
+            continue
+        b, s = lo.position_cost(pos[0], pos[1], shape, first_row=1)
+        blinks += b
+        seconds += s
+        if learn and layout:
+            layout.model.observe(typed, key)
+        typed = (typed + ngram.key_char(key))[-16:]
+    return blinks / len(keys), 60 * len(keys) / seconds, times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark context-adaptive key order.")
+    parser.add_argument("--corpus", default=None, help="text file (default: Python docs text)")
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--order", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = completion.standin_corpus()
+    split = int(len(text) * 0.8)
+    test_keys = [lo.SPECIAL.get(ch, ch) for ch in text[split:].upper()]
+    test_keys = [k for k in test_keys if k in set(lo.DEFAULT_KEYS) and k not in lo.DIGITS][:args.chars]
+
+    print(f"{len(test_keys)} held-out characters, QWERTY rows, Qt scan rules")
+    b, cpm, _ = type_text(None, test_keys, False)
+    print(f"  {'static':<26} {b:5.2f} blinks/char  {cpm:5.2f} chars/min")
+    for mode in ("within_rows", "global"):
+        for learn in (False, True):
+            model = ngram.CharModel(args.order)
+            model.learn_text(text[:split])
+            layout = ngram.AdaptiveLayout(lo.QWERTY, model, first_row=1, mode=mode)
+            b, cpm, times = type_text(layout, test_keys, learn)
+            name = mode + (" + learning" if learn else "")
+            print(f"  {name:<26} {b:5.2f} blinks/char  {cpm:5.2f} chars/min   re-rank p50 {percentile(times, 50):5.1f} us,"
+                  f" p99 {percentile(times, 99):5.1f} us, cache hits {model.hits / max(model.hits + model.misses, 1):.0%}")
+    sys.exit(0)
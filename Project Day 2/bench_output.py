@@ -0,0 +1,95 @@
+import sys
+import time
+import argparse
+
+from output_sink import OutputSink, NullBackend, batches
+from bench_serial import percentile
+
+# -----------------------------
+# Keystroke output benchmark
+#
+# A null backend whose every call takes --cost ms (an OS input path that
+# is slow to return) gets a stream of keys: letters, spaces and now and
+# then a word completion, one every --interval ms.
+#
+#   direct      backend called on the caller's thread (what blink_keyboard.py did)
+#   sink        OutputSink, one backend call per queued item
+#   sink batch  OutputSink coalescing whatever queued up meanwhile
+#
+# "caller" is how long the caller (the GUI thread) is held per item,
+# "latency" is queued -> sent per keystroke.
+#
+#   python bench_output.py --cost 2 --interval 1 --items 500
+# -----------------------------
+
+WORDS = ["the ", "and ", "keyboard ", "blink ", "hello "]
+
+
+def workload(n):
+    items = []
+    for i in range(n):
+        if i % 25 == 24:
+            items.append(("type", WORDS[i % len(WORDS)]))     # accepted completion
+        elif i % 6 == 5:
+            items.append(("key", "space"))
+        else:
+            items.append(("type", "etaoinshr"[i % 9]))
+    return items
+
+
+def pace(start, i, interval_ms):
+    wait = start + i * interval_ms / 1e3 - time.perf_counter()
+    if wait > 0:
+        time.sleep(wait)
+
+
+def run_direct(items, cost_ms, interval_ms):
+    backend = NullBackend(cost_ms)
+    held, latency = [], []
+    start = time.perf_counter()
+    for i, (kind, value) in enumerate(items):
+        pace(start, i, interval_ms)
+        t = time.perf_counter_ns()
+        for kind, value, queued in batches([(kind, value, t)]):
+            backend.type(value) if kind == "type" else backend.key(value)
+            done = time.perf_counter_ns()
+            latency.extend((done - q) / 1e6 for q in queued)
+        held.append((time.perf_counter_ns() - t) / 1e6)
+    return held, latency, backend.calls, time.perf_counter() - start
+
+
+def run_sink(items, cost_ms, interval_ms, batch):
+    sink = OutputSink(NullBackend(cost_ms), batch=batch)
+    held = []
+    start = time.perf_counter()
+    for i, (kind, value) in enumerate(items):
+        pace(start, i, interval_ms)
+        t = time.perf_counter_ns()
+        sink.text(value) if kind == "type" else sink.key(value)
+        held.append((time.perf_counter_ns() - t) / 1e6)
+    sink.flush()
+    elapsed = time.perf_counter() - start
+    sink.close()
+    return held, [ns / 1e6 for ns in sink.latency_ns], sink.backend.calls, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keystroke output.")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--cost", type=float, default=2.0, help="ms per backend call")
+    parser.add_argument("--interval", type=float, default=1.0, help="ms between items")
+    args = parser.parse_args()
+
+    items = workload(args.items)
+    keystrokes = sum(len(v) if k == "type" else 1 for k, v in items)
+    print(f"{len(items)} items ({keystrokes} keystrokes), {args.cost} ms per backend call, "
+          f"one item every {args.interval} ms")
+    runs = [("direct", lambda: run_direct(items, args.cost, args.interval)),
+            ("sink", lambda: run_sink(items, args.cost, args.interval, False)),
+            ("sink batch", lambda: run_sink(items, args.cost, args.interval, True))]
+    for name, run in runs:
+        held, latency, calls, elapsed = run()
+        print(f"  {name:<11} caller p50 {percentile(held, 50):7.3f} ms, max {max(held):6.2f} ms   "
+              f"latency p50 {percentile(latency, 50):7.2f} ms, p99 {percentile(latency, 99):7.2f} ms   "
+              f"{calls:4d} calls, done in {elapsed:.2f} s")
+    sys.exit(0)
@@ -0,0 +1,98 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import protocol
+
+# -----------------------------
+# Parser throughput for the binary frame protocol, against the current
+# way of reading text lines one readline().decode().strip() at a time.
+#
+#   python bench_protocol.py --seconds 600 --chunk 4096
+# -----------------------------
+
+
+def build_stream(fs, seconds, seed=3):
+    """`seconds` of 500 Hz samples with a blink code every ~2 s and a status text."""
+    rng = np.random.default_rng(seed)
+    n = int(fs * seconds)
+    eog = rng.integers(300, 700, n)
+    emg = rng.integers(0, 1024, n)
+    parts = [protocol.encode_text(0, "EMG + EOG 4th-Order Butterworth Ready!")]
+    seq, step = 1, 2 * fs
+    for start in range(0, n, step):
+        parts.append(protocol.encode_samples(seq, eog[start:start + step], emg[start:start + step]))
+        seq += len(eog[start:start + step])
+        parts.append(protocol.encode_event(seq, int(rng.integers(1, 4)), float(rng.random())))
+        seq += 1
+    text = "".join(f"{a},{b}\n" for a, b in zip(eog.tolist(), emg.tolist())).encode()
+    return b"".join(parts), text, n
+
+
+def drop_frames(stream, count, seed=4):
+    """Cut `count` whole sample frames out of the stream (a lossy link)."""
+    rng = np.random.default_rng(seed)
+    a = np.frombuffer(stream, dtype=np.uint8)
+    starts = np.flatnonzero((a[:-1] == 0xA5) & (a[1:] == 0x5A) & (np.roll(a, -4)[:-1] == protocol.FRAME_SAMPLE))
+    victims = set(rng.choice(starts[1:-1], count, replace=False).tolist())
+    out, last = [], 0
+    for s in sorted(victims):
+        out.append(stream[last:s])
+        last = s + protocol.SAMPLE_FRAME_SIZE
+    out.append(stream[last:])
+    return b"".join(out)
+
+
+def bench_binary(stream, chunk):
+    decoder = protocol.FrameDecoder()
+    samples = events = 0
+    start = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        out = decoder.feed(stream[i:i + chunk])
+        samples += len(out.samples)
+        events += len(out.events)
+    elapsed = time.perf_counter() - start
+    return elapsed, samples, events, decoder
+
+
+def bench_lines(text):
+    # What blink_keyboard.py / webs.py do per line, minus the serial port.
+    lines = text.splitlines(keepends=True)
+    samples = 0
+    start = time.perf_counter()
+    for raw in lines:
+        line = raw.decode(errors="ignore").strip()
+        eog, _, emg = line.partition(",")
+        if eog.isdigit():
+            int(eog), float(emg)
+            samples += 1
+    return time.perf_counter() - start, samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the binary frame parser.")
+    parser.add_argument("--fs", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--chunk", type=int, default=0, help="read() size; default tries several")
+    parser.add_argument("--drop", type=int, default=250, help="frames to remove for the gap check")
+    args = parser.parse_args()
+
+    stream, text, n = build_stream(args.fs, args.seconds)
+    mb = len(stream) / 1e6
+    print(f"{args.seconds:.0f} s at {args.fs} Hz: {n} samples, {len(stream)} bytes binary, {len(text)} bytes as text")
+
+    for chunk in ([args.chunk] if args.chunk else [64, 512, 4096, 65536]):
+        elapsed, samples, events, decoder = bench_binary(stream, chunk)
+        ok = samples == n and decoder.dropped == 0 and decoder.bad_checksum == 0
+        print(f"  binary, {chunk:>6}-byte reads: {mb / elapsed:8.1f} MB/s, {samples / elapsed / 1e6:6.2f} M samples/s"
+              f"{'' if ok else '  (DECODE ERROR)'}")
+
+    elapsed, samples = bench_lines(text)
+    print(f"  text lines, readline style: {len(text) / 1e6 / elapsed:8.1f} MB/s, {samples / elapsed / 1e6:6.2f} M samples/s")
+
+    lossy = drop_frames(stream, args.drop)
+    _, samples, _, decoder = bench_binary(lossy, 4096)
+    print(f"Gap detection: removed {args.drop} frames, decoder reports {decoder.dropped} dropped "
+          f"({samples} samples decoded)")
+    sys.exit(0 if decoder.dropped == args.drop else 1)
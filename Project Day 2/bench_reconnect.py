@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+
+import serial.tools.list_ports
+
+from device_manager import DeviceScanner
+from transport import open_serial
+from virtual_arduino import VirtualArduino
+from bench_serial import percentile
+
+# -----------------------------
+# Port discovery and reconnect benchmark
+#
+#   discovery   comports() on every call (what find_arduino_port did)
+#               vs DeviceScanner.ports() with an unchanged /dev
+#   reconnect   a virtual Arduino behind a fixed symlink is unplugged
+#               (pty closed) and plugged back in after --down seconds;
+#               the port from transport.open_serial() is read the whole
+#               time. Reported: loss -> reopen (ReconnectingSerial's own
+#               measure) and replug -> first line read again.
+#
+#   python bench_reconnect.py --cycles 5 --down 0.5
+# -----------------------------
+
+
+def time_calls(fn, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter_ns()
+        fn()
+        times.append((time.perf_counter_ns() - start) / 1e3)
+    return times
+
+
+def device(link):
+    dev = VirtualArduino(interval=0.05, jitter=0, calibration_s=0, seed=1)
+    dev.make_link(link)
+    return dev.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark port discovery and reconnects.")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--down", type=float, default=0.5, help="seconds the device stays unplugged")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    scanner = DeviceScanner()
+    raw = time_calls(serial.tools.list_ports.comports, args.calls)
+    cached = time_calls(scanner.ports, args.calls)
+    print(f"discovery ({args.calls} calls): comports() p50 {percentile(raw, 50):8.1f} us   "
+          f"cached p50 {percentile(cached, 50):6.1f} us   ({scanner.enumerations} enumeration)")
+
+    link = os.path.join(tempfile.mkdtemp(), "arduino")
+    dev = device(link)
+    ser = open_serial(link, 115200, timeout=0.05)
+    lines = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            if ser.readline().strip():
+                lines.append(time.monotonic())
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    back = []
+    for _ in range(args.cycles):
+        time.sleep(0.3)
+        dev.close()                         # unplug
+        time.sleep(args.down)
+        seen = len(lines)
+        dev = device(link)                  # plug back in
+        plugged = time.monotonic()
+        deadline = plugged + 10
+        while len(lines) == seen and time.monotonic() < deadline:
+            time.sleep(0.005)
+        back.append((lines[-1] - plugged) * 1e3 if len(lines) > seen else float("inf"))
+    stop.set()
+    reader.join(1)
+    stats = ser.stats()
+    ser.close()
+    dev.close()
+
+    print(f"reconnect ({args.cycles} unplugs, {args.down:.1f} s down): {stats['reconnects']} reconnects in "
+          f"{stats['attempts']} attempts, loss -> reopen p50 {stats['p50_ms']:.0f} ms, max {stats['max_ms']:.0f} ms")
+    print(f"  replug -> first line: p50 {percentile(back, 50):.0f} ms, max {max(back):.0f} ms")
+    sys.exit(0)
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel
+
+from keyboard_widget import KeyboardWidget
+from scan_engine import ScanEngine
+from bench_serial import percentile
+
+# -----------------------------
+# Render cost per blink: the old grid of QLabels restyled with
+# setStyleSheet() on every update, against keyboard_widget.py.
+# Each step moves the highlight and waits for the paint to finish.
+#
+#   python bench_render.py --steps 100
+# -----------------------------
+
+keyboard_rows = [
+    list("1234567890"),
+    list("QWERTYUIOP"),
+    list("ASDFGHJKL"),
+    list("ZXCVBNM"),
+    ["SPACE", "DEL", "ENTER"]
+]
+
+
+class LabelGrid(QWidget):
+    """update_display() as blink_keyboard.py had it before keyboard_widget.py."""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.setStyleSheet("background-color: black;")
+        layout = QVBoxLayout()
+        self.labels = []
+        for row_items in rows:
+            hbox = QHBoxLayout()
+            label_row = []
+            for item in row_items:
+                lbl = QLabel(item)
+                lbl.setFixedSize(60, 60)
+                lbl.setStyleSheet("color:white; border:1px solid #555; background:#111;")
+                hbox.addWidget(lbl)
+                label_row.append(lbl)
+            layout.addLayout(hbox)
+            self.labels.append(label_row)
+        self.setLayout(layout)
+
+    def set_highlight(self, row, col, selecting_row):
+        for r, row_items in enumerate(self.labels):
+            for c, lbl in enumerate(row_items):
+                highlight = (selecting_row and r == row) or (not selecting_row and r == row and c == col)
+                lbl.setStyleSheet("color:white; border:2px solid #0f0; background:#333;" if highlight else "color:white; border:1px solid #555; background:#111;")
+
+
+def run(app, widget, steps):
+    engine = ScanEngine(keyboard_rows, first_row=1, allow_back=False)
+    state = engine.new_state()
+    codes = [1, 1, 2, 1, 1, 1, 2, 1, 2]
+    widget.show()
+    app.processEvents()
+    times = []
+    for i in range(steps):
+        engine.step(state, codes[i % len(codes)])
+        start = time.perf_counter_ns()
+        widget.set_highlight(state.row, state.col, state.selecting_row)
+        app.processEvents()
+        times.append((time.perf_counter_ns() - start) / 1e6)
+    widget.close()
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-blink render cost of the Qt keyboards.")
+    parser.add_argument("--steps", type=int, default=100)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    for name, widget in (("QLabel + setStyleSheet", LabelGrid(keyboard_rows)),
+                         ("KeyboardWidget", KeyboardWidget(keyboard_rows))):
+        times = run(app, widget, args.steps)
+        print(f"{name:<24} p50 {percentile(times, 50):6.3f} ms  p95 {percentile(times, 95):6.3f} ms  "
+              f"p99 {percentile(times, 99):6.3f} ms")
+        if isinstance(widget, KeyboardWidget):
+            stats = widget.frame_stats()
+            print(f"{'':<24} paintEvent p50 {stats['p50_ms']:.3f} ms, {stats['keys_per_paint']:.1f} keys per paint")
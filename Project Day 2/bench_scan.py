@@ -0,0 +1,111 @@
+import sys
+import time
+import random
+import argparse
+
+from scan_engine import ScanEngine, EMIT
+
+# -----------------------------
+# Checks scan_engine against the row/column logic the keyboards used to
+# carry inline, then measures transitions per second.
+#
+#   python bench_scan.py --steps 5000000
+# -----------------------------
+
+keyboard_rows = [
+    list("1234567890"),
+    list("QWERTYUIOP"),
+    list("ASDFGHJKL"),
+    list("ZXCVBNM"),
+    ["SPACE", "DEL", "ENTER"]
+]
+
+
+def legacy_qt(codes):
+    """process_blink() from blink_keyboard.py before scan_engine (no text side effects)."""
+    row, col, selecting_row, out = 1, 0, True, []
+    for blink in codes:
+        if blink == 1:
+            if selecting_row:
+                row = (row + 1) % len(keyboard_rows)
+                if row == 0: row = 1
+            else:
+                col = (col + 1) % len(keyboard_rows[row])
+        elif blink == 2:
+            if selecting_row:
+                selecting_row, col = False, 0
+            else:
+                out.append(keyboard_rows[row][col])
+                selecting_row, row, col = True, 1, 0
+        out.append((row, col, selecting_row))
+    return out
+
+
+def legacy_web(codes):
+    """process_blink_code() from webs.py before scan_engine."""
+    row, col, selecting_row, out = 0, 0, True, []
+    for blink in codes:
+        if blink == 1:
+            if selecting_row:
+                row = (row + 1) % len(keyboard_rows)
+            else:
+                col = (col + 1) % len(keyboard_rows[row])
+        elif blink == 2:
+            if selecting_row:
+                selecting_row, col = False, 0
+            else:
+                out.append(keyboard_rows[row][col])
+                selecting_row, row, col = True, 0, 0
+        elif blink == 3:
+            if selecting_row:
+                row = (row - 1) % len(keyboard_rows)
+            else:
+                col = (col - 1) % len(keyboard_rows[row])
+        out.append((row, col, selecting_row))
+    return out
+
+
+def engine_trace(engine, codes):
+    state, out = engine.new_state(), []
+    for blink in codes:
+        action = engine.step(state, blink)
+        if action.kind == EMIT:
+            out.append(action.key)
+        out.append((state.row, state.col, state.selecting_row))
+    return out
+
+
+def check_equivalence(n, seed=5):
+    rng = random.Random(seed)
+    codes = [rng.choice((1, 1, 1, 2, 2, 3, 0, 4)) for _ in range(n)]
+    qt = engine_trace(ScanEngine(keyboard_rows, first_row=1, allow_back=False), codes) == legacy_qt(codes)
+    web = engine_trace(ScanEngine(keyboard_rows), codes) == legacy_web(codes)
+    return qt, web
+
+
+def throughput(steps, seed=6):
+    engine = ScanEngine(keyboard_rows)
+    rng = random.Random(seed)
+    codes = [rng.choice((1, 1, 1, 2, 2, 3)) for _ in range(4096)]
+    state = engine.new_state()
+    step = engine.step
+    loops = max(steps // len(codes), 1)
+    start = time.perf_counter()
+    for _ in range(loops):
+        for code in codes:
+            step(state, code)
+    elapsed = time.perf_counter() - start
+    return loops * len(codes) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark the scanning state machine.")
+    parser.add_argument("--steps", type=int, default=2_000_000)
+    parser.add_argument("--check", type=int, default=100_000, help="random codes for the equivalence check")
+    args = parser.parse_args()
+
+    qt, web = check_equivalence(args.check)
+    print(f"Same positions and keys as the old inline logic: Qt {'yes' if qt else 'NO'}, webs.py {'yes' if web else 'NO'}")
+    rate = throughput(args.steps)
+    print(f"step(): {rate / 1e6:.2f} M transitions/s ({1e9 / rate:.0f} ns each)")
+    sys.exit(0 if qt and web else 1)
@@ -0,0 +1,122 @@
+import os
+import sys
+import math
+import time
+import argparse
+
+from scheduler import ScanScheduler
+from bench_serial import percentile
+
+# -----------------------------
+# Auto scan timing: chained intervals vs the absolute-deadline scheduler.
+#
+#   sleep chain      sleep(dwell) after every step (what a simple loop does)
+#   sleep deadline   ScanScheduler: sleep until the next deadline, catch up
+#   qt chain         single-shot QTimer restarted with `dwell` after every step
+#   qt deadline      single-shot precise QTimer armed for the next deadline
+#                    (what blink_keyboard.py does)
+#
+# Every step does --work ms of work (the repaint) before the timer is
+# re-armed. Drift is how far the last step is from start + n * dwell;
+# lateness is each step's distance from its own deadline.
+#
+#   python bench_scheduler.py --dwell 20 50 100 --seconds 2
+# -----------------------------
+
+
+def busy(ms):
+    end = time.perf_counter() + ms / 1e3
+    while time.perf_counter() < end:
+        pass
+
+
+def summarize(start, times, dwell_ms):
+    dwell = dwell_ms * 1e6
+    late = [(t - (start + (i + 1) * dwell)) / 1e6 for i, t in enumerate(times)]
+    intervals = [(b - a) / 1e6 for a, b in zip([start] + times, times)]
+    mean = sum(intervals) / len(intervals)
+    sd = math.sqrt(sum((x - mean) ** 2 for x in intervals) / len(intervals))
+    return {"steps": len(times), "drift_ms": late[-1], "late_p50_ms": percentile(late, 50),
+            "late_p99_ms": percentile(late, 99), "interval_sd_ms": sd}
+
+
+def sleep_chain(dwell_ms, steps, work_ms):
+    start = time.monotonic_ns()
+    times = []
+    for _ in range(steps):
+        time.sleep(dwell_ms / 1e3)
+        times.append(time.monotonic_ns())
+        busy(work_ms)
+    return start, times
+
+
+def sleep_deadline(dwell_ms, steps, work_ms):
+    sched = ScanScheduler(dwell_ms)
+    start = sched.origin
+    times = []
+    while len(times) < steps:
+        time.sleep(sched.ms_until_next() / 1e3)
+        now = time.monotonic_ns()
+        for _ in range(sched.due(now)):
+            times.append(now)
+        busy(work_ms)
+    return start, times[:steps]
+
+
+def qt_run(dwell_ms, steps, work_ms, deadline):
+    from PySide6.QtCore import QTimer, QEventLoop, Qt
+    sched = ScanScheduler(dwell_ms)
+    start = sched.origin
+    times = []
+    timer = QTimer()
+    timer.setSingleShot(True)
+    loop = QEventLoop()
+
+    def fire():
+        now = time.monotonic_ns()
+        if deadline:
+            for _ in range(sched.due(now)):
+                times.append(now)
+        else:
+            times.append(now)
+        busy(work_ms)
+        if len(times) >= steps:
+            loop.quit()
+        elif deadline:
+            timer.start(math.ceil(sched.ms_until_next()))
+        else:
+            timer.start(dwell_ms)
+
+    if deadline:
+        timer.setTimerType(Qt.PreciseTimer)
+    timer.timeout.connect(fire)
+    timer.start(math.ceil(sched.ms_until_next()) if deadline else dwell_ms)
+    loop.exec()
+    return start, times[:steps]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark auto scan timing.")
+    parser.add_argument("--dwell", type=int, nargs="+", default=[20, 50, 100], help="dwell times, ms")
+    parser.add_argument("--seconds", type=float, default=2.0, help="run length per dwell")
+    parser.add_argument("--work", type=float, default=2.0, help="ms of work per step")
+    parser.add_argument("--no-qt", action="store_true")
+    args = parser.parse_args()
+
+    runs = [("sleep chain", lambda d, n: sleep_chain(d, n, args.work)),
+            ("sleep deadline", lambda d, n: sleep_deadline(d, n, args.work))]
+    if not args.no_qt:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtCore import QCoreApplication
+        app = QCoreApplication(sys.argv)
+        runs += [("qt chain", lambda d, n: qt_run(d, n, args.work, False)),
+                 ("qt deadline", lambda d, n: qt_run(d, n, args.work, True))]
+
+    for dwell in args.dwell:
+        steps = max(int(args.seconds * 1000 / dwell), 2)
+        print(f"dwell {dwell} ms, {steps} steps, {args.work} ms work per step")
+        for name, run in runs:
+            r = summarize(*run(dwell, steps), dwell)
+            print(f"  {name:<16} drift {r['drift_ms']:8.2f} ms   late p50 {r['late_p50_ms']:6.2f} ms, "
+                  f"p99 {r['late_p99_ms']:6.2f} ms   interval sd {r['interval_sd_ms']:5.2f} ms")
+    sys.exit(0)
@@ -0,0 +1,101 @@
+import sys
+import time
+import argparse
+
+import completion
+import ngram
+import layout_optimizer as lo
+from scan_engine import ScanEngine, EMIT, STRIDE
+from partition_engine import PartitionEngine, key_weights
+from bench_layout import key_paths
+from bench_serial import percentile
+
+# -----------------------------
+# Selection mode simulator: average blinks (and time) per character for
+# the row/column scan and for binary/ternary partition selection.
+#
+# Held-out text is typed through the real engines on the QWERTY rows:
+# the scan takes the cheapest code sequence to each key, the partition
+# engines the path down their tree. "static" partitions are weighted by
+# the training text's character frequencies; "context" ones are rebuilt
+# before every key from ngram.CharModel's next-letter scores.
+#
+#   python bench_selection.py --chars 20000
+# -----------------------------
+
+
+def type_scan(rows, first_row, allow_back, keys):
+    engine = ScanEngine(rows, first_row=first_row, allow_back=allow_back)
+    timing = {code: lo.code_time(code) for code in range(1, STRIDE)}
+    paths = key_paths(engine, timing)
+    state = engine.new_state()
+    blinks = seconds = typed = 0
+    for key in keys:
+        if key not in paths:
+            continue                    # not reachable with these rules
+        for code in paths[key]:
+            action = engine.step(state, code)
+            blinks += code + 1
+            seconds += timing[code]
+        assert action.kind == EMIT and action.key == key
+        typed += 1
+    return blinks, seconds, typed, []
+
+
+def type_partition(arity, keys, freqs=None, model=None):
+    engine = PartitionEngine(lo.QWERTY, arity, freqs)
+    state = engine.new_state()
+    blinks = seconds = typed = 0
+    text, build_us = "", []
+    for key in keys:
+        if model:
+            start = time.perf_counter_ns()
+            engine.set_weights(key_weights(engine.position, model.scores(text)))
+            build_us.append((time.perf_counter_ns() - start) / 1e3)
+            engine.reset(state)
+        for code in engine.path(key):
+            action = engine.step(state, code)
+            blinks += code + 1
+            seconds += lo.code_time(code)
+        assert action.kind == EMIT and action.key == key
+        typed += 1
+        text = (text + ngram.key_char(key))[-16:]
+    return blinks, seconds, typed, build_us
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate blinks per character for each selection mode.")
+    parser.add_argument("--corpus", default=None, help="text file (default: Python docs text)")
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--order", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = completion.standin_corpus()
+    split = int(len(text) * 0.8)
+    freqs = lo.char_frequencies(text[:split])
+    model = ngram.CharModel(args.order)
+    model.learn_text(text[:split])
+    test_keys = [lo.SPECIAL.get(ch, ch) for ch in text[split:].upper()]
+    test_keys = [k for k in test_keys if k in set(lo.DEFAULT_KEYS)][:args.chars]
+
+    runs = [
+        ("scan (Qt rules)", lambda: type_scan(lo.QWERTY, 1, False, test_keys)),
+        ("scan (webs.py rules)", lambda: type_scan(lo.QWERTY, 0, True, test_keys)),
+        ("binary, static", lambda: type_partition(2, test_keys, freqs)),
+        ("ternary, static", lambda: type_partition(3, test_keys, freqs)),
+        ("binary, context", lambda: type_partition(2, test_keys, model=model)),
+        ("ternary, context", lambda: type_partition(3, test_keys, model=model)),
+    ]
+    print(f"{len(test_keys)} held-out characters, QWERTY keys")
+    for name, run in runs:
+        blinks, seconds, typed, build_us = run()
+        line = (f"  {name:<22} {blinks / typed:5.2f} blinks/char  {60 * typed / seconds:5.2f} chars/min"
+                f"  {1 - typed / len(test_keys):6.1%} unreachable")
+        if build_us:
+            line += f"   rebuild p50 {percentile(build_us, 50):5.0f} us"
+        print(line)
+    sys.exit(0)
@@ -0,0 +1,95 @@
+import sys
+import time
+import argparse
+
+import serial
+
+from virtual_arduino import VirtualArduino
+
+# -----------------------------
+# Load test of the real pyserial read path against virtual_arduino.py.
+# Reads the way the frontends do (readline with timeout=0.1) and reports
+# delivered codes, lines lost to noise and emit -> readline latency.
+#
+#   python bench_serial.py --interval 0.01 --count 5000 --noise 0.02
+# -----------------------------
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run(fmt, interval, jitter, count, noise, baud, poll):
+    device = VirtualArduino(fmt=fmt, interval=interval, jitter=jitter, count=count,
+                            noise=noise, baud=baud, calibration_s=0.1, seed=1)
+    ser = serial.Serial(device.port, 115200, timeout=0.1)
+    # Latency is matched on the line text; with "code_emg" the EMG digits make
+    # lines nearly unique, so a line lost to noise does not shift the rest.
+    sent = {}
+    emitted = [0]
+
+    def on_emit(t, code, line):
+        sent.setdefault(line, []).append(t)
+        emitted[0] += 1
+
+    device.on_emit = on_emit
+    device.start()
+
+    received, latencies, bad = 0, [], 0
+    start = time.monotonic()
+    idle_since = None
+    while True:
+        if poll:
+            time.sleep(poll)   # frontends that poll on a timer
+        if not ser.in_waiting:
+            if not device.thread.is_alive():
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > 0.3:
+                    break
+            if not poll:
+                time.sleep(0.001)
+            continue
+        idle_since = None
+        while ser.in_waiting:
+            line = ser.readline().decode(errors="ignore").strip()
+            now = time.monotonic_ns()
+            head = line.partition(",")[0]
+            if head.isdigit():
+                if sent.get(line):
+                    # Latest send of this text; older copies were lost on the way.
+                    latencies.append((now - sent[line][-1]) / 1e6)
+                    sent[line] = []
+                received += 1
+            elif line and "Ready" not in line and "Calibration" not in line:
+                bad += 1
+    elapsed = time.monotonic() - start
+    ser.close()
+    device.close()
+    return {
+        "sent": emitted[0], "received": received, "bad_lines": bad,
+        "codes_per_s": received / elapsed,
+        "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the pyserial path with a virtual Arduino.")
+    parser.add_argument("--format", choices=["code", "code_emg"], default="code_emg")
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.002)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--poll", type=float, default=0.02, help="timer period of the reader (0 = busy)")
+    args = parser.parse_args()
+
+    result = run(args.format, args.interval, args.jitter, args.count, args.noise, args.baud, args.poll)
+    print(f"sent {result['sent']}, received {result['received']}, bad lines {result['bad_lines']}, "
+          f"{result['codes_per_s']:.0f} codes/s")
+    print(f"emit -> readline latency: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+          f"p99 {result['p99_ms']:.2f} ms")
+    sys.exit(0 if result["received"] else 1)
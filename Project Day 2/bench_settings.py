@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+
+from settings_store import SettingsStore, SETTINGS_FILE
+from bench_serial import percentile
+
+# -----------------------------
+# Settings store benchmark
+#
+#   per tick    what a frontend pays to notice a change: json.load() of
+#               the file every time vs SettingsStore.refresh() (one stat()
+#               while the file is unchanged)
+#   save        SettingsStore.save() (temp file, fsync, rename)
+#   pick-up     save in one store -> refresh() in another store polling
+#               every --poll ms sees it (what blink_keyboard.py does)
+#
+#   python bench_settings.py --calls 2000 --poll 20
+# -----------------------------
+
+
+def time_calls(fn, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter_ns()
+        fn()
+        times.append((time.perf_counter_ns() - start) / 1e3)
+    return times
+
+
+def parse(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the settings store.")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--saves", type=int, default=20)
+    parser.add_argument("--poll", type=float, default=20.0, help="poll interval of the reader, ms")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "settings.json")
+    with open(SETTINGS_FILE) as src, open(path, "w") as dst:
+        dst.write(src.read())
+    reader = SettingsStore(path, legacy=None)
+    writer = SettingsStore(path, legacy=None)
+
+    loads = time_calls(lambda: parse(path), args.calls)
+    refreshes = time_calls(reader.refresh, args.calls)
+    print(f"per tick ({args.calls} calls): json.load p50 {percentile(loads, 50):6.1f} us   "
+          f"refresh() p50 {percentile(refreshes, 50):5.1f} us   ({reader.reads} read)")
+
+    saves, pickup = [], []
+    for i in range(args.saves):
+        start = time.perf_counter()
+        writer.save(scan_speed=400 + 10 * i)
+        saves.append((time.perf_counter() - start) * 1e3)
+        time.sleep(args.poll / 1e3 * (i % 5) / 5)       # the save lands anywhere in the reader's period
+        while "scan_speed" not in reader.refresh():
+            time.sleep(args.poll / 1e3)
+        pickup.append((time.perf_counter() - start) * 1e3)
+    print(f"save ({args.saves}): p50 {percentile(saves, 50):.2f} ms, max {max(saves):.2f} ms")
+    print(f"pick-up at {args.poll:.0f} ms polling: p50 {percentile(pickup, 50):.1f} ms, max {max(pickup):.1f} ms")
+    sys.exit(0)
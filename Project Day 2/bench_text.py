@@ -0,0 +1,133 @@
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+import completion
+from text_buffer import TextBuffer, CONTEXT_CHARS
+
+# -----------------------------
+# Typed text: a str grown with += and cut with [:-1], as the keyboards
+# kept it, against text_buffer.TextBuffer, over a long session.
+#
+# Every keystroke is the edit plus what a frontend does after it: the
+# text shown (the whole text before, the last SHOWN_CHARS now) and the
+# word being typed for predictions. Keystrokes are letters and spaces
+# with --delete DELs and --undo word undos mixed in. Reported per window of
+# characters typed: mean and p99 cost per keystroke, and the buffer's
+# memory (tracemalloc, in a separate pass) per character of text.
+#
+#   python bench_text.py
+#   python bench_text.py --chars 5000000 --str-chars 1000000
+# -----------------------------
+
+SHOWN_CHARS = 200           # blink_keyboard.py's label
+
+
+def keystrokes(rng, del_share, undo_share):
+    """Endless ("insert", text) / ("delete",) / ("undo",) keystrokes."""
+    while True:
+        x = rng.random()
+        if x < undo_share:
+            yield ("undo",)
+        elif x < undo_share + del_share:
+            yield ("delete",)
+        elif x < 0.2:
+            yield ("insert", " ")
+        else:
+            yield ("insert", chr(65 + rng.randrange(26)))
+
+
+def run_buffer(chars, window, args, memory=False):
+    buf = TextBuffer()
+    rng = random.Random(args.seed)
+    rows, costs = [], []
+    if memory:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    mark = window
+    for op in keystrokes(rng, args.delete, args.undo):
+        t0 = time.perf_counter()
+        if op[0] == "insert":
+            buf.insert(op[1])
+        elif op[0] == "delete":
+            buf.delete()
+        else:
+            buf.undo()
+        shown = buf.tail(SHOWN_CHARS)
+        word = completion.last_word(buf.context())
+        if not memory:
+            costs.append(time.perf_counter() - t0)
+        if len(buf) >= mark:
+            used = tracemalloc.get_traced_memory()[0] - base if memory else None
+            rows.append((len(buf), costs, used))
+            costs = []
+            mark += window
+            if len(buf) >= chars:
+                break
+    if memory:
+        tracemalloc.stop()
+    del shown, word
+    return rows
+
+
+def run_str(chars, window, args):
+    text = ""
+    rng = random.Random(args.seed)
+    rows, costs = [], []
+    mark = window
+    for op in keystrokes(rng, args.delete, args.undo):
+        t0 = time.perf_counter()
+        if op[0] == "insert":
+            text += op[1]
+        elif op[0] == "delete":
+            text = text[:-1]
+        else:
+            # word undo by hand: back to the last space before the end
+            text = text[:text.rstrip().rfind(" ") + 1]
+        shown = f"Current word: {text}"
+        word = completion.last_word(text)
+        costs.append(time.perf_counter() - t0)
+        if len(text) >= mark:
+            rows.append((len(text), costs, None))
+            costs = []
+            mark += window
+            if len(text) >= chars:
+                break
+    del shown, word
+    return rows
+
+
+def describe(costs):
+    costs = sorted(costs)
+    return sum(costs) / len(costs) * 1e6, costs[int(len(costs) * 0.99)] * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-keystroke cost of str vs TextBuffer as a session grows.")
+    parser.add_argument("--chars", type=int, default=1_000_000, help="characters to type into the buffer")
+    parser.add_argument("--str-chars", type=int, default=None, help="characters to type into the str (default: --chars)")
+    parser.add_argument("--windows", type=int, default=10)
+    parser.add_argument("--delete", type=float, default=0.05, help="share of keystrokes that are DEL")
+    parser.add_argument("--undo", type=float, default=0.001, help="share of keystrokes that undo a word")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    window = args.chars // args.windows
+    buffer_rows = run_buffer(args.chars, window, args)
+    memory_rows = run_buffer(args.chars, window, args, memory=True)
+    str_rows = {n: costs for n, costs, _ in run_str(args.str_chars or args.chars, window, args)}
+    print(f"shown: last {SHOWN_CHARS} characters (buffer) / the whole text (str); "
+          f"word from the last {CONTEXT_CHARS} / the whole text\n")
+    print(f"{'chars':>9}  {'buffer mean':>11}  {'p99':>7}  {'memory':>8}  {'bytes/char':>10}  "
+          f"{'str mean':>9}  {'p99':>8}")
+    for (n, costs, _), (_, _, used) in zip(buffer_rows, memory_rows):
+        mean, p99 = describe(costs)
+        line = f"{n:>9}  {mean:9.2f}us  {p99:5.1f}us  {used / 1e6:6.2f}MB  {used / n:10.2f}"
+        near = [k for k in str_rows if abs(k - n) < window // 2]
+        if near:
+            mean, p99 = describe(str_rows[near[0]])
+            line += f"  {mean:7.2f}us  {p99:6.1f}us"
+        print(line)
+    sys.exit(0)
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+from tracer import Tracer
+
+# -----------------------------
+# Tracer overhead
+#
+#   bare       the loop body alone
+#   off        begin()/end() with tracing switched off
+#   on         begin()/end() recording into the ring buffer
+#   span on    the context manager version, recording
+#
+# and how long dump() takes for a full ring.
+#
+#   python bench_tracer.py --calls 200000
+# -----------------------------
+
+
+def per_call_ns(fn, n):
+    start = time.perf_counter_ns()
+    fn(n)
+    return (time.perf_counter_ns() - start) / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the hot-path tracer.")
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--capacity", type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    tracer = Tracer(args.capacity)
+
+    def bare(n):
+        for i in range(n):
+            pass
+
+    def begin_end(n):
+        for i in range(n):
+            t0 = tracer.begin()
+            tracer.end("process_blink", t0)
+
+    def span(n):
+        for i in range(n):
+            with tracer.span("process_blink"):
+                pass
+
+    base = per_call_ns(bare, args.calls)
+    off = per_call_ns(begin_end, args.calls)
+    tracer.enabled = True
+    on = per_call_ns(begin_end, args.calls)
+    with_span = per_call_ns(span, args.calls)
+    print(f"per span ({args.calls} calls): bare loop {base:.0f} ns   off +{off - base:.0f} ns   "
+          f"on +{on - base:.0f} ns   span on +{with_span - base:.0f} ns")
+
+    path = os.path.join(tempfile.mkdtemp(), "trace.json")
+    start = time.perf_counter()
+    tracer.dump(path)
+    print(f"dump of {min(tracer.recorded, tracer.capacity)} spans: {(time.perf_counter() - start) * 1e3:.0f} ms, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
+    sys.exit(0)
@@ -0,0 +1,396 @@
+import sys
+import argparse
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import dsp
+from recorder import read_recording, REC_SAMPLES
+
+# -----------------------------
+# Host-side blink classifier
+#
+# detectBlink() in the firmware is one threshold with hysteresis on the
+# 100 ms envelope, so a saccade (a step in the EOG that the high-pass
+# turns into a dip), EMG crosstalk or a popping electrode triggers it
+# like a blink does. Here every sample of the raw stream (binary
+# protocol) ends a window of WINDOW_MS, and the window's centre is scored
+# as a blink with a small logistic regression over vectorized features:
+#
+#   depth, fall, rise     envelope at the centre, drop into it, recovery after it
+#   slope                 steepest fall of the envelope (per second)
+#   width                 share of the window below half the envelope's minimum
+#   dip, step             raw EOG: centre vs both ends, end vs start (a saccade
+#                         is a step, a blink comes back)
+#   blink band, high band log power 1-12 Hz and share above 30 Hz (np.fft.rfft)
+#   emg corr, emg level   correlation of filtered EOG and EMG, log EMG power
+#
+# A blink is the highest score of a run of windows above `threshold`,
+# at least BLINK_DEBOUNCE_MS after the previous one, like the firmware.
+# Detection runs WINDOW_MS / 2 behind the stream (the window is centred).
+#
+# Models are trained offline, from recordings (recorder.py, binary
+# protocol, so they hold REC_SAMPLES) with a "<recording>.labels" file
+# of blink sample indices next to each, or from synthetic sessions:
+#
+#   python blink_classifier.py label session.rec     # draft labels from the firmware detector
+#   python blink_classifier.py train --out blink_model.npz session.rec other.rec
+#   python blink_classifier.py train --out blink_model.npz --synthetic 20
+#   python acquisition.py --binary --classifier blink_model.npz
+#   python bench_classifier.py                       # vs the firmware threshold
+# -----------------------------
+
+WINDOW_MS = 256
+POSITIVE_MS = 40            # windows centred this close to a labelled blink are blinks
+NEGATIVE_MS = 150           # ... this far from every blink are not; between is not trained on
+MATCH_MS = 150              # a detection this close to a labelled blink found it
+FEATURES = ("depth", "fall", "rise", "slope", "width", "dip", "step",
+            "blink band", "high band", "emg corr", "emg level")
+
+
+def window_size(fs):
+    return 1 << int(round(np.log2(WINDOW_MS * fs / 1000)))
+
+
+class Features:
+    """Filters a raw EOG/EMG stream and turns it into one feature row per sample."""
+
+    def __init__(self, fs=dsp.SAMPLE_RATE):
+        self.fs = fs
+        self.window = window_size(fs)
+        w = self.window
+        self.hann = np.hanning(w)
+        freqs = np.fft.rfftfreq(w, 1 / fs)
+        self.blink_band = (freqs >= 1) & (freqs <= 12)
+        self.high_band = freqs >= 30
+        # Raw EOG means over the first, last and centre eighth/quarter: one matrix product.
+        c, q = w // 2, w // 8
+        self.raw_means = np.zeros((w, 3))
+        self.raw_means[:q, 0] = 1 / q
+        self.raw_means[-q:, 1] = 1 / q
+        self.raw_means[c - q:c + q, 2] = 1 / (2 * q)
+        self.eog_filter = dsp.BiquadCascade()
+        self.eog_envelope = dsp.MovingAverage(dsp.envelope_window_size(fs))
+        self.emg_filter = dsp.BiquadCascade()
+        self.reset()
+
+    def reset(self):
+        for stage in (self.eog_filter, self.eog_envelope, self.emg_filter):
+            stage.reset()
+        self.history = np.zeros((4, self.window - 1))     # raw, filtered, envelope, emg
+        self.n = 0
+
+    def process(self, eog, emg=None):
+        """Feature rows (len(eog), len(FEATURES)); row i is the window ending at sample i."""
+        eog = np.asarray(eog, dtype=np.float64)
+        emg = np.zeros(len(eog)) if emg is None else np.asarray(emg, dtype=np.float64)
+        filtered = self.eog_filter.process(eog)
+        streams = np.stack((eog, filtered, self.eog_envelope.process(filtered), self.emg_filter.process(emg)))
+        full = np.concatenate((self.history, streams), axis=1)
+        self.history = full[:, len(eog):]
+        self.n += len(eog)
+        raw, f, e, m = sliding_window_view(full, self.window, axis=1)
+        return self.rows(raw, f, e, m)
+
+    def rows(self, raw, f, e, m):
+        # Sums rather than .mean(), few temporaries: with small blocks the
+        # per-call overhead of NumPy is most of the cost.
+        w = self.window
+        X = np.empty((len(raw), len(FEATURES)))
+        centre = e[:, w // 2]
+        low = e.min(axis=1)
+        X[:, 0] = centre
+        X[:, 1] = centre - e[:, 0]
+        X[:, 2] = e[:, -1] - centre
+        X[:, 3] = (e[:, 1:] - e[:, :-1]).min(axis=1) * self.fs
+        X[:, 4] = np.count_nonzero(e < 0.5 * np.minimum(low, -1e-9)[:, None], axis=1) / w
+        start, end, middle = (raw @ self.raw_means).T
+        X[:, 5] = middle - (start + end) / 2
+        X[:, 6] = end - start
+        power = np.abs(np.fft.rfft(f * self.hann, axis=1)) ** 2
+        X[:, 7] = np.log(power[:, self.blink_band].sum(axis=1) + 1)
+        X[:, 8] = power[:, self.high_band].sum(axis=1) / (power.sum(axis=1) + 1e-9)
+        sf, sm, smm = f.sum(axis=1), m.sum(axis=1), np.einsum("ij,ij->i", m, m)
+        cov = np.einsum("ij,ij->i", f, m) - sf * sm / w
+        var = (np.einsum("ij,ij->i", f, f) - sf * sf / w) * (smm - sm * sm / w)
+        X[:, 9] = cov / (np.sqrt(np.maximum(var, 0)) + 1e-9)
+        X[:, 10] = np.log(smm / w + 1)
+        return X
+
+
+# -----------------------------
+# Model: logistic regression on standardized features
+# -----------------------------
+class Model:
+    def __init__(self, weights, bias, mean, std, threshold=0.5, fs=dsp.SAMPLE_RATE):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.threshold = float(threshold)
+        self.fs = int(fs)
+        # Standardizing folded into the weights: one dot product per window.
+        self.w = self.weights / self.std
+        self.b = self.bias - float(self.mean @ self.w)
+
+    def score(self, X):
+        return 1.0 / (1.0 + np.exp(-(X @ self.w + self.b)))
+
+    def save(self, path):
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean, std=self.std,
+                 threshold=self.threshold, fs=self.fs, features=np.array(FEATURES))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if tuple(data["features"]) != FEATURES:
+                raise ValueError(f"{path} was trained on other features, retrain it")
+            return cls(data["weights"], data["bias"], data["mean"], data["std"], data["threshold"], data["fs"])
+
+
+def fit(X, y, weight=None, l2=1e-3, iterations=25):
+    """Logistic regression by Newton's method (IRLS); returns a Model."""
+    mean, std = X.mean(axis=0), X.std(axis=0) + 1e-9
+    Z = np.hstack(((X - mean) / std, np.ones((len(X), 1))))
+    weight = np.ones(len(y)) if weight is None else weight
+    theta = np.zeros(Z.shape[1])
+    ridge = l2 * len(y) * np.eye(Z.shape[1])
+    ridge[-1, -1] = 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(Z @ theta)))
+        grad = Z.T @ (weight * (p - y)) + ridge @ theta
+        hess = (Z * (weight * p * (1 - p))[:, None]).T @ Z + ridge
+        step = np.linalg.solve(hess, grad)
+        theta -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return Model(theta[:-1], theta[-1], mean, std)
+
+
+# -----------------------------
+# Streaming detector
+# -----------------------------
+class BlinkClassifier:
+    """Blinks in a raw stream. Samples are scored `min_block` at a time
+    (20 ms by default, next to the WINDOW_MS / 2 the window already waits):
+    a binary stream is often read a frame or two at a time, and a block
+    of one costs nearly as much as a block of ten."""
+
+    def __init__(self, model, debounce_ms=dsp.BLINK_DEBOUNCE_MS, warmup_ms=dsp.CALIBRATION_MS, min_block=10):
+        self.model = model
+        self.features = Features(model.fs)
+        self.debounce = dsp.ms_to_samples(debounce_ms, model.fs)
+        self.warmup = dsp.ms_to_samples(warmup_ms, model.fs)
+        self.min_block = min_block
+        self.reset()
+
+    def reset(self):
+        self.features.reset()
+        self.last_blink = -self.debounce
+        self.run = None             # (best score, centre sample) of the run above threshold
+        self.scores = None          # of the last block scored
+        self.pending = []           # (eog, emg) blocks waiting for min_block samples
+        self.pending_n = 0
+
+    def process(self, eog, emg=None):
+        """Feed raw samples; returns the centre samples (absolute) of the blinks found."""
+        eog = np.asarray(eog, dtype=np.float64)
+        emg = np.zeros(len(eog)) if emg is None else np.asarray(emg, dtype=np.float64)
+        if self.pending or len(eog) < self.min_block:
+            self.pending.append((eog, emg))
+            self.pending_n += len(eog)
+            if self.pending_n < self.min_block:
+                return []
+            eog = np.concatenate([b[0] for b in self.pending])
+            emg = np.concatenate([b[1] for b in self.pending])
+            self.pending, self.pending_n = [], 0
+        base = self.features.n
+        p = self.model.score(self.features.process(eog, emg))
+        self.scores = p
+        return self.detect(p, base + np.arange(len(p)) - self.features.window // 2)
+
+    def detect(self, p, centres):
+        """Blinks from scores `p` of windows centred on `centres` (in stream order)."""
+        p[centres < self.warmup] = 0.0
+        idx = np.flatnonzero(p >= self.model.threshold)
+        blinks = []
+        if self.run and (not len(idx) or idx[0] != 0):
+            self._close(self.run, blinks)       # the run open at the end of the last block ended
+            self.run = None
+        # Runs of consecutive windows above the threshold; the best of each is the blink.
+        for run in np.split(idx, np.flatnonzero(np.diff(idx) > 1) + 1) if len(idx) else ():
+            k = run[int(np.argmax(p[run]))]
+            best = (float(p[k]), int(centres[k]))
+            if run[0] == 0 and self.run:
+                best = max(best, self.run)
+            if run[-1] == len(p) - 1:
+                self.run = best                 # may go on in the next block
+            else:
+                self.run = None
+                self._close(best, blinks)
+        return blinks
+
+    def _close(self, run, blinks):
+        if run[1] - self.last_blink >= self.debounce:
+            blinks.append(run[1])
+            self.last_blink = run[1]
+
+
+# -----------------------------
+# Training data
+# -----------------------------
+def load_recording(path):
+    """(eog, emg) raw samples of a recording made with the binary protocol."""
+    chunks = [np.frombuffer(payload, dtype="<i2").reshape(-1, 2) for _, kind, payload in read_recording(path)
+              if kind == REC_SAMPLES]
+    if not chunks:
+        raise ValueError(f"{path} has no raw samples (record with acquisition.py --binary)")
+    samples = np.concatenate(chunks).astype(np.float64)
+    return samples[:, 0], samples[:, 1]
+
+
+def load_labels(path):
+    with open(path) as f:
+        return np.array([int(line) for line in f if line.strip() and not line.startswith("#")], dtype=np.int64)
+
+
+def synthetic_session(fs, seconds, seed=1, artifacts=True):
+    """Raw EOG + EMG with blink sequences and, with `artifacts`, saccades,
+    EMG bursts leaking into the EOG and electrode pops; (eog, emg, blink centres)."""
+    rng = np.random.default_rng(seed)
+    n = int(fs * seconds)
+    t = np.arange(n) / fs
+    eog = 512 + 40 * np.sin(2 * np.pi * 0.1 * t) + np.cumsum(rng.normal(0, 0.15, n)) + rng.normal(0, 2, n)
+    emg = 512 + rng.normal(0, 20, n)
+    centres = []
+    pos = int(2.5 * fs)
+    while pos < n - 3 * fs:
+        for _ in range(rng.integers(1, 5)):
+            width = int(rng.uniform(0.18, 0.32) * fs)
+            eog[pos:pos + width] -= rng.uniform(150, 350) * np.hanning(width)
+            centres.append(pos + width // 2)
+            pos += width + int(rng.uniform(0.1, 0.25) * fs)
+        if artifacts:
+            gap = int(rng.uniform(1.5, 3.0) * fs)
+            for _ in range(rng.poisson(1.5)):
+                at = pos + rng.integers(int(0.2 * fs), max(gap - int(0.2 * fs), int(0.3 * fs)))
+                kind = rng.integers(3)
+                if kind == 0:                               # saccade away and back
+                    hold = int(rng.uniform(0.3, 1.5) * fs)
+                    eog[at:at + hold] += rng.choice((-1, 1)) * rng.uniform(60, 200)
+                elif kind == 1:                             # clench: EMG burst, some in the EOG
+                    length = int(rng.uniform(0.2, 0.8) * fs)
+                    burst = rng.normal(0, rng.uniform(100, 250), length)
+                    emg[at:at + length] += burst[:len(emg[at:at + length])]
+                    eog[at:at + length] += 0.4 * burst[:len(eog[at:at + length])]
+                else:                                       # electrode pop: jump, slow settle
+                    length = min(n - at, int(fs))
+                    eog[at:at + length] -= rng.uniform(80, 200) * np.exp(-np.arange(length) / (0.15 * fs))
+            pos += gap
+        else:
+            pos += int(rng.uniform(1.5, 3.0) * fs)
+    return np.round(eog).clip(0, 1023), np.round(emg).clip(0, 1023), np.array(centres, dtype=np.int64)
+
+
+def training_set(sessions, fs):
+    """Feature rows, labels and weights from [(eog, emg, blink centres)]."""
+    w = window_size(fs)
+    pos, neg = dsp.ms_to_samples(POSITIVE_MS, fs), dsp.ms_to_samples(NEGATIVE_MS, fs)
+    warmup = dsp.ms_to_samples(dsp.CALIBRATION_MS, fs)
+    Xs, ys = [], []
+    for eog, emg, centres in sessions:
+        X = Features(fs).process(eog, emg)
+        centre = np.arange(len(X)) - w // 2
+        i = np.clip(np.searchsorted(centres, centre), 1, max(len(centres) - 1, 1))
+        near = np.abs(centre - centres[i - 1]) if len(centres) else np.full(len(X), np.inf)
+        if len(centres) > 1:
+            near = np.minimum(near, np.abs(centre - centres[i]))
+        keep = (centre >= warmup) & ((near <= pos) | (near > neg))
+        Xs.append(X[keep])
+        ys.append((near[keep] <= pos).astype(np.float64))
+    X, y = np.concatenate(Xs), np.concatenate(ys)
+    # Blinks are a few percent of the windows: weigh both classes equally.
+    weight = np.where(y == 1, 0.5 / max(y.mean(), 1e-9), 0.5 / max(1 - y.mean(), 1e-9))
+    return X, y, weight
+
+
+def match(found, centres, fs, tolerance_ms=MATCH_MS):
+    """(true positives, false positives) of detections against labelled blink centres."""
+    tol = dsp.ms_to_samples(tolerance_ms, fs)
+    centres = np.asarray(centres)
+    used = np.zeros(len(centres), dtype=bool)
+    tp = fp = 0
+    for s in found:
+        i = np.searchsorted(centres, s - tol)
+        while i < len(centres) and centres[i] <= s + tol and used[i]:
+            i += 1
+        if i < len(centres) and abs(centres[i] - s) <= tol:
+            used[i] = True
+            tp += 1
+        else:
+            fp += 1
+    return tp, fp
+
+
+def train(sessions, fs, target_fp_per_min=1.0):
+    """Fit on `sessions`, then pick the lowest threshold that stays under
+    target_fp_per_min false blinks on them."""
+    model = fit(*training_set(sessions, fs))
+    model.fs = fs
+    minutes = sum(len(eog) for eog, _, _ in sessions) / fs / 60
+    scored = []
+    for eog, emg, centres in sessions:
+        p = model.score(Features(fs).process(eog, emg))
+        scored.append((p, np.arange(len(p)) - window_size(fs) // 2, centres))
+    for threshold in (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.98, 0.99):
+        model.threshold = threshold
+        fp = sum(match(BlinkClassifier(model).detect(p.copy(), c), centres, fs)[1] for p, c, centres in scored)
+        if fp / minutes <= target_fp_per_min:
+            break
+    return model
+
+
+def firmware_labels(eog, fs):
+    """Blinks the firmware's threshold detector finds (a draft to correct by hand)."""
+    engine = dsp.BlinkEngine(fs)
+    engine.process(eog)
+    return engine.blinks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the host-side blink classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="fit a model on labelled recordings or synthetic sessions")
+    p_train.add_argument("recordings", nargs="*", help="recordings with a <recording>.labels file each")
+    p_train.add_argument("--synthetic", type=int, default=0, help="also train on this many synthetic minutes")
+    p_train.add_argument("--fs", type=int, default=dsp.SAMPLE_RATE)
+    p_train.add_argument("--fp-per-min", type=float, default=1.0, help="false blinks per minute to allow")
+    p_train.add_argument("--out", default="blink_model.npz")
+    p_label = sub.add_parser("label", help="write draft labels from the firmware detector")
+    p_label.add_argument("recording")
+    p_label.add_argument("--fs", type=int, default=dsp.SAMPLE_RATE)
+    args = parser.parse_args()
+
+    if args.command == "label":
+        eog, _ = load_recording(args.recording)
+        blinks = firmware_labels(eog, args.fs)
+        with open(args.recording + ".labels", "w") as f:
+            f.write("# blink sample indices, one per line (firmware detector, check by hand)\n")
+            f.writelines(f"{b}\n" for b in blinks)
+        print(f"{len(blinks)} blinks -> {args.recording}.labels")
+        sys.exit(0)
+
+    sessions = []
+    for path in args.recordings:
+        eog, emg = load_recording(path)
+        sessions.append((eog, emg, np.sort(load_labels(path + ".labels"))))
+    for seed in range(args.synthetic):
+        sessions.append(synthetic_session(args.fs, 60, seed=100 + seed))
+    if not sessions:
+        parser.error("give recordings and/or --synthetic")
+    model = train(sessions, args.fs, args.fp_per_min)
+    print(f"threshold {model.threshold:.2f}, weights:")
+    for name, weight in sorted(zip(FEATURES, model.weights), key=lambda x: -abs(x[1])):
+        print(f"  {name:>10} {weight:+.2f}")
+    print("Saved", model.save(args.out))
+    sys.exit(0)
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+from collections import deque
+
+# -----------------------------
+# Host-side blink sequence decoding
+#
+# With RAW_BLINKS 1 the firmware sends every blink as it is detected,
+# "B,<millis>,<emg>" (or a FRAME_BLINK frame, see protocol.py), instead of a
+# code BLINK_SEQUENCE_TIMEOUT_MS (1 s) after the first blink of a
+# sequence. SequenceDecoder groups the blinks into codes here:
+#
+#   - 2, 3 or 4 blinks make code 1, 2 or 3; a lone blink is dropped
+#     (the firmware's rule, it also drops 5 or more).
+#   - The 4th blink commits at once: the sequence cannot get longer.
+#   - Otherwise the sequence commits when no blink followed the last one
+#     within `gap`, a percentile of this user's learned gaps between the
+#     blinks of one sequence (times `factor`, kept within [min_gap_ms,
+#     max_gap_ms]). The percentile depends on how likely another blink is:
+#     with n blinks so far and a share p of this user's sequences going on
+#     past n, the gap is where the chance of cutting a sequence short drops
+#     to `risk`, the (1 - risk * (1 - p) / p) percentile. Codes this user
+#     rarely sends cost little wait, ones they often extend wait longer.
+#     Until enough is learned, PRIOR_GAPS_MS and PRIOR_LENGTHS stand in.
+#     The length counts are halved whenever they add up to more than
+#     `max_lengths`, so they follow the user's recent codes.
+#
+# Blink gaps use the firmware's clock (millis() in the line), commit
+# deadlines the host's (last blink's arrival + gap). The learned gaps can
+# be kept in a file (blink_timing.json) so the next session starts from
+# this user's timing.
+#
+# DecodingSerial (transport.py) runs this on the lines of any port, so
+# the frontends see ordinary code lines either way.
+#
+#   python bench_decoder.py      # command latency vs the fixed timeout
+# -----------------------------
+
+RAW_PREFIX = "B,"
+MIN_BLINKS = 2
+MAX_BLINKS = 4
+FIXED_TIMEOUT_MS = 1000         # BLINK_SEQUENCE_TIMEOUT_MS in the firmware
+DEBOUNCE_MS = 200               # BLINK_DEBOUNCE_MS: no two blinks closer than this
+PRIOR_GAPS_MS = (250, 280, 300, 320, 350, 380, 420, 480, 550)
+PRIOR_LENGTHS = {2: 6, 3: 3, 4: 1}      # blinks per sequence, as counts
+MAX_LENGTHS = 200               # counts are halved past this many sequences
+TIMING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blink_timing.json")
+
+
+def blink_line(ms, emg=0.0):
+    return f"{RAW_PREFIX}{ms},{emg:.3f}"
+
+
+def parse_blink_line(line):
+    """(firmware ms, emg) of a raw blink line, or None for any other line."""
+    if not line.startswith(RAW_PREFIX):
+        return None
+    ms, _, emg = line[len(RAW_PREFIX):].partition(",")
+    if not ms.isdecimal():
+        return None
+    try:
+        return int(ms), float(emg) if emg else 0.0
+    except ValueError:
+        return None
+
+
+class SequenceDecoder:
+    def __init__(self, risk=0.01, factor=1.1, min_gap_ms=DEBOUNCE_MS + 50, max_gap_ms=FIXED_TIMEOUT_MS,
+                 window=200, min_learned=10, max_lengths=MAX_LENGTHS, path=None):
+        self.risk = risk
+        self.factor = factor
+        self.min_gap_ms = min_gap_ms
+        self.max_gap_ms = max_gap_ms
+        self.min_learned = min_learned
+        self.max_lengths = max_lengths
+        self.path = path
+        self.gaps = deque(maxlen=window)
+        self.lengths = dict(PRIOR_LENGTHS)
+        if path:
+            self.load(path)
+        self._decay()
+        self.count = 0
+        self.last_ms = None         # firmware time of the last blink
+        self.first_ns = None        # host arrival of the first / last blink
+        self.last_ns = None
+        self._learned()
+        self.committed = 0
+        self.early = 0              # committed on the 4th blink
+
+    # -- learned timing ------------------------------------------------
+    def _learned(self):
+        """Sort the learned gaps and work out the gap after 1..MAX_BLINKS-1 blinks."""
+        gaps = sorted(self.gaps) if len(self.gaps) >= self.min_learned else sorted(PRIOR_GAPS_MS)
+        self.gap_after = {}
+        for n in range(1, MAX_BLINKS):
+            longer = sum(c for length, c in self.lengths.items() if length > n)
+            at_least = longer + sum(c for length, c in self.lengths.items() if length == n)
+            p = longer / at_least if at_least else 1.0
+            q = max(0.0, 1.0 - self.risk * (1.0 - p) / p) if p else 0.0
+            value = gaps[min(len(gaps) - 1, int(len(gaps) * q))]
+            self.gap_after[n] = min(max(value * self.factor, self.min_gap_ms), self.max_gap_ms)
+        self.gap_ms = self.gap_after[1]
+
+    def _decay(self):
+        while sum(self.lengths.values()) > self.max_lengths:
+            self.lengths = {length: c / 2 for length, c in self.lengths.items()}
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            self.gaps.extend(saved.get("gaps_ms", []))
+            for length, count in saved.get("lengths", {}).items():
+                self.lengths[int(length)] = count
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def save(self, path=None):
+        path = path or self.path
+        if path:
+            with open(path, "w") as f:
+                json.dump({"gaps_ms": list(self.gaps), "lengths": self.lengths}, f)
+
+    # -- decoding ------------------------------------------------------
+    @property
+    def pending(self):
+        return self.count > 0
+
+    def deadline_ns(self):
+        """Host time the open sequence commits at if no blink comes, or None."""
+        return self.last_ns + int(self.gap_ms * 1e6) if self.count else None
+
+    def blink(self, ms, arrived=None):
+        """A blink at firmware time `ms`; returns a committed (code, first_ns) or None."""
+        arrived = arrived or time.monotonic_ns()
+        done = None
+        if self.count and ms - self.last_ms > self.gap_ms:
+            done = self._commit()           # this one starts a new sequence (the poll was late)
+        if self.count:
+            self.gaps.append(ms - self.last_ms)
+        else:
+            self.first_ns = arrived
+        self.count += 1
+        self.last_ms = ms
+        self.last_ns = arrived
+        if self.count >= MAX_BLINKS:
+            self.early += 1
+            return self._commit()
+        self.gap_ms = self.gap_after[self.count]
+        return done
+
+    def poll(self, now=None):
+        """Commit the open sequence if its gap has run out; returns (code, first_ns) or None."""
+        if not self.count:
+            return None
+        now = now or time.monotonic_ns()
+        if now < self.deadline_ns():
+            return None
+        return self._commit()
+
+    def _commit(self):
+        count, first_ns = self.count, self.first_ns
+        self.count = 0
+        self.last_ms = None
+        if count < MIN_BLINKS:
+            self.gap_ms = self.gap_after[1]
+            return None                     # a lone blink, dropped like the firmware does
+        self.lengths[count] = self.lengths.get(count, 0) + 1
+        self._decay()
+        self._learned()
+        self.committed += 1
+        return count - 1, first_ns
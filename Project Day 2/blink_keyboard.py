@@ -1,17 +1,34 @@
+import os
 import sys
-import glob
-import platform
-try:
-    import serial
-except ImportError:
-    print("pyserial not installed. Install it with: pip install pyserial")
-    sys.exit(1)
+import math
+import time
+import argparse
 
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel
 from PySide6.QtCore import Qt, QTimer
-from pynput.keyboard import Controller, Key
 
-kb = Controller()
+try:
+    from transport import open_serial, set_baud     # pyserial, numpy
+except ImportError as e:
+    print(f"{e.name} not installed. Install the requirements with: pip install -r requirements.txt")
+    sys.exit(1)
+from acquisition import parse_event
+from scan_engine import ScanEngine, EMIT
+from keyboard_widget import KeyboardWidget
+import completion
+from layout_optimizer import load_layout
+import ngram
+from partition_engine import PartitionEngine, ARITY, MODES as SELECTION_MODES, weights_for
+from settings_store import SettingsStore
+from scheduler import ScanScheduler, AutoScan
+from device_manager import find_arduino_port
+from output_sink import OutputSink, make_backend, BACKENDS
+from text_buffer import TextBuffer
+from history_store import HistoryStore, HISTORY_FILE
+from emg_control import EmgControl, SKIP
+import emg_control
+import metrics
+from tracer import TRACER, trace_path
 
 keyboard_rows = [
     list("1234567890"),
@@ -21,132 +38,380 @@ keyboard_rows = [
     ["SPACE", "DEL", "ENTER"]
 ]
 
-SCAN_SPEED = 20  # milliseconds
+FIRST_ROW = 1  # row 0 (digits) is skipped in the row scan
+SHOWN_CHARS = 200  # end of the typed text shown above the keys
 
-# -----------------------------
-# Auto-detect Arduino serial port (cross-platform)
-# -----------------------------
-def find_arduino_port():
-    system = platform.system()
-    ports = []
-    if system == "Darwin":  # macOS
-        ports = glob.glob('/dev/cu.*')
-    elif system == "Linux":
-        ports = glob.glob('/dev/ttyUSB*') + glob.glob('/dev/ttyACM*')
-    elif system == "Windows":
-        import serial.tools.list_ports
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-
-    for p in ports:
-        if any(keyword in p.lower() for keyword in ["usbmodem", "usbserial", "arduino"]):
-            return p
-    # fallback: return first port if available
-    return ports[0] if ports else None
-
-SERIAL_PORT = find_arduino_port()
-if SERIAL_PORT is None:
-    print("No Arduino serial port found. Plug in your Arduino and restart.")
-    sys.exit(1)
-else:
-    print(f"Using serial port: {SERIAL_PORT}")
+# Word predictions (if words.idx was built with completion.py) go on the
+# first scanned row, right where the scan returns after every key.
+PREDICTION_SLOTS = 4
+COMPLETER = completion.load_default()
+
+# Adaptive key order (if ngram.json was built with ngram.py): "within_rows"
+# or "global", see ngram.py.
+MODEL = ngram.load_default()
+
+def build_rows(rows, first_row):
+    rows = [list(r) for r in rows]
+    if COMPLETER:
+        rows.insert(first_row, completion.slot_keys(PREDICTION_SLOTS))
+    return rows
 
 # -----------------------------
 # GUI class
 # -----------------------------
 class CenteredBlinkKeyboard(QWidget):
-    def __init__(self, serial_port):
+    def __init__(self, serial_port, record=None, layout=None, adaptive="off", settings=None, output=None,
+                 history=None):
         super().__init__()
         self.setWindowTitle("Blink Keyboard")
         self.setStyleSheet("background-color: black;")
+        # settings.json (with any command line overrides); re-checked on
+        # every poll tick and applied while running, see apply_settings().
+        self.settings = settings or SettingsStore()
+        self.record = record
+        # Keystrokes go out on the sink's worker thread (output_sink.py),
+        # so a slow OS input path never stalls reading or repainting.
+        self.output = output or OutputSink(make_backend("pynput"))
+        # Blinks, keys and lines go to history.db from its writer thread (history_store.py).
+        self.history = history
+        self.session = history.start_session(self.settings["user"], "qt") if history else None
+        TRACER.enabled = self.settings["trace"]
 
-        try:
-            self.serial = serial.Serial(serial_port, 115200, timeout=0.1)
-        except Exception as e:
-            print(f"Error opening serial port {serial_port}: {e}")
-            self.serial = None
+        self.serial_port = serial_port
+        self.open_port()
+        self.link_up = True
 
-        self.current_word = ""
-        self.row, self.col = 1, 0
-        self.selecting_row = True
+        # Typed text (text_buffer.py): the label, predictions and key
+        # order are redone only after an edit, from the end of the text.
+        self.buffer = TextBuffer()
+        self.buffer.subscribe(self.text_edited)
+        self.text_changed = True
+        self.predictions = []
+        # layout: (rows, first_row) from a layout_optimizer.py file; code 3 is not used here.
+        rows, self.first_row = layout or (keyboard_rows, FIRST_ROW)
+        self.rows = build_rows(rows, self.first_row)
+        self.prediction_row = self.first_row if COMPLETER else None
+        self.adaptive_mode = adaptive
 
         layout = QVBoxLayout()
         self.word_label = QLabel("Current word:")
         self.word_label.setAlignment(Qt.AlignCenter)
         self.word_label.setStyleSheet("font-size: 28px; color: white;")
         layout.addWidget(self.word_label)
+        self.hint = QLabel()
+        self.hint.setAlignment(Qt.AlignCenter)
+        self.hint.setStyleSheet("font-size: 14px; color: #aaa;")
+        layout.addWidget(self.hint)
 
-        self.labels = []
-        for row_items in keyboard_rows:
-            hbox = QHBoxLayout()
-            label_row = []
-            for item in row_items:
-                lbl = QLabel(item)
-                lbl.setFixedSize(60, 60)
-                lbl.setAlignment(Qt.AlignCenter)
-                lbl.setStyleSheet("color:white; border:1px solid #555; background:#111;")
-                hbox.addWidget(lbl)
-                label_row.append(lbl)
-            layout.addLayout(hbox)
-            self.labels.append(label_row)
+        self.keys = KeyboardWidget(self.rows, wide_rows=(self.prediction_row,))
+        layout.addWidget(self.keys)
 
         self.setLayout(layout)
 
+        # Auto scan: the single-shot timer is re-armed for the next
+        # absolute deadline every time, so timer latency never adds up.
+        self.scan_timer = QTimer()
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.setTimerType(Qt.PreciseTimer)
+        self.scan_timer.timeout.connect(self.auto_tick)
+        self.configure()
+
         self.timer = QTimer()
         self.timer.timeout.connect(self.read_serial)
-        self.timer.start(SCAN_SPEED)
+        self.timer.start(self.settings["poll_ms"])
         self.update_display()
 
+    def open_port(self):
+        try:
+            self.serial = open_serial(self.serial_port, self.settings["baud_rate"], timeout=0.1, record=self.record)
+        except Exception as e:
+            print(f"Error opening serial port {self.serial_port}: {e}")
+            self.serial = None
+
+    def configure(self):
+        """(Re)build the selection engine from the selection_mode / auto_scan settings."""
+        selection = self.settings["selection_mode"]
+        self.partition = selection in ARITY
+        if self.partition:
+            # Every key is a candidate (the digits row too); the partitions
+            # follow the next-letter probabilities and are rebuilt per key.
+            weights = weights_for(self.rows_keys(), MODEL, self.buffer.context())
+            self.engine = PartitionEngine(self.rows, ARITY[selection], weights)
+            self.hint.setText("green: 1, blue: 2" + (", orange: 3" if ARITY[selection] == 3 else " (3 goes back)"))
+        else:
+            self.engine = ScanEngine(self.rows, first_row=self.first_row, allow_back=False)
+            self.hint.setText("")
+        self.hint.setVisible(self.partition)
+        self.scan = self.engine.new_state()
+        self.text_changed = True    # key labels are redone for the new engine
+        self.adaptive = None
+        if self.adaptive_mode != "off" and MODEL and not self.partition:
+            self.adaptive = ngram.AdaptiveLayout(self.rows, MODEL, self.first_row, self.adaptive_mode,
+                                                 pinned_rows=(self.prediction_row,))
+        self.auto = None
+        self.scan_timer.stop()
+        if self.settings["auto_scan"] and not self.partition:
+            scheduler = ScanScheduler(self.settings["scan_speed"], adapt=self.settings["adaptive_dwell"])
+            self.auto = AutoScan(self.engine, self.scan, scheduler)
+            self.arm_scan_timer()
+        self.configure_emg()
+
+    def configure_emg(self):
+        """Jaw-clench control (emg_control.py), for row/column scanning only."""
+        self.emg = None
+        if self.settings["emg_control"] and not self.partition:
+            self.emg = EmgControl(self.settings["emg_rest"], self.settings["emg_clench"])
+
+    def apply_settings(self, changed):
+        """Apply changed settings to the running keyboard (no restart, no reconnect)."""
+        if "serial_port" in changed and "serial_port" not in self.settings.overrides and self.settings["serial_port"]:
+            if self.serial:
+                self.serial.close()
+            self.serial_port = self.settings["serial_port"]
+            self.open_port()
+        elif "baud_rate" in changed and self.serial:
+            set_baud(self.serial, self.settings["baud_rate"])
+        if "trace" in changed:
+            self.set_tracing(self.settings["trace"])
+        if "user" in changed and self.history:
+            self.history.end_session(self.session)
+            self.session = self.history.start_session(self.settings["user"], "qt")
+        if "poll_ms" in changed:
+            self.timer.setInterval(self.settings["poll_ms"])
+        if changed & {"selection_mode", "auto_scan", "adaptive_dwell"}:
+            # Rebuilds the scheduler (scan_speed) and EMG control too.
+            self.configure()
+            self.update_display()
+        else:
+            if changed & {"emg_control", "emg_rest", "emg_clench"}:
+                self.configure_emg()
+            if "scan_speed" in changed and self.auto:
+                self.auto.scheduler.set_dwell(self.settings["scan_speed"] * 1e6)
+                self.arm_scan_timer()
+        print("Settings changed:", ", ".join(f"{name}={self.settings[name]}" for name in sorted(changed)))
+
+    def set_tracing(self, on):
+        """Start tracing, or stop and write what was traced (tracer.py)."""
+        if not on and TRACER.recorded:
+            print("Trace written to", TRACER.dump(trace_path()))
+            TRACER.clear()
+        TRACER.enabled = on
+
     def read_serial(self):
-        if self.serial and self.serial.in_waiting:
-            try:
+        # Drain everything that arrived since the last tick so a stalled
+        # event loop never leaves blinks queued behind one another.
+        tick = TRACER.begin()
+        try:
+            while self.serial and self.serial.in_waiting:
+                t0 = TRACER.begin()
                 line = self.serial.readline().decode(errors="ignore").strip()
-                if line.isdigit():
-                    self.process_blink(int(line))
-            except Exception as e:
-                print("Serial read error:", e)
-
-    def process_blink(self, blink):
-        if blink == 1:
-            if self.selecting_row:
-                self.row = (self.row + 1) % len(keyboard_rows)
-                if self.row == 0: self.row = 1
-            else:
-                self.col = (self.col + 1) % len(keyboard_rows[self.row])
-        elif blink == 2:
-            if self.selecting_row:
-                self.selecting_row = False
-                self.col = 0
+                TRACER.end("readline", t0)
+                if not line:
+                    continue
+                metrics.SERIAL_LINES.inc()
+                event = metrics.count_event(parse_event(line))
+                if event is None:
+                    continue
+                kind, code, emg = event
+                arrived = getattr(self.serial, "last_mono_ns", None) or time.monotonic_ns()
+                if code is not None:
+                    self.process_blink(code, arrived, getattr(self.serial, "last_blink_ns", None))
+                if emg is not None and self.emg:
+                    self.process_emg(emg, arrived)
+        except Exception as e:
+            print("Serial read error:", e)
+        changed = self.settings.refresh()      # one stat() unless the file changed
+        if changed:
+            self.apply_settings(changed)
+        # A dropped cable is reopened by the port itself (device_manager.py);
+        # just say so while it is away.
+        link_up = getattr(self.serial, "connected", True)
+        if link_up != self.link_up:
+            self.link_up = link_up
+            self.setWindowTitle("Blink Keyboard" if link_up else "Blink Keyboard (reconnecting...)")
+            if link_up:
+                print(f"Serial reconnected after {self.serial.reconnects[-1] * 1e3:.0f} ms")
             else:
-                item = keyboard_rows[self.row][self.col]
-                if item == "SPACE":
-                    self.current_word += " "
-                    kb.press(Key.space); kb.release(Key.space)
-                elif item == "DEL" and self.current_word:
-                    self.current_word = self.current_word[:-1]
-                    kb.press(Key.backspace); kb.release(Key.backspace)
-                elif item == "ENTER":
-                    print("Final word:", self.current_word)
-                    self.current_word = ""
-                    kb.press(Key.enter); kb.release(Key.enter)
-                else:
-                    self.current_word += item
-                    kb.press(item.lower()); kb.release(item.lower())
-                self.selecting_row, self.row, self.col = True, 1, 0
+                print("Serial lost, reconnecting:", self.serial.error)
+        TRACER.end("read_serial", tick)
 
+    def auto_tick(self):
+        t0 = TRACER.begin()
+        if self.auto.tick():
+            self.keys.set_highlight(self.scan.row, self.scan.col, self.scan.selecting_row)
+        self.arm_scan_timer()
+        TRACER.end("auto_tick", t0)
+
+    def arm_scan_timer(self):
+        self.scan_timer.start(math.ceil(self.auto.scheduler.ms_until_next()))
+
+    def process_blink(self, blink, arrived=None, blinked=None):
+        t0 = TRACER.begin()
+        arrived = arrived or time.monotonic_ns()
+        if self.auto:
+            action = self.auto.code(blink, arrived, blinked)
+            self.arm_scan_timer()
+        else:
+            action = self.engine.step(self.scan, blink)
+        if action.kind == EMIT:
+            key = action.key
+            if self.adaptive:
+                key = self.adaptive.translate(key)
+            if self.adaptive or (self.partition and MODEL):
+                MODEL.observe(self.buffer.context(), key)
+            before = len(self.buffer)
+            self.type_key(key)
+            metrics.COMMIT_LATENCY.observe((time.monotonic_ns() - arrived) / 1e9)
+            if self.history:
+                self.history.key(self.session, key, 1 if key == "ENTER" else len(self.buffer) - before)
+            if self.partition and MODEL:
+                self.engine.set_weights(weights_for(self.engine.position, MODEL, self.buffer.context()))
+                self.engine.reset(self.scan)
         self.update_display()
+        if self.history:
+            self.history.blink(self.session, blink, (time.monotonic_ns() - arrived) / 1e6)
+        TRACER.end("process_blink", t0, blink)
+
+    def process_emg(self, level, arrived):
+        skipped = False
+        for action, started in self.emg.update(level, arrived):
+            emg_control.apply(action, started, self.auto,
+                              lambda code, blinked: self.process_blink(code, arrived, blinked))
+            skipped |= action == SKIP and self.auto is not None
+        if self.auto and (self.auto.scheduler.set_speed(self.emg.speed) or skipped):
+            self.arm_scan_timer()
+        if skipped:
+            self.update_display()
+
+    def rows_keys(self):
+        return [key for row in self.rows for key in row]
+
+    def text_edited(self, start, removed, inserted):
+        self.text_changed = True
+
+    def type_key(self, item):
+        slot = completion.slot_index(item)
+        if slot is not None:
+            if slot < len(self.predictions):
+                rest = self.predictions[slot][len(completion.last_word(self.buffer.context())):] + " "
+                self.buffer.insert(rest)
+                self.output.text(rest.lower())
+                metrics.CHARS.inc(len(rest))
+        elif item == "SPACE":
+            self.buffer.insert(" ")
+            self.output.key("space")
+            metrics.CHARS.inc()
+        elif item == "DEL" and len(self.buffer):
+            self.buffer.delete()
+            self.output.key("backspace")
+        elif item == "ENTER":
+            print("Final word:", self.buffer)
+            if self.history:
+                self.history.line(self.session, str(self.buffer))
+            self.buffer.clear()
+            self.output.key("enter")
+            metrics.CHARS.inc()
+        elif item != "DEL":
+            self.buffer.insert(item)
+            self.output.text(item.lower())
+            metrics.CHARS.inc()
 
     def update_display(self):
-        self.word_label.setText(f"Current word: {self.current_word}")
-        for r, row_items in enumerate(self.labels):
-            for c, lbl in enumerate(row_items):
-                highlight = (self.selecting_row and r == self.row) or (not self.selecting_row and r == self.row and c == self.col)
-                lbl.setStyleSheet("color:white; border:2px solid #0f0; background:#333;" if highlight else "color:white; border:1px solid #555; background:#111;")
+        t0 = TRACER.begin()
+        start = time.perf_counter()
+        if self.text_changed:
+            self.text_changed = False
+            context = self.buffer.context()
+            self.word_label.setText(f"Current word: {self.buffer.tail(SHOWN_CHARS)}")
+            if COMPLETER:
+                self.predictions = COMPLETER.complete(completion.last_word(context), PREDICTION_SLOTS)
+                self.keys.set_labels(self.prediction_row, self.predictions)
+            if self.adaptive:
+                for r, keys in enumerate(self.adaptive.arrange(context)):
+                    if r != self.prediction_row:
+                        self.keys.set_labels(r, keys)
+        if self.partition:
+            self.keys.set_groups(self.engine.groups(self.scan))
+        else:
+            self.keys.set_highlight(self.scan.row, self.scan.col, self.scan.selecting_row)
+        metrics.RENDER_TIME.observe(time.perf_counter() - start)
+        TRACER.end("update_display", t0)
+
+    def closeEvent(self, event):
+        if self.adaptive or (self.partition and MODEL):
+            MODEL.save()   # keep what was learned from this session
+        if self.auto:
+            print("Auto scan:", self.auto.scheduler.stats())
+        self.output.close()
+        self.set_tracing(False)
+        print("Output:", self.output.stats())
+        if self.history:
+            self.history.end_session(self.session)
+            self.history.close()
+            print("History:", self.history.stats())
+        super().closeEvent(event)
 
 # -----------------------------
 # Main
 # -----------------------------
-if __name__ == "__main__":
+def main():
+    # A port on the command line wins, e.g. "shm:" to read from acquisition.py,
+    # "replay:session.blrec" to play back a recording, or the pty printed by
+    # virtual_arduino.py.
+    parser = argparse.ArgumentParser(description="Blink-controlled on-screen keyboard.")
+    parser.add_argument("port", nargs="?", help="serial port, shm:<name> or replay:<file>[@speed]")
+    parser.add_argument("--record", default=None, help="record the session to this file")
+    parser.add_argument("--layout", default=None, help="layout JSON written by layout_optimizer.py")
+    parser.add_argument("--adaptive", choices=ngram.MODES, default="off",
+                        help="reorder keys by the next-letter model in ngram.json")
+    parser.add_argument("--selection", choices=SELECTION_MODES, default=None,
+                        help="scan rows then keys, or pick halves/thirds (default: selection_mode in settings.json)")
+    parser.add_argument("--auto-scan", action="store_true", default=None,
+                        help="advance the highlight every scan_speed ms; code 1 selects (default: auto_scan in settings.json)")
+    parser.add_argument("--dwell", type=int, default=None, help="auto scan dwell in ms (default: scan_speed)")
+    parser.add_argument("--baud", type=int, default=None, help="default: baud_rate in settings.json")
+    parser.add_argument("--output", choices=sorted(BACKENDS), default="pynput",
+                        help="where keystrokes go: the OS keyboard, memory or nowhere")
+    parser.add_argument("--trace", action="store_true", default=None,
+                        help="trace the hot path from the start (default: trace in settings.json); "
+                             "written to trace-*.json when switched off or on exit")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, default=None, metavar="DB",
+                        help="keep the session in history.db (or DB); also on if history is on in settings.json")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT,
+                        help="serve Prometheus metrics on 127.0.0.1:<port>/metrics (0: off)")
+    args = parser.parse_args()
+    # Options given here win over settings.json; the rest follow the file while running.
+    settings = SettingsStore(overrides={"selection_mode": args.selection, "auto_scan": args.auto_scan,
+                                        "scan_speed": args.dwell, "baud_rate": args.baud,
+                                        "serial_port": args.port, "trace": args.trace})
+
+    configured = settings["serial_port"]
+    if configured.startswith("/dev/") and not os.path.exists(configured):
+        configured = ""     # saved on another machine
+    serial_port = args.port or configured or find_arduino_port()
+    if serial_port is None:
+        print("No Arduino serial port found. Plug in your Arduino and restart.")
+        sys.exit(1)
+    print(f"Using serial port: {serial_port}")
+
+    if args.metrics_port:
+        try:
+            metrics.serve(metrics.REGISTRY, args.metrics_port)
+            print(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            print(f"Metrics endpoint not started ({e})")
+
     app = QApplication(sys.argv)
-    gui = CenteredBlinkKeyboard(SERIAL_PORT)
+    layout = load_layout(args.layout) if args.layout else None
+    if args.adaptive != "off" and MODEL is None:
+        print("No ngram.json; build it with: python ngram.py build corpus.txt")
+    history = None
+    if args.history or settings["history"]:
+        history = HistoryStore(args.history or HISTORY_FILE)
+    gui = CenteredBlinkKeyboard(serial_port, record=args.record, layout=layout, adaptive=args.adaptive,
+                                settings=settings, output=OutputSink(make_backend(args.output)), history=history)
     gui.show()
     sys.exit(app.exec())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import os
+import re
+import sys
+import mmap
+import struct
+import argparse
+from collections import Counter
+
+# -----------------------------
+# Word completion for the blink keyboards
+#
+# A prefix trie over the corpus words, flattened into arrays and written
+# to one file that is memory-mapped at startup (nothing is parsed or
+# rebuilt, so opening a 100k-word index is instant):
+#
+#   header    "BLNKTRIE", version, k, node/edge/word counts, section offsets
+#   node_edge uint32 per node   first edge of the node (edges of a node are contiguous)
+#   node_deg  uint32 per node   number of edges
+#   edge_char uint32 per edge   letter (code point)
+#   edge_to   uint32 per edge   child node
+#   topk      uint32 k per node word ids of the k most frequent words below the node
+#   word_off  uint32 per word+1 offsets into the UTF-8 word blob
+#   freq      uint32 per word   corpus count
+#   blob      words, concatenated
+#
+# complete(prefix) walks one edge per letter and reads the precomputed
+# top-k list of the node it lands on: no search below the node.
+#
+#   python completion.py build corpus.txt            # -> words.idx
+#   python completion.py build                       # stand-in corpus (Python docs text)
+#   python completion.py query words.idx TH
+# -----------------------------
+
+MAGIC = b"BLNKTRIE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIII9I")     # magic, version, k, nodes, edges, words, 9 section offsets
+NO_WORD = 0xFFFFFFFF
+DEFAULT_K = 8
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX = os.path.join(HERE, "words.idx")
+
+WORD_RE = re.compile(r"[A-Za-z]+")
+
+
+def corpus_words(text):
+    """Words as the keyboard types them: letters only, upper case."""
+    return [w.upper() for w in WORD_RE.findall(text)]
+
+
+def standin_corpus():
+    # Ships with CPython; only used when no corpus file is given.
+    import pydoc_data.topics
+    return " ".join(pydoc_data.topics.topics.values())
+
+
+# -----------------------------
+# Builder
+# -----------------------------
+def build_index(counts, path, k=DEFAULT_K, min_count=1):
+    """Write an index for a {word: count} mapping."""
+    words = sorted((w for w, n in counts.items() if n >= min_count and w),
+                   key=lambda w: (-counts[w], w))
+    rank = {w: i for i, w in enumerate(words)}      # word id == frequency rank
+
+    # Pointer trie first, then flatten breadth-first so a node's edges are contiguous.
+    children = [{}]
+    terminal = [None]
+    for w in words:
+        node = 0
+        for ch in w:
+            nxt = children[node].get(ch)
+            if nxt is None:
+                nxt = len(children)
+                children[node][ch] = nxt
+                children.append({})
+                terminal.append(None)
+            node = nxt
+        terminal[node] = rank[w]
+
+    # Top-k per node, bottom-up: ids are ranks, so "most frequent" is "smallest id".
+    order = [0]
+    for node in order:
+        order.extend(children[node][ch] for ch in sorted(children[node]))
+    topk = [None] * len(children)
+    for node in reversed(order):
+        best = [] if terminal[node] is None else [terminal[node]]
+        for child in children[node].values():
+            best.extend(topk[child])
+        best.sort()
+        topk[node] = best[:k]
+
+    new_id = {old: i for i, old in enumerate(order)}
+    node_edge, node_deg, edge_char, edge_to, flat_topk = [], [], [], [], []
+    for node in order:
+        node_edge.append(len(edge_char))
+        node_deg.append(len(children[node]))
+        for ch in sorted(children[node]):
+            edge_char.append(ord(ch))
+            edge_to.append(new_id[children[node][ch]])
+        ids = topk[node]
+        flat_topk.extend(ids + [NO_WORD] * (k - len(ids)))
+
+    encoded = [w.encode() for w in words]
+    word_off = [0]
+    for e in encoded:
+        word_off.append(word_off[-1] + len(e))
+    sections = [
+        struct.pack(f"<{len(node_edge)}I", *node_edge),
+        struct.pack(f"<{len(node_deg)}I", *node_deg),
+        struct.pack(f"<{len(edge_char)}I", *edge_char),
+        struct.pack(f"<{len(edge_to)}I", *edge_to),
+        struct.pack(f"<{len(flat_topk)}I", *flat_topk),
+        struct.pack(f"<{len(word_off)}I", *word_off),
+        struct.pack(f"<{len(words)}I", *(min(counts[w], 0xFFFFFFFF) for w in words)),
+        b"".join(encoded),
+    ]
+    offsets, pos = [], HEADER.size
+    for data in sections:
+        offsets.append(pos)
+        pos += len(data)
+    offsets.append(pos)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, k, len(order), len(edge_char), len(words), *offsets))
+        for data in sections:
+            f.write(data)
+    os.replace(tmp, path)
+    return len(order), len(words)
+
+
+# -----------------------------
+# Reader
+# -----------------------------
+class Completer:
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.k, self.n_nodes, self.n_edges, self.n_words, *offsets = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a word completion index")
+        view = memoryview(self.map)
+
+        def section(i, fmt="I"):
+            return view[offsets[i]:offsets[i + 1]].cast(fmt)
+
+        self.node_edge = section(0)
+        self.node_deg = section(1)
+        self.edge_char = section(2)
+        self.edge_to = section(3)
+        self.topk = section(4)
+        self.word_off = section(5)
+        self.freq = section(6)
+        self.blob = view[offsets[7]:offsets[8]]
+        self.size = len(self.map)
+
+    def node(self, prefix):
+        """Trie node for the prefix, or None if no word starts with it."""
+        node = 0
+        edge_char, edge_to = self.edge_char, self.edge_to
+        for ch in prefix:
+            code = ord(ch)
+            first = self.node_edge[node]
+            for e in range(first, first + self.node_deg[node]):
+                if edge_char[e] == code:
+                    node = edge_to[e]
+                    break
+            else:
+                return None
+        return node
+
+    def word(self, word_id):
+        return bytes(self.blob[self.word_off[word_id]:self.word_off[word_id + 1]]).decode()
+
+    def complete(self, prefix, k=None):
+        """Most frequent words starting with `prefix` (the prefix itself left out)."""
+        prefix = prefix.upper()
+        node = self.node(prefix)
+        if node is None:
+            return []
+        out = []
+        base = node * self.k
+        for i in range(base, base + self.k):
+            word_id = self.topk[i]
+            if word_id == NO_WORD:
+                break
+            w = self.word(word_id)
+            if w != prefix:
+                out.append(w)
+                if k is not None and len(out) >= k:
+                    break
+        return out
+
+    def close(self):
+        for v in (self.node_edge, self.node_deg, self.edge_char, self.edge_to,
+                  self.topk, self.word_off, self.freq, self.blob):
+            v.release()
+        self.map.close()
+
+
+def load_default():
+    """Completer for words.idx next to this file, or None if it was never built."""
+    try:
+        return Completer(DEFAULT_INDEX)
+    except (OSError, ValueError):
+        return None
+
+
+# -----------------------------
+# Prediction row for the keyboards
+# The scan engine sees fixed slot keys; the frontends show the current
+# predictions on them and type the word when a slot is committed.
+# -----------------------------
+SLOT_PREFIX = "WORD"
+
+
+def slot_keys(count):
+    return [f"{SLOT_PREFIX}{i + 1}" for i in range(count)]
+
+
+def slot_index(key):
+    if key.startswith(SLOT_PREFIX) and key[len(SLOT_PREFIX):].isdigit():
+        return int(key[len(SLOT_PREFIX):]) - 1
+    return None
+
+
+def last_word(text):
+    """The word being typed: letters after the last space or newline."""
+    return text.rsplit(None, 1)[-1] if text and not text[-1].isspace() else ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the word completion index.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build an index from a text corpus")
+    b.add_argument("corpus", nargs="?", help="text file (default: Python docs text as a stand-in)")
+    b.add_argument("-o", "--output", default=DEFAULT_INDEX)
+    b.add_argument("-k", type=int, default=DEFAULT_K, help="completions stored per prefix")
+    b.add_argument("--min-count", type=int, default=1)
+    q = sub.add_parser("query", help="print completions for prefixes")
+    q.add_argument("index")
+    q.add_argument("prefixes", nargs="+")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        if args.corpus:
+            with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+        else:
+            text = standin_corpus()
+        nodes, words = build_index(Counter(corpus_words(text)), args.output, args.k, args.min_count)
+        print(f"{args.output}: {words} words, {nodes} trie nodes, {os.path.getsize(args.output)} bytes")
+    else:
+        completer = Completer(args.index)
+        for prefix in args.prefixes:
+            print(f"{prefix}: {' '.join(completer.complete(prefix))}")
+    sys.exit(0)
@@ -0,0 +1,296 @@
+import os
+import re
+import sys
+import time
+import argparse
+import platform
+
+import serial
+import serial.tools.list_ports
+
+# -----------------------------
+# Finding the Arduino and keeping it connected
+#
+# DeviceScanner caches the port enumeration (comports(): VID/PID, serial
+# number, description) and only enumerates again when the device
+# directories change: on Linux and macOS a node appearing or going away
+# in /dev (or /dev/serial/by-id) bumps the directory's mtime, so a check
+# is a couple of stat() calls. Elsewhere (Windows) it re-enumerates at
+# most every `ttl` seconds.
+#
+# find() matches boards by USB VID/PID (KNOWN_IDS: Arduino, clone and
+# USB-serial chips). Only if none matches it can open the candidates and
+# wait for the firmware's banner or a blink code line (handshake), and
+# last of all it falls back to the old name guess.
+#
+# ReconnectingSerial is what transport.open_serial() returns for a real
+# port. When a read fails (cable pulled) it closes the port and keeps
+# trying to open it again, first under the same name and then wherever
+# the same device (VID/PID/serial number) shows up, waiting 0.1 s, 0.2 s,
+# ... up to 5 s between attempts. Meanwhile it reads as an idle port, so
+# the frontends and their state carry on. Each outage (loss to reopen)
+# is kept in `reconnects`.
+#
+#   python device_manager.py            # list ports and what matched
+# -----------------------------
+
+# (VID, PID or None for any) -> what it is
+KNOWN_IDS = {
+    (0x2341, None): "Arduino",
+    (0x2A03, None): "Arduino (arduino.org)",
+    (0x1B4F, None): "SparkFun",
+    (0x239A, None): "Adafruit",
+    (0x1A86, 0x7523): "CH340 (clone)",
+    (0x1A86, 0x55D4): "CH9102 (clone)",
+    (0x0403, 0x6001): "FTDI FT232",
+    (0x10C4, 0xEA60): "CP210x",
+}
+NAME_HINTS = ("usbmodem", "usbserial", "arduino")
+USB_NAMES = re.compile(r"ttyUSB|ttyACM|/dev/cu\.|^COM")     # never a built-in ttyS port
+WATCH_DIRS = ("/dev", "/dev/serial/by-id")
+HANDSHAKE = re.compile(r"(Ready|Calibration complete|^\d+(,[-\d.]+)?$)")
+
+BACKOFF_MIN_S = 0.1
+BACKOFF_MAX_S = 5.0
+
+
+def device_kind(info):
+    """KNOWN_IDS entry for a comports() record, or None."""
+    if info.vid is None:
+        return None
+    return KNOWN_IDS.get((info.vid, info.pid)) or KNOWN_IDS.get((info.vid, None))
+
+
+def probe(port, baud=115200, wait_s=4.0):
+    """Open `port` and wait for a line the firmware prints (it resets on open)."""
+    try:
+        ser = serial.Serial(port, baud, timeout=0.2)
+    except (OSError, serial.SerialException):
+        return False
+    try:
+        deadline = time.monotonic() + wait_s
+        while time.monotonic() < deadline:
+            line = ser.readline().decode(errors="ignore").strip()
+            if line and HANDSHAKE.search(line):
+                return True
+        return False
+    finally:
+        ser.close()
+
+
+class DeviceScanner:
+    def __init__(self, ttl=2.0, lister=serial.tools.list_ports.comports, watch=WATCH_DIRS):
+        self.ttl = ttl
+        self.lister = lister
+        self.watch = watch if platform.system() in ("Linux", "Darwin") else ()
+        self.stamp = None
+        self.cache = []
+        self.enumerations = 0
+
+    def _stamp(self):
+        stamps = []
+        for path in self.watch:
+            try:
+                stamps.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        if not any(s is not None for s in stamps):
+            return int(time.monotonic() / self.ttl)     # nothing to watch: refresh every ttl
+        return tuple(stamps)
+
+    def ports(self):
+        """comports() records, enumerated again only when the device directories changed."""
+        stamp = self._stamp()
+        if stamp != self.stamp:
+            self.cache = sorted(self.lister(), key=lambda p: p.device)
+            self.stamp = stamp
+            self.enumerations += 1
+        return self.cache
+
+    def info(self, device):
+        for p in self.ports():
+            if p.device == device or os.path.realpath(p.device) == os.path.realpath(device):
+                return p
+        return None
+
+    def find(self, identity=None, handshake=False, baud=115200):
+        """Port of the board: by identity (vid, pid, serial number) or KNOWN_IDS,
+        then by handshake (if asked), then by name."""
+        ports = self.ports()
+        if identity:
+            for p in ports:
+                if (p.vid, p.pid, p.serial_number) == identity:
+                    return p.device
+            return None
+        for p in ports:
+            if device_kind(p):
+                return p.device
+        if handshake:
+            for p in ports:
+                if probe(p.device, baud):
+                    return p.device
+        usb = [p for p in ports if p.vid is not None or USB_NAMES.search(p.device)]
+        for p in usb:
+            if any(hint in p.device.lower() for hint in NAME_HINTS):
+                return p.device
+        return usb[0].device if usb else None
+
+
+_scanner = None
+
+
+def default_scanner():
+    """The process-wide DeviceScanner."""
+    global _scanner
+    if _scanner is None:
+        _scanner = DeviceScanner()
+    return _scanner
+
+
+def find_arduino_port(handshake=False):
+    return default_scanner().find(handshake=handshake)
+
+
+# -----------------------------
+# Reconnecting port
+# -----------------------------
+class ReconnectingSerial:
+    def __init__(self, port, baud=115200, timeout=0.1, scanner=None, opener=serial.Serial,
+                 backoff_min=BACKOFF_MIN_S, backoff_max=BACKOFF_MAX_S):
+        self.scanner = scanner or default_scanner()
+        self.port = port
+        self.baud = baud
+        self.timeout = timeout
+        self.opener = opener
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.is_open = True
+        self.error = None
+        self.lost_at = None
+        self.delay = backoff_min
+        self.next_try = 0.0
+        self.attempts = 0
+        self.reconnects = []            # seconds from loss to reopen, per outage
+        self.serial = opener(port, baud, timeout=timeout)   # the first open fails loudly
+        info = self.scanner.info(port)
+        self.identity = (info.vid, info.pid, info.serial_number) if info and info.vid is not None else None
+
+    @property
+    def connected(self):
+        return self.serial is not None
+
+    @property
+    def baudrate(self):
+        return self.baud
+
+    @baudrate.setter
+    def baudrate(self, baud):
+        # pyserial reconfigures an open port in place; a reopen uses it too.
+        self.baud = baud
+        if self.serial is not None:
+            self.serial.baudrate = baud
+
+    def _lost(self, error):
+        self.error = error
+        try:
+            self.serial.close()
+        except Exception:
+            pass
+        self.serial = None
+        self.lost_at = time.monotonic()
+        self.delay = self.backoff_min
+        self.next_try = self.lost_at
+
+    def _reconnect(self):
+        now = time.monotonic()
+        if not self.is_open or now < self.next_try:
+            return False
+        self.attempts += 1
+        port = self.port
+        if not os.path.exists(port) and self.identity:
+            port = self.scanner.find(self.identity) or port     # same board, new name
+        try:
+            self.serial = self.opener(port, self.baud, timeout=self.timeout)
+        except (OSError, serial.SerialException) as e:
+            self.error = e
+            self.next_try = now + self.delay
+            self.delay = min(self.delay * 2, self.backoff_max)
+            return False
+        self.port = port
+        self.reconnects.append(time.monotonic() - self.lost_at)
+        self.lost_at = None
+        self.error = None
+        return True
+
+    def _idle(self):
+        """Disconnected: wait like a read with nothing to read (up to the next attempt)."""
+        wait = min(self.timeout or 0, max(0.0, self.next_try - time.monotonic()))
+        if wait:
+            time.sleep(wait)
+
+    # -- serial.Serial subset ------------------------------------------
+    @property
+    def in_waiting(self):
+        if self.serial is None and not self._reconnect():
+            return 0
+        try:
+            return self.serial.in_waiting
+        except (OSError, serial.SerialException) as e:
+            self._lost(e)
+            return 0
+
+    def readline(self):
+        if self.serial is None and not self._reconnect():
+            self._idle()
+            return b""
+        try:
+            return self.serial.readline()
+        except (OSError, serial.SerialException) as e:
+            self._lost(e)
+            return b""
+
+    def read(self, size=1):
+        if self.serial is None and not self._reconnect():
+            self._idle()
+            return b""
+        try:
+            return self.serial.read(size)
+        except (OSError, serial.SerialException) as e:
+            self._lost(e)
+            return b""
+
+    def reset_input_buffer(self):
+        if self.serial is not None:
+            self.serial.reset_input_buffer()
+
+    def close(self):
+        self.is_open = False
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+
+    def stats(self):
+        """Outages so far and how long reconnecting took (ms)."""
+        times = sorted(self.reconnects)
+        return {
+            "connected": self.connected,
+            "reconnects": len(times),
+            "attempts": self.attempts,
+            "p50_ms": times[len(times) // 2] * 1e3 if times else None,
+            "max_ms": times[-1] * 1e3 if times else None,
+            "down_ms": (time.monotonic() - self.lost_at) * 1e3 if self.lost_at else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List serial ports and show which one is the blink detector.")
+    parser.add_argument("--handshake", action="store_true", help="open unknown ports and wait for the firmware banner")
+    args = parser.parse_args()
+
+    found = find_arduino_port(handshake=args.handshake)
+    for p in default_scanner().ports():
+        ids = f"{p.vid:04X}:{p.pid or 0:04X}" if p.vid is not None else "-"
+        mark = "*" if p.device == found else " "
+        print(f"{mark} {p.device:<24} {ids:<10} {device_kind(p) or '':<22} {p.description}")
+    print(f"Blink detector: {found or 'none found'}")
+    sys.exit(0)
@@ -0,0 +1,297 @@
+import math
+import numpy as np
+
+# -----------------------------
+# Host-side copy of the firmware blink pipeline
+# (EOG Filter.ino / EOG EMG combined filter.ino):
+#
+#   raw ADC -> 4th-order high-pass (two cascaded biquads)
+#           -> 100 ms moving-average envelope
+#           -> 1 s baseline calibration
+#           -> hysteresis blink detection with debounce
+#           -> blink sequences grouped for 1 s -> code = blinks - 1
+#
+# Everything works on blocks of samples and carries its state to the next
+# block, so feeding 1 sample at a time or a whole recording at once gives
+# the same result. Time is counted in samples at the nominal sample rate
+# (the firmware uses millis()), and all thresholds are the firmware's.
+# -----------------------------
+
+SAMPLE_RATE = 500
+
+# Same coefficients as the .ino files, stored as float like the Biquad struct.
+HP_SECTIONS = (
+    (0.9780, -1.9560, 0.9780, -1.9556, 0.9565),   # b0, b1, b2, a1, a2
+    (0.9565, -1.9130, 0.9565, -1.9119, 0.9169),
+)
+
+ENVELOPE_WINDOW_MS = 100
+CALIBRATION_MS = 1000
+BLINK_TRIGGER_NEGATIVE = -15.0
+BLINK_RESET_NEGATIVE = -15.0
+BLINK_DEBOUNCE_MS = 200
+BLINK_SEQUENCE_TIMEOUT_MS = 1000
+EMG_FULL_SCALE = 1023.0
+
+
+def envelope_window_size(fs, window_ms=ENVELOPE_WINDOW_MS):
+    # Integer division, exactly like ENVELOPE_WINDOW_SIZE in the firmware.
+    return (window_ms * fs) // 1000
+
+
+def ms_to_samples(ms, fs):
+    # First sample count whose elapsed time is >= ms.
+    return math.ceil(ms * fs / 1000)
+
+
+# -----------------------------
+# Cascaded biquads, block form
+#
+# The firmware runs each biquad in transposed direct form II with state
+# (s1, s2). For a block of L samples the whole cascade is linear in the
+# incoming state and the input, so it is precomputed once as matrices:
+#     y      = O[:L] @ s + T[:L, :L] @ x
+#     s_next = A^L @ s + G[:, -L:] @ x
+# The state vector is the firmware's own (s1, s2) of each section.
+# -----------------------------
+class BiquadCascade:
+    def __init__(self, sections=HP_SECTIONS, chunk=64):
+        coeffs = [[float(np.float32(c)) for c in sec] for sec in sections]
+        order = 2 * len(coeffs)
+        A = np.zeros((order, order))
+        B = np.zeros(order)
+        C = np.zeros(order)
+        D = 1.0
+
+        # Chain the sections: the input of section k is the output of k-1,
+        # which is C_prev @ s + D_prev * x.
+        for k, (b0, b1, b2, a1, a2) in enumerate(coeffs):
+            i = 2 * k
+            A[i, i], A[i, i + 1] = -a1, 1.0
+            A[i + 1, i] = -a2
+            # input_k = C @ s + D * x (C, D describe the cascade so far)
+            A[i] += (b1 - a1 * b0) * C
+            A[i + 1] += (b2 - a2 * b0) * C
+            B[i] = (b1 - a1 * b0) * D
+            B[i + 1] = (b2 - a2 * b0) * D
+            C = b0 * C
+            C[i] += 1.0
+            D = b0 * D
+
+        powers = [np.eye(order)]
+        for _ in range(chunk):
+            powers.append(A @ powers[-1])
+        h = np.array([D] + [C @ powers[k - 1] @ B for k in range(1, chunk)])
+        T = np.zeros((chunk, chunk))
+        for k in range(chunk):
+            T[np.arange(k, chunk), np.arange(0, chunk - k)] = h[k]
+
+        self.chunk = chunk
+        self.order = order
+        self.O = np.array([C @ powers[k] for k in range(chunk)])
+        self.T = T
+        self.G = np.stack([powers[chunk - 1 - k] @ B for k in range(chunk)], axis=1)
+        self.A_pow = powers
+        self.state = np.zeros(order)
+
+    def reset(self):
+        self.state = np.zeros(self.order)
+
+    def process(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        n = len(x)
+        if n == 0:
+            return x.copy()
+        chunk = self.chunk
+        full = n // chunk
+        y = np.empty(n)
+        s = self.state
+
+        if full:
+            X = x[:full * chunk].reshape(full, chunk)
+            Y = X @ self.T.T                 # zero-state response of every chunk
+            S_in = X @ self.G.T              # each chunk's contribution to the next state
+            A_chunk = self.A_pow[chunk]
+            states = np.empty((full, self.order))
+            for j in range(full):            # tiny (order x order) recursion
+                states[j] = s
+                s = A_chunk @ s + S_in[j]
+            Y += states @ self.O.T
+            y[:full * chunk] = Y.ravel()
+
+        rest = n - full * chunk
+        if rest:
+            xs = x[full * chunk:]
+            y[full * chunk:] = self.O[:rest] @ s + self.T[:rest, :rest] @ xs
+            s = self.A_pow[rest] @ s + self.G[:, chunk - rest:] @ xs
+
+        self.state = s
+        return y
+
+
+# -----------------------------
+# Moving-average envelope (firmware's circular buffer, starts zero-filled)
+# -----------------------------
+class MovingAverage:
+    def __init__(self, window):
+        self.window = window
+        self.history = np.zeros(window)
+
+    def reset(self):
+        self.history = np.zeros(self.window)
+
+    def process(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        ext = np.concatenate((self.history, x))
+        csum = np.concatenate(([0.0], np.cumsum(ext)))
+        w = self.window
+        env = (csum[w + 1:] - csum[1:len(x) + 1]) / w
+        self.history = ext[-w:]
+        return env
+
+
+# -----------------------------
+# Calibration + hysteresis detection + sequence grouping
+# -----------------------------
+class BlinkCode:
+    __slots__ = ("sample", "code", "emg")
+
+    def __init__(self, sample, code, emg):
+        self.sample, self.code, self.emg = sample, code, emg
+
+    def __repr__(self):
+        return f"BlinkCode(sample={self.sample}, code={self.code}, emg={self.emg:.3f})"
+
+    def line(self, with_emg=False):
+        # What the firmware would have printed for this code.
+        return f"{self.code},{self.emg:.3f}" if with_emg else str(self.code)
+
+
+class BlinkEngine:
+    def __init__(self, fs=SAMPLE_RATE, sections=HP_SECTIONS,
+                 trigger=BLINK_TRIGGER_NEGATIVE, reset=BLINK_RESET_NEGATIVE,
+                 debounce_ms=BLINK_DEBOUNCE_MS, sequence_timeout_ms=BLINK_SEQUENCE_TIMEOUT_MS,
+                 calibration_ms=CALIBRATION_MS, envelope_ms=ENVELOPE_WINDOW_MS):
+        self.fs = fs
+        self.trigger = trigger
+        self.reset_level = reset
+        self.debounce = ms_to_samples(debounce_ms, fs)
+        self.sequence_timeout = ms_to_samples(sequence_timeout_ms, fs)
+        self.calibration_ms = calibration_ms
+
+        window = envelope_window_size(fs, envelope_ms)
+        self.eog_filter = BiquadCascade(sections)
+        self.eog_envelope = MovingAverage(window)
+        self.emg_filter = BiquadCascade(sections)
+        self.emg_envelope = MovingAverage(window)
+        self.reset()
+
+    def reset(self):
+        for stage in (self.eog_filter, self.eog_envelope, self.emg_filter, self.emg_envelope):
+            stage.reset()
+        self.n = 0                   # absolute index of the next sample
+        self.calibrated = False
+        self.calibrated_at = None
+        self.cal_sum = 0.0
+        self.cal_count = 0
+        self.baseline = 0.0
+        self.waiting_for_reset = False
+        self.last_blink = 0          # firmware starts with lastBlinkTime = 0
+        self.sequence_count = 0
+        self.sequence_first = 0
+        self.blinks = []             # absolute sample of every detected blink in the last block
+        self.adjusted = None         # baseline-adjusted envelope of the last block
+
+    def _calibrate(self, env, base):
+        """Return (adjusted envelope, first local index where detection runs)."""
+        if self.calibrated:
+            return env - self.baseline, 0
+        idx = base + np.arange(len(env))
+        done = np.flatnonzero(idx * 1000 > self.calibration_ms * self.fs)
+        if len(done) == 0:
+            self.cal_sum += env.sum()
+            self.cal_count += len(env)
+            return env.copy(), len(env)
+        k = done[0]
+        self.cal_sum += env[:k + 1].sum()
+        self.cal_count += k + 1
+        self.baseline = self.cal_sum / self.cal_count
+        self.calibrated = True
+        self.calibrated_at = base + k
+        adjusted = env.copy()
+        adjusted[k:] -= self.baseline
+        return adjusted, k
+
+    def _detect(self, adjusted, start, base):
+        # Only the samples where the state can change are visited: threshold
+        # crossings are found with one vectorized comparison each.
+        below = np.flatnonzero(adjusted < self.trigger)
+        above = np.flatnonzero(adjusted > self.reset_level)
+        blinks = []
+        pos = start
+        n = len(adjusted)
+        while pos < n:
+            if not self.waiting_for_reset:
+                earliest = max(pos, self.last_blink + self.debounce - base)
+                i = np.searchsorted(below, earliest)
+                if i == len(below):
+                    break
+                b = int(below[i])
+                blinks.append(base + b)
+                self.last_blink = base + b
+                self.waiting_for_reset = True
+                pos = b + 1
+            else:
+                i = np.searchsorted(above, pos)
+                if i == len(above):
+                    break
+                self.waiting_for_reset = False
+                pos = int(above[i]) + 1
+        return blinks
+
+    def _group(self, blinks, base, end, emg_env):
+        codes = []
+
+        def emit(sample):
+            count = self.sequence_count
+            self.sequence_count = 0
+            if 2 <= count <= 4:
+                emg = emg_env[sample - base] / EMG_FULL_SCALE if emg_env is not None else float("nan")
+                codes.append(BlinkCode(sample, count - 1, emg))
+
+        for b in blinks:
+            if self.sequence_count and self.sequence_first + self.sequence_timeout < b:
+                emit(self.sequence_first + self.sequence_timeout)
+            if self.sequence_count == 0:
+                self.sequence_first = b
+            self.sequence_count += 1
+            if self.sequence_first + self.sequence_timeout <= b:
+                emit(b)
+        if self.sequence_count and self.sequence_first + self.sequence_timeout <= end:
+            emit(self.sequence_first + self.sequence_timeout)
+        return codes
+
+    def filter(self, eog):
+        """High-passed signal and its moving-average envelope for one EOG block."""
+        filtered = self.eog_filter.process(eog)
+        env = self.eog_envelope.process(filtered)
+        return filtered, env
+
+    def process(self, eog, emg=None):
+        """Feed one block of raw ADC samples; return the BlinkCodes it completes."""
+        eog = np.asarray(eog, dtype=np.float64)
+        n = len(eog)
+        if n == 0:
+            return []
+        base = self.n
+        _, env = self.filter(eog)
+        adjusted, start = self._calibrate(env, base)
+        emg_env = None
+        if emg is not None:
+            emg_env = self.emg_envelope.process(self.emg_filter.process(emg))
+
+        self.blinks = self._detect(adjusted, start, base)
+        codes = self._group(self.blinks, base, base + n - 1, emg_env)
+        self.n = base + n
+        self.adjusted = adjusted
+        return codes
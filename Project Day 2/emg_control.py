@@ -0,0 +1,192 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import dsp
+from scan_engine import ADVANCE, SELECT
+
+# -----------------------------
+# EMG (jaw clench) as a second, continuous input
+#
+# The combined firmware measures EMG next to EOG. Besides "code,emg" it
+# prints "E,<level>" every EMG_REPORT_MS (in binary mode acquisition.py
+# works the same level out of the raw samples with EmgLevel). EmgControl
+# turns that level, scaled between this user's calibrated rest and
+# clench levels (emg_rest / emg_clench in settings.json), into:
+#
+#   CONFIRM   a short clench (hold_ms .. long_ms): select now, without the
+#             blink sequence and its 1 s firmware timeout
+#   SKIP      a long clench: one step at long_ms, then one every repeat_ms
+#             while held, to run down rows (or keys) quickly
+#   speed     light tension below a clench shortens the auto scan dwell,
+#             down to (1 - speed_gain) of it; relaxed is full dwell. The
+#             band ends at `release`: held above it, noise reaching `firm`
+#             starts a clench that only ends below `release` (a false
+#             confirm), so harder tension gets the full dwell back
+#
+# What the actions mean depends on the keyboard:
+#
+#                manual scan            auto scan
+#   CONFIRM      code 2 (select)        code 1 (select what is highlighted)
+#   SKIP         code 1 (advance)       move the highlight on (AutoScan.skip)
+#
+# Partition selection has no use for them and ignores EMG.
+#
+#   python emg_control.py calibrate /dev/ttyACM0     # relax, clench, save
+# -----------------------------
+
+EMG_PREFIX = "E,"
+EMG_REPORT_MS = 50              # firmware's EMG_REPORT_MS to build with for EMG control (its default is 0: off)
+CONFIRM = "confirm"
+SKIP = "skip"
+
+
+def emg_line(level):
+    return f"{EMG_PREFIX}{level:.3f}"
+
+
+class EmgControl:
+    def __init__(self, rest, clench, tense=0.25, firm=0.7, release=0.5, hold_ms=80, long_ms=600,
+                 repeat_ms=500, refractory_ms=250, speed_gain=0.6, smoothing=0.3):
+        self.rest = rest
+        self.span = max(clench - rest, 1e-6)
+        self.tense = tense              # scaled levels: 0 at rest, 1 at the calibrated clench
+        self.firm = firm
+        self.release = release          # a clench ends below this (hysteresis)
+        self.hold_ns = int(hold_ms * 1e6)
+        self.long_ns = int(long_ms * 1e6)
+        self.repeat_ns = int(repeat_ms * 1e6)
+        self.refractory_ns = int(refractory_ms * 1e6)
+        self.speed_gain = speed_gain
+        self.smoothing = smoothing
+        self.level = 0.0
+        self.speed = 1.0
+        self.clench_ns = None           # when the current clench started
+        self.skips = 0                  # SKIPs of the current clench
+        self.released_ns = None
+        self.actions = {CONFIRM: 0, SKIP: 0}
+
+    def scale(self, emg):
+        return (emg - self.rest) / self.span
+
+    def update(self, emg, now=None):
+        """One EMG level reading; returns the actions it completes as
+        (action, clench start ns): auto scan selects what was highlighted then."""
+        now = time.monotonic_ns() if now is None else now
+        x = self.scale(emg)
+        self.level += self.smoothing * (x - self.level)
+        out = self._clench(x, now)
+        # A clench passes through the tension band on its way up and down:
+        # during one (and its refractory time) the speed stays what it was.
+        resting = self.released_ns is not None and now - self.released_ns < self.refractory_ns
+        if self.clench_ns is not None or resting:
+            pass
+        elif self.tense <= self.level < self.release:
+            self.speed = 1.0 - self.speed_gain * (self.level - self.tense) / (self.release - self.tense)
+        else:
+            self.speed = 1.0
+        for action, _ in out:
+            self.actions[action] += 1
+        return out
+
+    def _clench(self, x, now):
+        out = []
+        if self.clench_ns is None:
+            resting = self.released_ns is not None and now - self.released_ns < self.refractory_ns
+            if x >= self.firm and not resting:
+                self.clench_ns = now
+                self.skips = 0
+            return out
+        held = now - self.clench_ns
+        if x < self.release:
+            if self.skips == 0 and held >= self.hold_ns:
+                out.append((CONFIRM, self.clench_ns))
+            self.clench_ns = None
+            self.released_ns = now
+        else:
+            due = 0 if held < self.long_ns else 1 + (held - self.long_ns) // self.repeat_ns
+            out.extend([(SKIP, now)] * int(due - self.skips))
+            self.skips = int(max(due, self.skips))
+        return out
+
+
+class EmgLevel:
+    """The firmware's emgNormalized from raw EMG samples (high-pass, 100 ms
+    envelope, / 1023), reported every `report_ms`."""
+
+    def __init__(self, fs=dsp.SAMPLE_RATE, report_ms=EMG_REPORT_MS):
+        self.filter = dsp.BiquadCascade()
+        self.envelope = dsp.MovingAverage(dsp.envelope_window_size(fs))
+        self.every = dsp.ms_to_samples(report_ms, fs)
+        self.n = 0
+        self.level = 0.0
+
+    def process(self, emg):
+        """Levels due within this block of samples."""
+        env = self.envelope.process(self.filter.process(emg)) / dsp.EMG_FULL_SCALE
+        if len(env):
+            self.level = float(env[-1])
+        first = (-self.n) % self.every
+        self.n += len(env)
+        return env[first::self.every].tolist()
+
+
+def apply(action, started, auto, code):
+    """Feed an action to a keyboard: `auto` is its AutoScan (or None),
+    `code(c, blinked)` its blink code handler."""
+    if action == SKIP and auto:
+        auto.skip()
+    elif action == SKIP:
+        code(ADVANCE, None)
+    else:
+        code(ADVANCE if auto else SELECT, started)
+
+
+def calibrate(readings_rest, readings_clench):
+    """(rest, clench) levels from readings taken relaxed and clenching."""
+    rest = float(np.median(readings_rest))
+    clench = float(np.percentile(readings_clench, 75))
+    if clench <= rest:
+        raise ValueError("no clench above the resting level; check the EMG electrodes")
+    return rest, clench
+
+
+def read_levels(ser, seconds):
+    from acquisition import parse_event
+    levels = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        line = ser.readline().decode(errors="ignore").strip()
+        event = parse_event(line) if line else None
+        if event and event[2] is not None:
+            levels.append(event[2])
+    return levels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate jaw-clench (EMG) control.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_cal = sub.add_parser("calibrate", help="measure resting and clench EMG and save them to settings.json")
+    p_cal.add_argument("port", help="serial port, shm:<name> or replay:<file>")
+    p_cal.add_argument("--baud", type=int, default=115200)
+    p_cal.add_argument("--seconds", type=float, default=4.0, help="per step")
+    args = parser.parse_args()
+
+    from transport import open_serial
+    from settings_store import default_store
+    ser = open_serial(args.port, args.baud, timeout=0.1)
+    levels = {}
+    for step, prompt in (("rest", "Relax your jaw"), ("clench", "Clench your jaw firmly, as to confirm")):
+        input(f"{prompt} for {args.seconds:.0f} s; press Enter to start. ")
+        ser.reset_input_buffer()
+        levels[step] = read_levels(ser, args.seconds)
+        print(f"  {len(levels[step])} readings, median {np.median(levels[step]) if levels[step] else float('nan'):.3f}")
+    ser.close()
+    if not levels["rest"] or not levels["clench"]:
+        print("No EMG levels received. Build the firmware with EMG_REPORT_MS > 0 (or use --binary).")
+        sys.exit(1)
+    rest, clench = calibrate(levels["rest"], levels["clench"])
+    default_store().save(emg_rest=rest, emg_clench=clench, emg_control=True)
+    print(f"Saved emg_rest={rest:.3f}, emg_clench={clench:.3f}, emg_control on")
+    sys.exit(0)
@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from collections import deque
+
+# -----------------------------
+# Session history: what was typed, kept across runs
+#
+# history.db (SQLite, WAL) next to this file:
+#
+#   sessions       one row per keyboard run: user, frontend, start, last
+#                  activity, characters and codes so far
+#   blinks         every blink code (and how long it took to commit)
+#   keys           every committed key, with the characters it added
+#                  (a word completion adds several, DEL removes one)
+#   lines          text committed with ENTER
+#   typing_tests   webs.py typing test results
+#
+# The keyboards only append rows to an in-memory deque (no lock, no
+# thread wake-up per row); a writer thread wakes every `batch_ms`, takes
+# what queued up and writes it in transactions of up to `max_rows`
+# (executemany per table, the session counters updated once per
+# session), short enough that it never holds the GIL for long. The
+# serial and UI threads never wait on the disk: if `limit` rows are
+# waiting (the disk stalled for a long time) new rows are dropped and
+# counted, not waited for. Reads open their own connection, which WAL
+# lets run alongside the writer.
+#
+# Per-user progress over time comes from the sessions table (indexed on
+# user, start), not from scanning the event tables.
+#
+#   history = HistoryStore()
+#   sid = history.start_session("ana", "qt")
+#   history.blink(sid, 2, latency_ms=3.1); history.key(sid, "A", 1)
+#   history.end_session(sid); history.close()
+#
+#   python history_store.py progress --user ana
+#   python history_store.py tests --user ana
+#   python bench_history.py          # write throughput under load
+# -----------------------------
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.db")
+BATCH_MS = 250
+MAX_ROWS = 2000             # per transaction
+QUEUE_LIMIT = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY, user TEXT NOT NULL, frontend TEXT NOT NULL,
+    started REAL NOT NULL, ended REAL NOT NULL, chars INTEGER NOT NULL DEFAULT 0, codes INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user, started);
+CREATE TABLE IF NOT EXISTS blinks (session INTEGER NOT NULL, t REAL NOT NULL, code INTEGER NOT NULL, latency_ms REAL);
+CREATE INDEX IF NOT EXISTS blinks_session ON blinks (session, t);
+CREATE TABLE IF NOT EXISTS keys (session INTEGER NOT NULL, t REAL NOT NULL, key TEXT NOT NULL, chars INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS keys_session ON keys (session, t);
+CREATE TABLE IF NOT EXISTS lines (session INTEGER NOT NULL, t REAL NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS lines_session ON lines (session, t);
+CREATE TABLE IF NOT EXISTS typing_tests (
+    session INTEGER, user TEXT NOT NULL, t REAL NOT NULL, target TEXT NOT NULL, typed TEXT NOT NULL,
+    seconds REAL NOT NULL, wpm REAL NOT NULL, accuracy REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS typing_tests_user ON typing_tests (user, t);
+"""
+
+INSERTS = {
+    "session": "INSERT OR IGNORE INTO sessions (id, user, frontend, started, ended) VALUES (?, ?, ?, ?, ?)",
+    "blink": "INSERT INTO blinks VALUES (?, ?, ?, ?)",
+    "key": "INSERT INTO keys VALUES (?, ?, ?, ?)",
+    "line": "INSERT INTO lines VALUES (?, ?, ?)",
+    "test": "INSERT INTO typing_tests VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")    # WAL: durable at checkpoints, no fsync per commit
+    return conn
+
+
+def new_session_id():
+    return int.from_bytes(os.urandom(6), "big")
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_FILE, batch_ms=BATCH_MS, max_rows=MAX_ROWS, limit=QUEUE_LIMIT):
+        self.path = path
+        self.batch_s = batch_ms / 1e3
+        self.max_rows = max_rows
+        self.limit = limit
+        self.pending = deque()      # (kind, row, queued monotonic_ns)
+        self.wake = threading.Event()
+        self.busy = False
+        self.stopping = False
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_ns = deque(maxlen=5000)    # queued -> committed, oldest row of each batch
+        conn = connect(path)                    # create the tables before anyone reads
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.worker = threading.Thread(target=self._run, name="history", daemon=True)
+        self.worker.start()
+
+    # -- producer side (serial / UI threads) ----------------------------
+    def _put(self, item):
+        if len(self.pending) >= self.limit:
+            self.dropped += 1
+        else:
+            self.pending.append(item)
+
+    def start_session(self, user, frontend):
+        """New session id; the row is written with the next batch."""
+        session = new_session_id()
+        now = time.time()
+        self._put(("session", (session, user, frontend, now, now), time.monotonic_ns()))
+        return session
+
+    def blink(self, session, code, latency_ms=None):
+        self._put(("blink", (session, time.time(), code, latency_ms), time.monotonic_ns()))
+
+    def key(self, session, key, chars):
+        """A committed key and the characters it added (-1 for a DEL)."""
+        self._put(("key", (session, time.time(), key, chars), time.monotonic_ns()))
+
+    def line(self, session, text):
+        self._put(("line", (session, time.time(), text), time.monotonic_ns()))
+
+    def typing_test(self, session, user, target, typed, seconds, wpm, accuracy):
+        self._put(("test", (session, user, time.time(), target, typed, seconds, wpm, accuracy),
+                   time.monotonic_ns()))
+
+    def end_session(self, session):
+        self._put(("end", (time.time(), session), time.monotonic_ns()))
+
+    def flush(self, timeout=None):
+        """Write what is queued now instead of at the next wake-up, and wait for it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.wake.set()
+        while self.pending or self.busy:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=5.0):
+        self.stopping = True
+        self.wake.set()
+        self.worker.join(timeout)
+
+    # -- writer --------------------------------------------------------
+    def _run(self):
+        conn = connect(self.path)
+        while not self.stopping or self.pending:
+            self.wake.wait(self.batch_s)
+            self.wake.clear()
+            while self.pending:
+                self.busy = True
+                items = []
+                while self.pending and len(items) < self.max_rows:
+                    items.append(self.pending.popleft())
+                try:
+                    self._write(conn, items)
+                except sqlite3.Error as e:
+                    self.errors += 1
+                    print("History error:", e)
+            self.busy = False
+        conn.close()
+
+    def _write(self, conn, items):
+        tables = {kind: [] for kind in INSERTS}
+        ends = []
+        counts = {}             # session -> [chars, codes, last activity]
+        for kind, row, _ in items:
+            if kind == "end":
+                ends.append(row)
+                continue
+            tables[kind].append(row)
+            if kind in ("blink", "key"):
+                c = counts.setdefault(row[0], [0, 0, 0.0])
+                c[0] += row[3] if kind == "key" else 0
+                c[1] += kind == "blink"
+                c[2] = row[1]
+        with conn:
+            for kind, rows in tables.items():
+                if rows:
+                    conn.executemany(INSERTS[kind], rows)
+            conn.executemany("UPDATE sessions SET chars = chars + ?, codes = codes + ?, ended = max(ended, ?) "
+                             "WHERE id = ?", [(c[0], c[1], c[2], s) for s, c in counts.items()])
+            conn.executemany("UPDATE sessions SET ended = ? WHERE id = ?", ends)
+        self.latency_ns.append(time.monotonic_ns() - items[0][2])
+        self.written += len(items)
+        self.batches += 1
+
+    def stats(self):
+        """Rows written and dropped, batches, and queued -> committed latency (ms)."""
+        lat = sorted(self.latency_ns)
+
+        def pct(q):
+            return lat[min(len(lat) - 1, int(len(lat) * q))] / 1e6 if lat else None
+
+        return {
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": len(self.pending),
+            "latency_p50_ms": pct(0.5),
+            "latency_p99_ms": pct(0.99),
+        }
+
+    # -- queries (caller's thread, own connection) ----------------------
+    def query(self, sql, args=()):
+        conn = connect(self.path)
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+    def progress(self, user, since=0.0):
+        """Per day: (day, sessions, minutes, characters, codes, characters per minute)."""
+        rows = self.query(
+            "SELECT date(started, 'unixepoch', 'localtime') AS day, COUNT(*), SUM(ended - started) / 60.0, "
+            "SUM(chars), SUM(codes) FROM sessions WHERE user = ? AND started >= ? GROUP BY day ORDER BY day",
+            (user, since))
+        return [(day, n, minutes, chars, codes, chars / minutes if minutes else 0.0)
+                for day, n, minutes, chars, codes in rows]
+
+    def typing_tests(self, user, since=0.0):
+        """Per day: (day, tests, mean wpm, best wpm, mean accuracy %)."""
+        return self.query(
+            "SELECT date(t, 'unixepoch', 'localtime') AS day, COUNT(*), AVG(wpm), MAX(wpm), AVG(accuracy) "
+            "FROM typing_tests WHERE user = ? AND t >= ? GROUP BY day ORDER BY day", (user, since))
+
+    def sessions(self, user, limit=20):
+        """Latest sessions: (id, frontend, started, minutes, characters, codes)."""
+        return self.query(
+            "SELECT id, frontend, started, (ended - started) / 60.0, chars, codes FROM sessions "
+            "WHERE user = ? ORDER BY started DESC LIMIT ?", (user, limit))
+
+    def users(self):
+        return [user for (user,) in self.query("SELECT DISTINCT user FROM sessions ORDER BY user")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show what is kept in the session history.")
+    parser.add_argument("command", choices=("progress", "tests", "sessions", "users"))
+    parser.add_argument("--user", default=None, help="default: user in settings.json")
+    parser.add_argument("--days", type=float, default=None, help="only the last N days")
+    parser.add_argument("--db", default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No history yet ({args.db})")
+        sys.exit(1)
+    if args.user is None:
+        from settings_store import default_store
+        args.user = default_store()["user"]
+    history = HistoryStore(args.db)
+    since = time.time() - args.days * 86400 if args.days else 0.0
+    if args.command == "progress":
+        print(f"{'day':<10}  {'sessions':>8}  {'minutes':>7}  {'chars':>6}  {'codes':>6}  {'chars/min':>9}")
+        for day, n, minutes, chars, codes, cpm in history.progress(args.user, since):
+            print(f"{day:<10}  {n:8}  {minutes:7.1f}  {chars:6}  {codes:6}  {cpm:9.2f}")
+    elif args.command == "tests":
+        print(f"{'day':<10}  {'tests':>5}  {'wpm':>6}  {'best':>6}  {'accuracy':>8}")
+        for day, n, wpm, best, accuracy in history.typing_tests(args.user, since):
+            print(f"{day:<10}  {n:5}  {wpm:6.1f}  {best:6.1f}  {accuracy:7.1f}%")
+    elif args.command == "sessions":
+        for sid, frontend, started, minutes, chars, codes in history.sessions(args.user):
+            print(f"{sid:>15}  {frontend:<6}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}  "
+                  f"{minutes:6.1f} min  {chars:6} chars  {codes:6} codes")
+    else:
+        print("\n".join(history.users()))
+    history.close()
+    sys.exit(0)
@@ -0,0 +1,409 @@
+import sys
+import json
+import socket
+import time
+import random
+import asyncio
+import argparse
+from http import HTTPStatus
+
+try:
+    from websockets.asyncio.server import serve
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:
+    print("websockets not installed. Install it with: pip install websockets")
+    sys.exit(1)
+
+from transport import open_serial
+from acquisition import parse_event
+from scan_engine import ScanEngine, EMIT
+from partition_engine import PartitionEngine, ARITY, MODES as SELECTION_MODES, weights_for
+from settings_store import SettingsStore
+from text_buffer import TextBuffer
+from history_store import HistoryStore, HISTORY_FILE
+import metrics
+
+# -----------------------------
+# Blink hub: many devices, one process
+#
+# One asyncio loop reads any number of blink detectors (serial ports,
+# shm:, replay:, or simulated devices) and keeps a keyboard session per
+# device: its own scanning state and typed text. Clients (a browser, a
+# Qt window, the --watch printer below) connect over WebSocket and get a
+# snapshot of the sessions they follow, then only what changed:
+#
+#   ws://host:8765/            every device
+#   ws://host:8765/<device>    one device
+#   http://host:8765/          a small browser view of every device
+#
+# Each frame is a JSON list of messages:
+#   {"type": "snapshot", "device", "seq", "row", "col", "selecting_row", "text"[, "groups"]}
+#   {"type": "delta", "device", "seq", "t", <only the fields that changed>[, "key", "edits"]}
+# "t" is the monotonic_ns arrival time of the code (for latency on the
+# same machine); "groups" is [[row, col, code], ...] in binary/ternary mode.
+# The text is only in snapshots; a delta has the edits made to it, as
+# [start, characters removed, text inserted], so a key costs the same
+# to send an hour into a session as at its start.
+#
+# Backpressure: a client has one frame in flight at a time. After each
+# frame the sender pings and waits for the pong, which the client only
+# answers once it has read what came before, so frames never pile up in
+# websockets' or the kernel's buffers. Device reading never waits for a
+# client: until the pong is back, a client's changes are merged per device
+# (the latest fields win, the text edits add up, "key" is the last key)
+# and go out together in the next frame. A slow client skips
+# intermediate highlights, but what it gets is never older than one
+# frame of its own, and never wrong. A device with more than `limit`
+# edits waiting is resynced with a snapshot instead.
+#
+# With --history every device is a user in history.db (history_store.py):
+# blinks and keys are queued for its writer thread, never waited for.
+#
+# Ports are polled every poll_ms (settings.json) without blocking, so
+# there are no threads; all engines for scan mode share one transition
+# table (ScanEngine keeps no per-user state).
+#
+#   python hub.py /dev/ttyACM0 /dev/ttyACM1 --port 8765
+#   python hub.py --simulate 24 --rate 1
+#   python hub.py --watch ws://127.0.0.1:8765/sim0
+# -----------------------------
+
+HUB_PORT = 8765
+CLIENT_EDITS = 256          # text edits merged per device before a client is resynced
+SEND_BUFFER = 16 * 1024     # kernel send buffer per client socket, bytes
+FIRMWARE_RATE_HZ = 1.0      # a code needs >= BLINK_SEQUENCE_TIMEOUT (1 s) after its first blink
+
+KEYBOARD_ROWS = [
+    list("1234567890"),
+    list("QWERTYUIOP"),
+    list("ASDFGHJKL"),
+    list("ZXCVBNM"),
+    ["SPACE", "DEL", "ENTER"],
+]
+
+
+class Session:
+    def __init__(self, device, selection="scan", engine=None):
+        self.device = device
+        self.partition = selection in ARITY
+        if self.partition:
+            self.keys = [k for row in KEYBOARD_ROWS for k in row]
+            self.engine = PartitionEngine(KEYBOARD_ROWS, ARITY[selection], weights_for(self.keys))
+        else:
+            self.engine = engine or ScanEngine(KEYBOARD_ROWS)
+        self.state = self.engine.new_state()
+        self.buffer = TextBuffer()
+        self.edits = []
+        self.buffer.subscribe(lambda start, removed, inserted: self.edits.append([start, len(removed), inserted]))
+        self.seq = 0
+        self.sent = self.fields()
+
+    def fields(self):
+        s = self.state
+        out = {"row": s.row, "col": s.col, "selecting_row": s.selecting_row}
+        if self.partition:
+            out["groups"] = sorted([r, c, code] for (r, c), code in self.engine.groups(s).items())
+        return out
+
+    def snapshot(self):
+        return {"type": "snapshot", "device": self.device, "seq": self.seq, **self.sent, "text": str(self.buffer)}
+
+    def apply(self, code, arrived):
+        """Apply a blink code; returns the delta message, or None if nothing changed."""
+        action = self.engine.step(self.state, code)
+        key = None
+        if action.kind == EMIT:
+            key = action.key
+            before = len(self.buffer)
+            if key == "SPACE":
+                self.buffer.insert(" ")
+            elif key == "DEL":
+                self.buffer.delete()
+            elif key == "ENTER":
+                self.buffer.insert("\n")
+            else:
+                self.buffer.insert(key)
+            if len(self.buffer) > before:
+                metrics.CHARS.inc(len(self.buffer) - before)
+            if self.partition:
+                self.engine.set_weights(weights_for(self.keys, None, self.buffer.context()))
+                self.engine.reset(self.state)
+        now = self.fields()
+        changed = {k: v for k, v in now.items() if self.sent.get(k) != v}
+        if not changed and key is None:
+            return None
+        self.sent = now
+        self.seq += 1
+        delta = {"type": "delta", "device": self.device, "seq": self.seq, "t": arrived, **changed}
+        if key is not None:
+            delta["key"] = key
+        if self.edits:
+            delta["edits"], self.edits = self.edits, []
+        return delta
+
+
+class Client:
+    def __init__(self, ws, device=None, limit=CLIENT_EDITS):
+        self.ws = ws
+        self.device = device        # None: every device
+        self.limit = limit
+        self.pending = {}           # device -> delta to send, None for a snapshot
+        self.ready = asyncio.Event()
+        self.merged = 0
+        self.resyncs = 0
+
+    def wants(self, device):
+        return self.device is None or self.device == device
+
+    def push(self, message):
+        device = message["device"]
+        if device not in self.pending:
+            self.pending[device] = message
+        else:
+            # Not sent yet: fold this change into it.
+            old = self.pending[device]
+            self.merged += 1
+            if old is None:
+                return
+            edits = old.get("edits", []) + message.get("edits", [])
+            if len(edits) > self.limit:
+                self.pending[device] = None
+                self.resyncs += 1
+                return
+            merged = {**old, **message}
+            if edits:
+                merged["edits"] = edits
+            self.pending[device] = merged
+        self.ready.set()
+
+
+class Hub:
+    def __init__(self, selection="scan", poll_ms=20, limit=CLIENT_EDITS, history=None):
+        self.selection = selection
+        self.history = history
+        self.history_sessions = {}  # device -> history session id
+        self.poll_s = poll_ms / 1e3
+        self.limit = limit
+        self.scan_engine = ScanEngine(KEYBOARD_ROWS)     # shared: the table is read-only
+        self.sessions = {}
+        self.ports = {}             # device -> [serial-like, partial line]
+        self.clients = set()
+        self.codes = 0
+
+    # -- devices -------------------------------------------------------
+    def add_device(self, device, port=None, baud=115200):
+        self.sessions[device] = Session(device, self.selection, self.scan_engine)
+        if self.history:
+            self.history_sessions[device] = self.history.start_session(device, "hub")
+        if port is not None:
+            # Raw blinks are grouped per device; each learns its own user's
+            # timing for the session (no shared blink_timing.json).
+            self.ports[device] = [open_serial(port, baud, timeout=0, timing=None), b""]
+
+    def feed(self, device, line, arrived=None):
+        """One line from a device (any source)."""
+        arrived = arrived or time.monotonic_ns()
+        metrics.SERIAL_LINES.inc()
+        event = metrics.count_event(parse_event(line))
+        code = event[1] if event else None
+        if code is None:
+            return
+        self.codes += 1
+        session = self.sessions[device]
+        before = len(session.buffer)
+        delta = session.apply(code, arrived)
+        if self.history:
+            sid = self.history_sessions[device]
+            self.history.blink(sid, code, (time.monotonic_ns() - arrived) / 1e6)
+            if delta is not None and "key" in delta:
+                self.history.key(sid, delta["key"], len(session.buffer) - before)
+        if delta is not None:
+            for client in self.clients:
+                if client.wants(device):
+                    client.push(delta)
+
+    async def poll_ports(self):
+        while True:
+            for device, entry in self.ports.items():
+                ser = entry[0]
+                try:
+                    while ser.in_waiting:
+                        data = entry[1] + ser.readline()
+                        if not data.endswith(b"\n"):
+                            entry[1] = data         # rest of the line not here yet
+                            break
+                        entry[1] = b""
+                        line = data.decode(errors="ignore").strip()
+                        if line:
+                            self.feed(device, line, getattr(ser, "last_mono_ns", None))
+                except Exception as e:
+                    print(f"{device}: read error: {e}")
+            await asyncio.sleep(self.poll_s)
+
+    # -- clients -------------------------------------------------------
+    async def handler(self, ws):
+        device = ws.request.path.strip("/") or None
+        if device is not None and device not in self.sessions:
+            await ws.close(1008, f"no device {device}")
+            return
+        client = Client(ws, device, self.limit)
+        self.clients.add(client)
+        sender = asyncio.create_task(self.send_loop(client))
+        try:
+            async for _ in ws:      # clients only listen; wait for the close
+                pass
+        except ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+    def snapshots(self, client):
+        return [s.snapshot() for d, s in self.sessions.items() if client.wants(d)]
+
+    async def send_loop(self, client):
+        try:
+            await client.ws.send(json.dumps(self.snapshots(client)))
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                pending, client.pending = client.pending, {}
+                frame = [self.sessions[d].snapshot() if m is None else m for d, m in pending.items()]
+                await client.ws.send(json.dumps(frame))
+                await (await client.ws.ping())      # one frame in flight; changes meanwhile are merged
+        except ConnectionClosed:
+            pass
+
+    def process_request(self, connection, request):
+        if request.headers.get("Upgrade", "").lower() != "websocket":
+            response = connection.respond(HTTPStatus.OK, VIEW_HTML)
+            del response.headers["Content-Type"]
+            response.headers["Content-Type"] = "text/html; charset=utf-8"
+            return response
+        return None
+
+    def stats(self):
+        return {
+            "devices": len(self.sessions),
+            "clients": len(self.clients),
+            "codes": self.codes,
+            "merged": sum(c.merged for c in self.clients),
+            "resyncs": sum(c.resyncs for c in self.clients),
+        }
+
+
+# -----------------------------
+# Simulated devices: codes at about the firmware's rate, for the load
+# test (bench_hub.py) and for trying clients without hardware.
+# -----------------------------
+async def simulate(hub, device, rate_hz=FIRMWARE_RATE_HZ, seed=None):
+    rng = random.Random(seed)
+    while True:
+        await asyncio.sleep(rng.expovariate(rate_hz))
+        hub.feed(device, rng.choice("1112223"))
+
+
+def listen_socket(host="127.0.0.1", port=HUB_PORT):
+    """Listening socket whose connections get a SEND_BUFFER send buffer and no Nagle
+    delay (accepted sockets inherit both): the ping after a frame goes out at once."""
+    sock = socket.create_server((host, port), reuse_port=False)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def serve_hub(hub, sock):
+    return serve(hub.handler, sock=sock, process_request=hub.process_request, max_queue=16, write_limit=SEND_BUFFER)
+
+
+async def run_hub(hub, host="127.0.0.1", port=HUB_PORT, simulated=(), rate_hz=FIRMWARE_RATE_HZ):
+    tasks = [asyncio.create_task(hub.poll_ports())]
+    tasks += [asyncio.create_task(simulate(hub, d, rate_hz, seed=i)) for i, d in enumerate(simulated)]
+    async with serve_hub(hub, listen_socket(host, port)):
+        print(f"Hub: {len(hub.sessions)} devices, ws://{host}:{port}/  (browser: http://{host}:{port}/)")
+        while True:
+            await asyncio.sleep(10)
+            print("Hub:", hub.stats())
+
+
+async def watch(url):
+    """Reference client: print what the hub sends."""
+    async with connect(url) as ws:
+        async for frame in ws:
+            for message in json.loads(frame):
+                text = message.get("text")
+                where = " ".join(f"{k} {message[k]}" for k in ("row", "col") if k in message)
+                print(f"{message['device']:>8} #{message['seq']:<5} {message['type']:<8} {where:<16}"
+                      + (f" key {message['key']}" if "key" in message else "")
+                      + (f" text {text!r}" if text is not None else "")
+                      + "".join(f" edit {start}-{removed}+{inserted!r}"
+                                for start, removed, inserted in message.get("edits", ())))
+
+
+VIEW_HTML = """<!doctype html>
+<meta charset="utf-8"><title>Blink hub</title>
+<style>body{background:#000;color:#fff;font-family:sans-serif} .d{margin:12px 0}
+.k{display:inline-block;min-width:2em;padding:4px;margin:2px;background:#111;text-align:center;border-radius:4px}
+.r{background:#222;outline:2px solid #1E90FF} .c{background:#163F13;outline:2px solid #32CD32}</style>
+<div id="devices"></div>
+<script>
+const ROWS = %s, state = {};
+const ws = new WebSocket(`ws://${location.host}/`);
+ws.onmessage = (e) => {
+  for (const m of JSON.parse(e.data)) {
+    const s = state[m.device] = Object.assign(state[m.device] || {}, m);
+    for (const [start, removed, inserted] of m.edits || [])
+      s.text = s.text.slice(0, start) + inserted + s.text.slice(start + removed);
+  }
+  document.getElementById("devices").innerHTML = Object.entries(state).map(([d, s]) =>
+    `<div class="d"><b>${d}</b>: ${(s.text || "").replace(/</g, "&lt;")}<br>` + ROWS.map((row, r) =>
+      row.map((k, c) => `<span class="k ${s.selecting_row && r == s.row ? "r" : ""}
+        ${!s.selecting_row && r == s.row && c == s.col ? "c" : ""}">${k}</span>`).join("")).join("<br>") + "</div>").join("");
+};
+</script>
+""" % json.dumps(KEYBOARD_ROWS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many blink keyboards from one process.")
+    parser.add_argument("ports", nargs="*", help="serial ports, shm:<name> or replay:<file>[@speed]")
+    parser.add_argument("--simulate", type=int, default=0, help="add this many simulated devices")
+    parser.add_argument("--rate", type=float, default=FIRMWARE_RATE_HZ, help="codes/s per simulated device")
+    parser.add_argument("--selection", choices=SELECTION_MODES, default=None,
+                        help="default: selection_mode in settings.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=HUB_PORT)
+    parser.add_argument("--watch", metavar="URL", help="print what a running hub sends, e.g. ws://127.0.0.1:8765/")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, default=None, metavar="DB",
+                        help="keep every device's session in history.db (or DB)")
+    args = parser.parse_args()
+
+    if args.watch:
+        try:
+            asyncio.run(watch(args.watch))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    settings = SettingsStore(overrides={"selection_mode": args.selection})
+    history = HistoryStore(args.history) if args.history else None
+    hub = Hub(settings["selection_mode"], settings["poll_ms"], history=history)
+    for i, port in enumerate(args.ports):
+        hub.add_device(f"dev{i}", port, settings["baud_rate"])
+    simulated = [f"sim{i}" for i in range(args.simulate)]
+    for device in simulated:
+        hub.add_device(device)
+    if not hub.sessions:
+        print("No devices: give serial ports or --simulate N")
+        sys.exit(1)
+    try:
+        asyncio.run(run_hub(hub, args.host, args.port, simulated, args.rate))
+    except KeyboardInterrupt:
+        pass
+    if history:
+        for sid in hub.history_sessions.values():
+            history.end_session(sid)
+        history.close()
+        print("History:", history.stats())
+    sys.exit(0)
@@ -0,0 +1,184 @@
+import time
+from collections import deque
+
+from PySide6.QtWidgets import QWidget, QSizePolicy
+from PySide6.QtGui import QPainter, QPixmap, QColor, QPen, QFont, QFontMetrics
+from PySide6.QtCore import Qt, QRect, QRectF, QSize
+
+# -----------------------------
+# Custom-painted keyboard
+#
+# One widget draws every key in paintEvent() from pre-rendered tiles
+# (one pixmap per key label and style), so a highlight change costs two
+# or three drawPixmap() calls instead of a setStyleSheet() re-polish on
+# every QLabel. set_highlight() marks only the keys whose look changed
+# as dirty; Qt merges those rects and paintEvent() skips the rest.
+#
+# Frame times of the last paints are kept in `frame_ms` (and the key
+# tiles drawn per paint in `keys_drawn`) for measuring render cost.
+# -----------------------------
+
+NORMAL = 0
+ROW_HIGHLIGHT = 1
+KEY_HIGHLIGHT = 2
+GROUP_1 = 3         # partition selection: the code that picks the key
+GROUP_2 = 4
+GROUP_3 = 5
+OUT = 6             # no longer a candidate
+GROUP_STYLES = {1: GROUP_1, 2: GROUP_2, 3: GROUP_3}
+
+# (background, border colour, border width) per style, as the label
+# stylesheets had them.
+STYLES = {
+    NORMAL: ("#111", "#555", 1),
+    ROW_HIGHLIGHT: ("#333", "#0f0", 2),
+    KEY_HIGHLIGHT: ("#333", "#0f0", 2),
+    GROUP_1: ("#163F13", "#32CD32", 2),
+    GROUP_2: ("#10243F", "#1E90FF", 2),
+    GROUP_3: ("#3F2A10", "#FFA500", 2),
+    OUT: ("#050505", "#222", 1),
+}
+
+
+class KeyboardWidget(QWidget):
+    def __init__(self, rows, key_size=60, gap=6, font_size=16, styles=None, wide_rows=(), parent=None):
+        super().__init__(parent)
+        self.rows = [list(r) for r in rows]
+        self.key_size = key_size
+        self.gap = gap
+        # Rows in wide_rows (word predictions) get keys two keys wide.
+        self.widths = [2 * key_size + gap if r in wide_rows else key_size for r in range(len(self.rows))]
+        self.styles = dict(STYLES, **(styles or {}))
+        self.font = QFont()
+        self.font.setPixelSize(font_size)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+        self.highlight = (-1, -1, True)     # row, col, selecting_row
+        self.key_style = [[NORMAL] * len(r) for r in self.rows]
+        self.rects = []
+        self.tiles = {}                     # (label, style, width, dpr) -> QPixmap
+
+        self.frame_ms = deque(maxlen=1000)
+        self.keys_drawn = deque(maxlen=1000)
+        self.paints = 0
+        self._layout()
+
+    # -- geometry ------------------------------------------------------
+    def sizeHint(self):
+        widest = max(len(keys) * (w + self.gap) for keys, w in zip(self.rows, self.widths))
+        step = self.key_size + self.gap
+        return QSize(widest + self.gap, len(self.rows) * step + self.gap)
+
+    def minimumSizeHint(self):
+        return self.sizeHint()
+
+    def _layout(self):
+        step = self.key_size + self.gap
+        self.rects = []
+        for r, keys in enumerate(self.rows):
+            w = self.widths[r]
+            left = (self.width() - (len(keys) * (w + self.gap) - self.gap)) // 2
+            top = self.gap + r * step
+            self.rects.append([QRect(left + c * (w + self.gap), top, w, self.key_size)
+                               for c in range(len(keys))])
+
+    def resizeEvent(self, event):
+        self._layout()
+        super().resizeEvent(event)
+
+    # -- tiles ---------------------------------------------------------
+    def _tile(self, label, style, w):
+        dpr = self.devicePixelRatioF()
+        key = (label, style, w, dpr)
+        tile = self.tiles.get(key)
+        if tile is None:
+            background, border, width = self.styles[style]
+            h = self.key_size
+            tile = QPixmap(round(w * dpr), round(h * dpr))
+            tile.setDevicePixelRatio(dpr)
+            tile.fill(QColor("black"))
+            p = QPainter(tile)
+            p.setRenderHint(QPainter.Antialiasing)
+            p.setPen(QPen(QColor(border), width))
+            p.setBrush(QColor(background))
+            inset = width / 2
+            p.drawRect(QRectF(inset, inset, w - width, h - width))
+            p.setPen(QColor("white"))
+            p.setFont(self.font)
+            text = QFontMetrics(self.font).elidedText(label, Qt.ElideRight, w - 6)
+            p.drawText(QRect(0, 0, w, h), Qt.AlignCenter, text)
+            p.end()
+            self.tiles[key] = tile
+        return tile
+
+    # -- updates -------------------------------------------------------
+    def set_highlight(self, row, col, selecting_row):
+        """Move the highlight; only keys whose style changes are repainted."""
+        if (row, col, selecting_row) == self.highlight:
+            return
+        self.highlight = (row, col, selecting_row)
+        for r in range(len(self.rows)):
+            styles = self.key_style[r]
+            for c in range(len(styles)):
+                if r != row:
+                    style = NORMAL
+                elif selecting_row:
+                    style = ROW_HIGHLIGHT
+                else:
+                    style = KEY_HIGHLIGHT if c == col else NORMAL
+                if style != styles[c]:
+                    styles[c] = style
+                    self.update(self.rects[r][c])
+
+    def set_groups(self, codes):
+        """Colour keys by the code that picks them ({(row, col): code}); keys not in `codes` are dimmed."""
+        self.highlight = None
+        for r in range(len(self.rows)):
+            styles = self.key_style[r]
+            for c in range(len(styles)):
+                code = codes.get((r, c))
+                style = GROUP_STYLES[code] if code else OUT
+                if style != styles[c]:
+                    styles[c] = style
+                    self.update(self.rects[r][c])
+
+    def set_labels(self, row, labels):
+        """Relabel the keys of one row (the word predictions); changed keys are repainted."""
+        keys = self.rows[row]
+        for c in range(len(keys)):
+            label = labels[c] if c < len(labels) else ""
+            if keys[c] != label:
+                keys[c] = label
+                self.update(self.rects[row][c])
+        if len(self.tiles) > 512:      # predicted words keep adding tiles
+            self.tiles.clear()
+
+    def paintEvent(self, event):
+        start = time.perf_counter_ns()
+        p = QPainter(self)
+        dirty = event.region()
+        p.fillRect(event.rect(), QColor("black"))   # clipped to the dirty region
+        drawn = 0
+        for r, rects in enumerate(self.rects):
+            for c, rect in enumerate(rects):
+                if dirty.intersects(rect):
+                    p.drawPixmap(rect.topLeft(), self._tile(self.rows[r][c], self.key_style[r][c], rect.width()))
+                    drawn += 1
+        p.end()
+        self.paints += 1
+        self.keys_drawn.append(drawn)
+        self.frame_ms.append((time.perf_counter_ns() - start) / 1e6)
+
+    def frame_stats(self):
+        """p50/p95/max paint time (ms) and mean keys drawn over the recent paints."""
+        times = sorted(self.frame_ms)
+        if not times:
+            return {"paints": self.paints, "p50_ms": None, "p95_ms": None, "max_ms": None, "keys_per_paint": None}
+        return {
+            "paints": self.paints,
+            "p50_ms": times[len(times) // 2],
+            "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "max_ms": times[-1],
+            "keys_per_paint": sum(self.keys_drawn) / len(self.keys_drawn),
+        }
@@ -0,0 +1,262 @@
+import sys
+import json
+import random
+import argparse
+from collections import Counter
+
+# -----------------------------
+# Scanning layout optimizer
+#
+# Cost model (the scan rules of scan_engine.py): the scan starts on the
+# first scanned row after every key, so typing the key at (r, c) takes
+#
+#   (r - first_row) x advance, select, c x advance, select
+#
+# (with allow_back, the row and column moves go whichever way round is
+# shorter, using the back code). Each code is a blink sequence: code k is
+# k+1 blinks followed by the firmware's sequence timeout, so a select costs
+# more time than an advance. The expected cost of a layout is the sum of
+# p(key) x cost(position of key) over the corpus character frequencies.
+#
+# For a fixed shape (number of keys per row) every position has a fixed
+# cost, so the best layout for that shape puts the most frequent key on
+# the cheapest position and so on down; the search is over shapes:
+#
+#   huffman   take the cheapest positions of an unbounded grid one by one
+#             (the most frequent symbols get the shortest "codes"),
+#             within max_rows x max_cols
+#   search    local search from there: move a slot from one row to
+#             another while the expected time goes down (random restarts)
+#
+# Layouts are JSON files every frontend loads with load_layout():
+#
+#   {"rows": [["E", "T", ...], ...], "first_row": 0, "expected": {...}}
+#
+#   python layout_optimizer.py corpus.txt -o layout.json
+#   python layout_optimizer.py --method huffman --emit-c   # rows[] for keyboard.c
+# -----------------------------
+
+BLINK_S = 0.35          # one eye blink
+TIMEOUT_S = 1.0         # SEQUENCE_TIMEOUT in the firmware
+ADVANCE, SELECT, BACK = 1, 2, 3
+
+SPECIAL = {" ": "SPACE", "\n": "ENTER"}
+DIGITS = list("1234567890")
+LETTERS = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+DEFAULT_KEYS = LETTERS + ["SPACE", "DEL", "ENTER"] + DIGITS
+
+QWERTY = [
+    list("1234567890"),
+    list("QWERTYUIOP"),
+    list("ASDFGHJKL"),
+    list("ZXCVBNM"),
+    ["SPACE", "DEL", "ENTER"]
+]
+ALPHABETICAL = [          # keyboard.c, letters/digits/space/backspace/enter only
+    list("ABCDEFGHI"),
+    list("JKLMNOPQR"),
+    list("STUVWXYZ"),
+    list("0123456789"),
+    ["SPACE", "DEL", "ENTER"],
+]
+
+
+def code_time(code, blink_s=BLINK_S, timeout_s=TIMEOUT_S):
+    return (code + 1) * blink_s + timeout_s
+
+
+def char_frequencies(text, keys=DEFAULT_KEYS):
+    """Key label counts for a text: letters upper-cased, space, newline as ENTER."""
+    wanted = set(keys)
+    counts = Counter()
+    for ch, n in Counter(text.upper()).items():
+        key = SPECIAL.get(ch, ch)
+        if key in wanted:
+            counts[key] += n
+    for key in keys:                    # unseen keys still need a place
+        counts.setdefault(key, 0)
+    return counts
+
+
+# -----------------------------
+# Cost model
+# -----------------------------
+def move_cost(steps, length, allow_back):
+    """(advances, backs) to move `steps` positions forward in a cycle of `length`."""
+    if allow_back and length - steps < steps:
+        return 0, length - steps
+    return steps, 0
+
+
+def position_cost(r, c, shape, first_row=0, allow_back=False, blink_s=BLINK_S, timeout_s=TIMEOUT_S):
+    """(blinks, seconds) to type the key at row r, column c."""
+    ra, rb = move_cost(r - first_row, len(shape) - first_row, allow_back)
+    ca, cb = move_cost(c, shape[r], allow_back)
+    advances, backs = ra + ca, rb + cb
+    blinks = advances * (ADVANCE + 1) + backs * (BACK + 1) + 2 * (SELECT + 1)
+    seconds = (advances * code_time(ADVANCE, blink_s, timeout_s) + backs * code_time(BACK, blink_s, timeout_s)
+               + 2 * code_time(SELECT, blink_s, timeout_s))
+    return blinks, seconds
+
+
+def expected_cost(rows, freqs, first_row=0, allow_back=False, blink_s=BLINK_S, timeout_s=TIMEOUT_S):
+    shape = [len(r) for r in rows]
+    total = sum(freqs.values()) or 1
+    blinks = seconds = 0.0
+    placed = set()
+    for r in range(first_row, len(rows)):
+        for c, key in enumerate(rows[r]):
+            placed.add(key)
+            p = freqs.get(key, 0) / total
+            if p:
+                b, s = position_cost(r, c, shape, first_row, allow_back, blink_s, timeout_s)
+                blinks += p * b
+                seconds += p * s
+    missing = sum(n for k, n in freqs.items() if k not in placed) / total
+    covered = 1 - missing
+    return {
+        "blinks_per_char": blinks / covered if covered else float("inf"),
+        "seconds_per_char": seconds / covered if covered else float("inf"),
+        "chars_per_minute": 60 * covered / seconds if seconds else 0.0,
+        "unreachable": missing,         # share of corpus characters the layout cannot type
+    }
+
+
+def fill_shape(shape, freqs, first_row=0, allow_back=False):
+    """Best layout for a shape: most frequent key on the cheapest position."""
+    positions = sorted(((position_cost(r, c, shape, first_row, allow_back)[1], r, c)
+                        for r in range(first_row, len(shape)) for c in range(shape[r])))
+    keys = sorted(freqs, key=lambda k: (-freqs[k], k))
+    rows = [[None] * n for n in shape]
+    for (_, r, c), key in zip(positions, keys):
+        rows[r][c] = key
+    return rows
+
+
+# -----------------------------
+# Shape search
+# -----------------------------
+def huffman_shape(n_keys, max_rows=6, max_cols=10):
+    """Row lengths from taking the cheapest grid positions one at a time."""
+    cells = sorted(((position_cost(r, c, [max_cols] * max_rows, 0, False)[1], r, c)
+                    for r in range(max_rows) for c in range(max_cols)))
+    if n_keys > len(cells):
+        raise ValueError(f"{n_keys} keys do not fit in {max_rows} x {max_cols}")
+    shape = [0] * max_rows
+    for _, r, c in cells[:n_keys]:
+        shape[r] += 1
+    return [n for n in shape if n]
+
+
+def shape_cost(shape, freqs, allow_back):
+    return expected_cost(fill_shape(shape, freqs, 0, allow_back), freqs, 0, allow_back)["seconds_per_char"]
+
+
+def local_search(freqs, start, max_rows=6, max_cols=10, allow_back=False, restarts=20, seed=0):
+    rng = random.Random(seed)
+    best_shape, best = list(start), shape_cost(start, freqs, allow_back)
+    n_keys = sum(start)
+    for attempt in range(restarts + 1):
+        if attempt == 0:
+            shape = list(start)
+        else:                                   # random shape that fits
+            rows = rng.randint(-(-n_keys // max_cols), max_rows)
+            cuts = sorted(rng.sample(range(1, n_keys), rows - 1))
+            shape = [b - a for a, b in zip([0] + cuts, cuts + [n_keys])]
+            if max(shape) > max_cols:
+                continue
+        cost = shape_cost(shape, freqs, allow_back)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(shape)):
+                for j in range(len(shape) + 1):     # j == len(shape): open a new row
+                    if i == j or (j == len(shape) and len(shape) >= max_rows):
+                        continue
+                    trial = shape + [0] if j == len(shape) else list(shape)
+                    trial[i] -= 1
+                    trial[j] += 1
+                    if trial[j] > max_cols:
+                        continue
+                    trial = [n for n in trial if n]
+                    c = shape_cost(trial, freqs, allow_back)
+                    if c < cost - 1e-12:
+                        shape, cost, improved = trial, c, True
+                        break
+                if improved:
+                    break
+        if cost < best:
+            best_shape, best = shape, cost
+    return best_shape
+
+
+def optimize(freqs, method="search", max_rows=6, max_cols=10, allow_back=False, seed=0):
+    shape = huffman_shape(len(freqs), max_rows, max_cols)
+    if method == "search":
+        shape = local_search(freqs, shape, max_rows, max_cols, allow_back, seed=seed)
+    return fill_shape(shape, freqs, 0, allow_back)
+
+
+# -----------------------------
+# Layout files
+# -----------------------------
+def save_layout(path, rows, first_row=0, **meta):
+    with open(path, "w") as f:
+        json.dump(dict({"rows": rows, "first_row": first_row}, **meta), f, indent=1)
+
+
+def load_layout(path):
+    """(rows, first_row) from a layout file."""
+    with open(path) as f:
+        data = json.load(f)
+    rows = [[str(k) for k in row] for row in data["rows"]]
+    if not rows or not all(rows):
+        raise ValueError(f"{path}: empty layout row")
+    return rows, int(data.get("first_row", 0))
+
+
+def c_array(rows):
+    """rows[] for keyboard.c (SPACE/DEL/ENTER as ' ', '\\b', '\\r')."""
+    escape = {"SPACE": " ", "DEL": "\\b", "ENTER": "\\r"}
+    lines = ["const char *rows[] = {"]
+    for row in rows:
+        lines.append('    "' + "".join(escape.get(k, k) for k in row) + '",')
+    lines.append("};")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find a scanning layout that minimizes expected typing time.")
+    parser.add_argument("corpus", nargs="?", help="text file (default: Python docs text as a stand-in)")
+    parser.add_argument("-o", "--output", default=None, help="write the layout JSON here")
+    parser.add_argument("--method", choices=["huffman", "search"], default="search")
+    parser.add_argument("--max-rows", type=int, default=6)
+    parser.add_argument("--max-cols", type=int, default=10)
+    parser.add_argument("--allow-back", action="store_true", help="cost for webs.py (code 3 goes back)")
+    parser.add_argument("--no-digits", action="store_true")
+    parser.add_argument("--emit-c", action="store_true", help="print the layout as a C array for keyboard.c")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        import completion
+        text = completion.standin_corpus()
+    keys = [k for k in DEFAULT_KEYS if not (args.no_digits and k in DIGITS)]
+    freqs = char_frequencies(text, keys)
+
+    rows = optimize(freqs, args.method, args.max_rows, args.max_cols, args.allow_back)
+    cost = expected_cost(rows, freqs, 0, args.allow_back)
+    before = expected_cost(QWERTY, freqs, 1, args.allow_back)
+    for row in rows:
+        print("  " + " ".join(f"{k:<5}" for k in row))
+    print(f"Expected: {cost['blinks_per_char']:.2f} blinks/char, {cost['chars_per_minute']:.2f} chars/min "
+          f"(QWERTY rows: {before['blinks_per_char']:.2f} blinks/char, {before['chars_per_minute']:.2f} chars/min, "
+          f"{before['unreachable']:.1%} of characters unreachable)")
+    if args.output:
+        save_layout(args.output, rows, 0, method=args.method, allow_back=args.allow_back, expected=cost)
+        print(f"Wrote {args.output}")
+    if args.emit_c:
+        print(c_array(rows))
+    sys.exit(0)
@@ -0,0 +1,219 @@
+import sys
+import time
+import bisect
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from acquisition import KIND_CODE
+
+# -----------------------------
+# Live metrics
+#
+# A process-wide registry of counters and fixed-bucket histograms that
+# both frontends update as they run. Updating one is a lock and an add
+# (a bisect for a histogram), so it stays on all the time.
+#
+#   blink_serial_lines_total         lines read from the port
+#   blink_parse_errors_total         lines that were no blink code, EMG level or firmware text
+#   blink_codes_total{code}          blink codes received, per code
+#   blink_chars_total                characters committed
+#   blink_commit_latency_seconds     code line arrived -> key committed
+#   blink_render_seconds             keyboard repaint / Streamlit render
+#
+# serve() exposes them at http://127.0.0.1:<port>/metrics in Prometheus
+# text format. REGISTRY.rates() gives per-second rates over the last
+# `window` seconds from snapshots it keeps itself (one a second at most),
+# for the Streamlit diagnostics page.
+#
+#   metrics.serve(metrics.REGISTRY, 9108)
+#   curl -s localhost:9108/metrics
+#   python metrics.py --port 9108          # demo with made-up traffic
+# -----------------------------
+
+METRICS_PORT = 9108
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RENDER_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}        # label value (None without a label) -> count
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        with self.lock:
+            self.values[label] = self.values.get(label, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def lines(self):
+        if not self.values:
+            yield f"{self.name} 0"
+        for label, value in sorted(self.values.items(), key=lambda kv: str(kv[0])):
+            tag = f'{{{self.label}="{label}"}}' if self.label else ""
+            yield f"{self.name}{tag} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)    # last one: above the top bucket
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def total(self):
+        return self.count
+
+    def quantile(self, q):
+        """Estimate like Prometheus' histogram_quantile (linear within a bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                low = self.buckets[i - 1] if i else 0.0
+                return low + (self.buckets[i] - low) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def lines(self):
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}'
+        yield f'{self.name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{self.name}_sum {self.sum:.6f}"
+        yield f"{self.name}_count {self.count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.history = deque(maxlen=600)    # (monotonic s, {name: total}) for rates()
+
+    def counter(self, name, help, label=None):
+        return self.metrics.setdefault(name, Counter(name, help, label))
+
+    def histogram(self, name, help, buckets):
+        return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def render(self):
+        """All metrics in Prometheus text format."""
+        out = []
+        for m in self.metrics.values():
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.lines())
+        return "\n".join(out) + "\n"
+
+    def totals(self):
+        return {name: m.total() for name, m in self.metrics.items()}
+
+    def rates(self, window=10.0):
+        """Per-second increase of every metric over about the last `window` seconds."""
+        now = time.monotonic()
+        totals = self.totals()
+        if not self.history or now - self.history[-1][0] >= 1.0:
+            self.history.append((now, totals))
+        old_t, old = self.history[0]
+        for t, snapshot in self.history:
+            if now - t <= window:
+                break
+            old_t, old = t, snapshot
+        elapsed = now - old_t
+        if elapsed <= 0:
+            return {name: 0.0 for name in totals}
+        return {name: (value - old.get(name, 0)) / elapsed for name, value in totals.items()}
+
+
+REGISTRY = Registry()
+SERIAL_LINES = REGISTRY.counter("blink_serial_lines_total", "Lines read from the serial port.")
+PARSE_ERRORS = REGISTRY.counter("blink_parse_errors_total",
+                                "Serial lines that were no blink code, EMG level or firmware text.")
+BLINKS = REGISTRY.counter("blink_codes_total", "Blink codes received.", label="code")
+CHARS = REGISTRY.counter("blink_chars_total", "Characters committed.")
+COMMIT_LATENCY = REGISTRY.histogram("blink_commit_latency_seconds",
+                                    "Blink code line arrived to key committed.", LATENCY_BUCKETS)
+RENDER_TIME = REGISTRY.histogram("blink_render_seconds", "Keyboard repaint time.", RENDER_BUCKETS)
+
+
+def count_event(event):
+    """Count an acquisition.parse_event() result (a code per code, None as a
+    parse error) and return it. Lines themselves are counted where they are
+    read (SERIAL_LINES)."""
+    if event is None:
+        PARSE_ERRORS.inc()
+    elif event[0] == KIND_CODE:
+        BLINKS.inc(label=str(event[1]))
+    return event
+
+
+# -----------------------------
+# HTTP endpoint
+# -----------------------------
+def serve(registry=REGISTRY, port=METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server (raises OSError if the port is taken)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import random
+    from acquisition import parse_event
+    parser = argparse.ArgumentParser(description="Serve the metrics endpoint with made-up traffic.")
+    parser.add_argument("--port", type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    serve(REGISTRY, args.port)
+    print(f"http://127.0.0.1:{args.port}/metrics")
+    try:
+        while True:
+            SERIAL_LINES.inc()
+            event = count_event(parse_event(random.choice(["1", "1", "2", "3", "EOG Calibration complete.", "\xfe3"])))
+            if event and event[1]:
+                COMMIT_LATENCY.observe(random.uniform(0.001, 0.05))
+                CHARS.inc()
+            RENDER_TIME.observe(random.uniform(0.0005, 0.005))
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        sys.exit(0)
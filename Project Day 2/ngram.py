@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import tempfile
+import argparse
+import threading
+from collections import OrderedDict
+
+import layout_optimizer as lo
+
+# -----------------------------
+# Context-adaptive key order
+#
+# CharModel is a character n-gram model over what the keyboards can type
+# (letters, digits, space, newline). Next-character probabilities use
+# Witten-Bell interpolation across context lengths 0..order-1.
+#
+#   base  counts from a corpus; the distribution for a context is worked
+#         out once and kept in an LRU cache (cache_size contexts)
+#   user  counts from what the user commits, updated on every key
+#         (observe()); never cached, but sparse: a symbol the user layer
+#         has not seen has the same user probability as every other
+#         unseen one, so only the seen symbols are computed
+#
+#   p(sym) = (1 - mu) * p_base(sym) + mu * p_user(sym),  mu = N / (N + USER_WEIGHT)
+#
+# AdaptiveLayout keeps the scan engine's rows as fixed slots and, after
+# every commit, puts keys into the slots by probability:
+#
+#   within_rows  each key stays in its row; likelier keys come first in it
+#   global       likeliest keys on the cheapest slots of the whole
+#                keyboard (cost model of layout_optimizer.py)
+#
+# Rows before first_row, pinned rows (the prediction row) and pinned keys
+# (DEL, so a correction is always where it was) do not move. The engine
+# reports the slot's original label; translate() turns it into the key
+# that was on the slot.
+#
+# ModelSaver writes what a long-running frontend learns from a background
+# thread, so a SPACE does not wait for the whole ngram.json to be rewritten.
+#
+#   python ngram.py build corpus.txt          # -> ngram.json
+# -----------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(HERE, "ngram.json")
+USER_WEIGHT = 200.0     # user counts needed before they weigh as much as the corpus
+KEY_CHARS = {"SPACE": " ", "ENTER": "\n"}
+
+
+def key_char(key):
+    """The character a key types, or None (DEL, prediction slots)."""
+    if key in KEY_CHARS:
+        return KEY_CHARS[key]
+    return key if len(key) == 1 else None
+
+
+class CharModel:
+    def __init__(self, order=3, cache_size=4096):
+        self.order = order
+        self.symbols = sorted(set("ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890 \n"))
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.base = [dict() for _ in range(order)]      # base[k][context of length k] = {sym: count}
+        self.user = [dict() for _ in range(order)]
+        self.user_total = 0
+        self.lock = threading.Lock()    # user counts: observe() vs a save's snapshot()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+
+    # -- counting ------------------------------------------------------
+    def clean(self, text):
+        return "".join(ch for ch in text.upper() if ch in self.index)
+
+    def _add(self, tables, history, sym, n=1):
+        for k in range(self.order):
+            if k > len(history):
+                break
+            ctx = history[len(history) - k:] if k else ""
+            counts = tables[k].setdefault(ctx, {})
+            counts[sym] = counts.get(sym, 0) + n
+
+    def learn_text(self, text):
+        """Add a corpus to the base counts."""
+        text = self.clean(text)
+        for i, sym in enumerate(text):
+            self._add(self.base, text[max(0, i - self.order + 1):i], sym)
+        self.cache.clear()
+
+    def observe(self, text_before, key):
+        """The user committed `key` after typing `text_before`."""
+        sym = key_char(key)
+        if sym is None or sym.upper() not in self.index:
+            return
+        history = self.clean(text_before)[-(self.order - 1):] if self.order > 1 else ""
+        with self.lock:
+            self._add(self.user, history, sym.upper())
+            self.user_total += 1
+
+    # -- probabilities -------------------------------------------------
+    def _context(self, text):
+        return self.clean(text)[-(self.order - 1):] if self.order > 1 else ""
+
+    def base_distribution(self, context):
+        """List of p(sym) aligned with self.symbols (LRU-cached)."""
+        dist = self.cache.get(context)
+        if dist is not None:
+            self.cache.move_to_end(context)
+            self.hits += 1
+            return dist
+        self.misses += 1
+        V = len(self.symbols)
+        uni = self.base[0].get("", {})
+        n = sum(uni.values())
+        dist = [(uni.get(s, 0) + 1) / (n + V) for s in self.symbols]
+        for k in range(1, min(self.order, len(context) + 1)):
+            counts = self.base[k].get(context[len(context) - k:])
+            if not counts:
+                continue
+            n, t = sum(counts.values()), len(counts)
+            dist = [(counts.get(s, 0) + t * p) / (n + t) for s, p in zip(self.symbols, dist)]
+        self.cache[context] = dist
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return dist
+
+    def _user_sparse(self, context):
+        """({sym: p_user}) for symbols the user layer has seen, and p_user of all others."""
+        V = len(self.symbols)
+        uni = self.user[0].get("", {})
+        n = sum(uni.values())
+        seen = {s: (c + 1) / (n + V) for s, c in uni.items()}
+        unseen = 1 / (n + V)
+        for k in range(1, min(self.order, len(context) + 1)):
+            counts = self.user[k].get(context[len(context) - k:])
+            if not counts:
+                continue
+            n, t = sum(counts.values()), len(counts)
+            seen = {s: (counts.get(s, 0) + t * seen.get(s, unseen)) / (n + t) for s in set(seen) | set(counts)}
+            unseen = t * unseen / (n + t)
+        return seen, unseen
+
+    def scores(self, text):
+        """{sym: probability of being typed next} after `text`."""
+        context = self._context(text)
+        base = self.base_distribution(context)
+        if not self.user_total:
+            return dict(zip(self.symbols, base))
+        mu = self.user_total / (self.user_total + USER_WEIGHT)
+        seen, unseen = self._user_sparse(context)
+        scores = {s: (1 - mu) * p + mu * unseen for s, p in zip(self.symbols, base)}
+        for s, p in seen.items():
+            scores[s] = (1 - mu) * base[self.index[s]] + mu * p
+        return scores
+
+    # -- files ---------------------------------------------------------
+    def snapshot(self):
+        """What save() writes; the user counts are copied, the base counts
+        only change in learn_text() (when building)."""
+        with self.lock:
+            user = [{ctx: dict(counts) for ctx, counts in table.items()} for table in self.user]
+            return {"order": self.order, "base": self.base, "user": user, "user_total": self.user_total}
+
+    def save(self, path=DEFAULT_MODEL, data=None):
+        """Write the model (or a snapshot() of it) atomically."""
+        data = self.snapshot() if data is None else data
+        fd, tmp = tempfile.mkstemp(prefix=".ngram-", suffix=".json", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL, cache_size=4096):
+        with open(path) as f:
+            data = json.load(f)
+        model = cls(data["order"], cache_size)
+        model.base = data["base"]
+        model.user = data["user"]
+        model.user_total = data.get("user_total", 0)
+        return model
+
+
+class ModelSaver:
+    """Saves a CharModel from a background thread. request() only takes a
+    snapshot; the thread writes the newest one, so a burst of requests is
+    one write and saves never overlap."""
+
+    def __init__(self, model, path=DEFAULT_MODEL):
+        self.model = model
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = None
+        self.wake = threading.Event()
+        self.saves = 0
+        self.errors = 0
+        self.worker = threading.Thread(target=self._run, name="ngram-save", daemon=True)
+        self.worker.start()
+
+    def request(self):
+        data = self.model.snapshot()
+        with self.lock:
+            self.pending = data
+        self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                data, self.pending = self.pending, None
+            if data is None:
+                continue
+            try:
+                self.model.save(self.path, data)
+                self.saves += 1
+            except OSError as e:
+                self.errors += 1
+                print("Could not save the n-gram model:", e)
+
+
+def load_default():
+    """CharModel from ngram.json next to this file, or None if it was never built."""
+    try:
+        return CharModel.load(DEFAULT_MODEL)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# -----------------------------
+# Key order
+# -----------------------------
+class AdaptiveLayout:
+    def __init__(self, rows, model, first_row=0, mode="within_rows", pinned_rows=(), pinned_keys=("DEL",),
+                 allow_back=False):
+        self.rows = [list(r) for r in rows]
+        self.model = model
+        self.mode = mode
+        self.slot = {key: (r, c) for r, keys in enumerate(self.rows) for c, key in enumerate(keys)}
+        self.current = [list(r) for r in self.rows]
+        fixed = set(range(first_row)) | {r for r in pinned_rows if r is not None}
+        pinned = set(pinned_keys)
+        shape = [len(r) for r in self.rows]
+        # Movable slots: per row (within_rows) or all of them, cheapest first.
+        groups = []
+        for r, keys in enumerate(self.rows):
+            if r in fixed:
+                continue
+            cols = [c for c, key in enumerate(keys) if key not in pinned]
+            groups.append([(r, c) for c in cols])
+        if mode == "global":
+            slots = [s for g in groups for s in g]
+            slots.sort(key=lambda rc: lo.position_cost(rc[0], rc[1], shape, first_row, allow_back)[1])
+            groups = [slots]
+        self.groups = [(g, [self.rows[r][c] for r, c in g], [key_char(self.rows[r][c]) for r, c in g])
+                       for g in groups]
+
+    def arrange(self, text):
+        """Rows of keys as they should be shown for the next key after `text`."""
+        scores = self.model.scores(text)
+        current = self.current
+        for slots, keys, chars in self.groups:
+            ranked = sorted(range(len(keys)), key=lambda i: -scores.get(chars[i], 0.0) if chars[i] else 0.0)
+            for (r, c), i in zip(slots, ranked):
+                current[r][c] = keys[i]
+        return current
+
+    def translate(self, key):
+        """Key on the slot the engine reported (by the slot's original label)."""
+        r, c = self.slot[key]
+        return self.current[r][c]
+
+
+MODES = ("off", "within_rows", "global")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the character n-gram model for adaptive key order.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("corpus", nargs="?", help="text file (default: Python docs text as a stand-in)")
+    b.add_argument("-o", "--output", default=DEFAULT_MODEL)
+    b.add_argument("--order", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        import completion
+        text = completion.standin_corpus()
+    model = CharModel(args.order)
+    model.learn_text(text)
+    model.save(args.output)
+    contexts = sum(len(t) for t in model.base)
+    print(f"{args.output}: order {args.order}, {contexts} contexts, {os.path.getsize(args.output)} bytes")
+    sys.exit(0)
@@ -0,0 +1,193 @@
+import time
+import queue
+import threading
+from collections import deque
+
+from tracer import TRACER
+
+# -----------------------------
+# Keystroke output
+#
+# The keyboard used to call pynput on the GUI thread for every key, so a
+# slow OS input path held up serial reading and repainting. OutputSink
+# takes the keystrokes instead: text() and key() only put them on a
+# queue, and a worker thread sends them to a backend. Whatever queued up
+# while the worker was busy (a word completion, keys typed during a slow
+# injection) goes out as one batch: runs of characters become a single
+# backend.type() call, special keys are pressed one by one.
+#
+# Backends:
+#   pynput   the OS keyboard (pynput is imported only when this is used)
+#   record   keeps what was sent in memory (.sent, .text), for tests
+#   null     sends nothing (benchmarks); `cost_ms` fakes a slow OS call
+#
+# Latency of each keystroke (queued -> backend call returned) is kept
+# for stats().
+#
+#   sink = OutputSink(make_backend("pynput"))
+#   sink.text("hello "); sink.key("backspace"); sink.key("enter")
+#   sink.flush(); sink.close(); print(sink.stats())
+# -----------------------------
+
+KEYS = ("space", "backspace", "enter")
+
+
+class PynputBackend:
+    def __init__(self):
+        from pynput.keyboard import Controller, Key
+        self.kb = Controller()
+        self.keys = {name: getattr(Key, name) for name in KEYS}
+
+    def type(self, text):
+        self.kb.type(text)
+
+    def key(self, name):
+        self.kb.press(self.keys[name])
+        self.kb.release(self.keys[name])
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.sent = []          # ("type", text) / ("key", name) per backend call
+
+    def type(self, text):
+        self.sent.append(("type", text))
+
+    def key(self, name):
+        self.sent.append(("key", name))
+
+    @property
+    def text(self):
+        """What the receiving text field would show."""
+        out = []
+        for kind, value in self.sent:
+            if kind == "type":
+                out.extend(value)
+            elif value == "backspace":
+                out = out[:-1]
+            else:
+                out.append(" " if value == "space" else "\n")
+        return "".join(out)
+
+
+class NullBackend:
+    def __init__(self, cost_ms=0.0):
+        self.cost_s = cost_ms / 1e3
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.cost_s:
+            time.sleep(self.cost_s)
+
+    def type(self, text):
+        self._call()
+
+    def key(self, name):
+        self._call()
+
+
+BACKENDS = {"pynput": PynputBackend, "record": RecordingBackend, "null": NullBackend}
+
+
+def make_backend(name, **kwargs):
+    return BACKENDS[name](**kwargs)
+
+
+def batches(items):
+    """Coalesce queued (kind, value, queued_ns) items into backend calls:
+    [(kind, value, [queued_ns per keystroke]), ...]."""
+    out = []
+    for kind, value, queued in items:
+        if kind == "type" and out and out[-1][0] == "type":
+            out[-1] = ("type", out[-1][1] + value, out[-1][2] + [queued] * len(value))
+        else:
+            out.append((kind, value, [queued] * (len(value) if kind == "type" else 1)))
+    return out
+
+
+class OutputSink:
+    def __init__(self, backend, batch=True):
+        self.backend = backend
+        self.batch = batch
+        self.queue = queue.Queue()
+        self.latency_ns = deque(maxlen=5000)
+        self.keystrokes = 0
+        self.calls = 0
+        self.errors = 0
+        self.worker = threading.Thread(target=self._run, name="output-sink", daemon=True)
+        self.worker.start()
+
+    # -- producer side (GUI thread) ------------------------------------
+    def text(self, text):
+        if text:
+            self.queue.put(("type", text, time.perf_counter_ns()))
+
+    def key(self, name):
+        self.queue.put(("key", name, time.perf_counter_ns()))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent."""
+        if timeout is None:
+            self.queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return not self.queue.unfinished_tasks
+
+    def close(self, timeout=2.0):
+        self.queue.put(None)
+        self.worker.join(timeout)
+
+    # -- worker --------------------------------------------------------
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            while self.batch:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            try:
+                self._send([item for item in items if item is not None])
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _send(self, items):
+        for kind, value, queued in batches(items):
+            t0 = TRACER.begin()
+            try:
+                if kind == "type":
+                    self.backend.type(value)
+                else:
+                    self.backend.key(value)
+            except Exception as e:
+                self.errors += 1
+                print("Output error:", e)
+                continue
+            done = time.perf_counter_ns()
+            TRACER.end("inject", t0, len(queued))
+            self.calls += 1
+            self.keystrokes += len(queued)
+            self.latency_ns.extend(done - t for t in queued)
+
+    def stats(self):
+        """Keystrokes sent, backend calls and queued -> sent latency (ms)."""
+        lat = sorted(self.latency_ns)
+
+        def pct(q):
+            return lat[min(len(lat) - 1, int(len(lat) * q))] / 1e6 if lat else None
+
+        return {
+            "keystrokes": self.keystrokes,
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_p50_ms": pct(0.5),
+            "latency_p99_ms": pct(0.99),
+            "latency_max_ms": lat[-1] / 1e6 if lat else None,
+        }
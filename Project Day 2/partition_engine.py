@@ -0,0 +1,174 @@
+from scan_engine import Action, ScanState, STRIDE, IGNORED, MOVE, EMIT
+import ngram
+
+# -----------------------------
+# Partition selection: an alternative to the row/column scan
+#
+# All keys are candidates at first. Each blink code picks one group of
+# the candidates; a group of one key commits it. With arity 2 codes 1
+# and 2 pick the two halves and code 3 goes back up one level; with
+# arity 3 codes 1, 2 and 3 pick the thirds (a wrong pick is fixed with
+# DEL). Any key is log(n) selections away instead of up to a row length
+# of advances.
+#
+# Groups are cut from the candidates sorted by probability (likeliest
+# first), so the cheap code gets the likely keys. Code k is k+1 blinks;
+# with unequal costs the groups are sized so the cheap code carries
+# more probability: group k gets share x^cost(k), where sum x^cost(k) = 1
+# (the capacity of the code alphabet), which is what an optimal prefix
+# code tends to for many keys.
+#
+# Like ScanEngine, the whole tree is built up front as a flat Action
+# table (node * STRIDE + code), so step() is one lookup. set_weights()
+# rebuilds it for new probabilities (e.g. ngram.py's next-letter scores
+# after every key), which takes well under a millisecond for 40 keys.
+#
+#   engine = PartitionEngine(rows, arity=2, weights={"E": 0.12, ...})
+#   action = engine.step(state, code)        # same Action/ScanState as ScanEngine
+#   engine.groups(state)                     # {(row, col): code} to draw
+# -----------------------------
+
+PARTITION = 2           # Action.mode for partition nodes (ScanEngine uses 0 and 1)
+MODES = ("scan", "binary", "ternary")
+ARITY = {"binary": 2, "ternary": 3}
+BACK = 3                # arity 2 only
+
+
+def code_shares(arity):
+    """Probability share per code (1..arity) for codes costing code+1 blinks."""
+    costs = [code + 1 for code in range(1, arity + 1)]
+    lo, hi = 0.0, 1.0
+    for _ in range(60):                 # sum x^cost is increasing in x
+        x = (lo + hi) / 2
+        if sum(x ** c for c in costs) < 1:
+            lo = x
+        else:
+            hi = x
+    return [x ** c for c in costs]
+
+
+class PartitionEngine:
+    def __init__(self, rows, arity=2, weights=None, floor=0.005):
+        if arity not in (2, 3):
+            raise ValueError("arity must be 2 or 3")
+        self.rows = [list(r) for r in rows]
+        self.arity = arity
+        self.floor = floor              # weight for keys the weights leave out
+        self.shares = code_shares(arity)
+        self.position = {key: (r, c) for r, keys in enumerate(self.rows) for c, key in enumerate(keys)}
+        self.home = 0
+        self.set_weights(weights)
+
+    def set_weights(self, weights=None):
+        """Rebuild the tree for {key: weight} (missing keys get `floor`; None = all equal)."""
+        weights = weights or {}
+        total = sum(weights.get(k, 0) for k in self.position) or 1.0
+        self.weights = {k: max(weights.get(k, 0) / total, self.floor) for k in self.position}
+        keys = sorted(self.position, key=lambda k: -self.weights[k])
+        self.nodes = []                 # candidate keys per node
+        self.codes = []                 # {(row, col): code} per node
+        self.table = []
+        self._build(keys, None)
+        self.rest = [Action(IGNORED, None, i, PARTITION, -1, -1) for i in range(len(self.nodes))]
+        for i, slot in enumerate(self.table):
+            if slot is None:
+                self.table[i] = self.rest[i // STRIDE]
+
+    def _split(self, keys):
+        n = min(self.arity, len(keys))
+        shares = self.shares[:n]
+        scale = sum(self.weights[k] for k in keys) / sum(shares)
+        cum = [0.0]
+        for k in keys:
+            cum.append(cum[-1] + self.weights[k])
+        groups, start, target = [], 0, 0.0
+        for g in range(n - 1):
+            target += shares[g] * scale
+            end = start + 1
+            last = len(keys) - (n - 1 - g)      # leave a key for every later group
+            while end < last and abs(cum[end + 1] - target) <= abs(cum[end] - target):
+                end += 1
+            groups.append(keys[start:end])
+            start = end
+        groups.append(keys[start:])
+        return groups
+
+    def _build(self, keys, parent):
+        node = len(self.nodes)
+        self.nodes.append(keys)
+        self.codes.append({})
+        self.table.extend([None] * STRIDE)
+        for code, group in enumerate(self._split(keys), 1):
+            for key in group:
+                self.codes[node][self.position[key]] = code
+            if len(group) == 1:
+                r, c = self.position[group[0]]
+                action = Action(EMIT, group[0], self.home, PARTITION, r, c)
+            else:
+                action = Action(MOVE, None, self._build(group, node), PARTITION, -1, -1)
+            self.table[node * STRIDE + code] = action
+        if self.arity == 2 and parent is not None:
+            self.table[node * STRIDE + BACK] = Action(MOVE, None, parent, PARTITION, -1, -1)
+        return node
+
+    # -- hot path ------------------------------------------------------
+    def new_state(self):
+        state = ScanState()
+        self.reset(state)
+        return state
+
+    def reset(self, state):
+        state.node, state.row, state.col, state.selecting_row = self.home, -1, -1, False
+
+    def step(self, state, code):
+        """Apply a blink code to `state` in place and return the Action taken."""
+        if 0 <= code < STRIDE and state.node < len(self.nodes):
+            action = self.table[state.node * STRIDE + code]
+        else:
+            action = self.rest[self.home]
+        state.node = action.node
+        state.row = action.row
+        state.col = action.col
+        state.selecting_row = False
+        return action
+
+    def groups(self, state):
+        """{(row, col): code} for the keys still in play; the rest are out."""
+        return self.codes[state.node] if state.node < len(self.nodes) else self.codes[self.home]
+
+    def path(self, key):
+        """Codes that select `key` from the top."""
+        codes, node = [], self.home
+        r_c = self.position[key]
+        while True:
+            code = self.codes[node][r_c]
+            action = self.table[node * STRIDE + code]
+            codes.append(code)
+            if action.kind == EMIT:
+                return codes
+            node = action.node
+
+
+def key_weights(keys, scores, other=0.02):
+    """{key: weight} from ngram.CharModel.scores(); DEL and prediction slots get `other`."""
+    weights = {}
+    for key in keys:
+        ch = ngram.key_char(key)
+        weights[key] = scores.get(ch, 0.0) if ch else other
+    return weights
+
+
+_STANDIN = None
+
+
+def weights_for(keys, model=None, text=""):
+    """Key weights for the next key: ngram model scores if there is a model,
+    else character frequencies of the stand-in corpus (computed once)."""
+    global _STANDIN
+    if model:
+        return key_weights(keys, model.scores(text))
+    if _STANDIN is None:
+        import completion
+        import layout_optimizer as lo
+        _STANDIN = lo.char_frequencies(completion.standin_corpus())
+    return _STANDIN
@@ -0,0 +1,213 @@
+import struct
+import numpy as np
+
+# -----------------------------
+# Binary framed protocol (firmware -> host)
+#
+#   offset  size  field
+#   0       2     sync      0xA5 0x5A
+#   2       2     seq       uint16 LE, +1 per frame of any type
+#   4       1     type      FRAME_SAMPLE / FRAME_EVENT / FRAME_TEXT / FRAME_BLINK
+#   5       1     len       payload length
+#   6       len   payload
+#   6+len   2     checksum  Fletcher-16 over seq..payload (sum1, sum2)
+#
+#   FRAME_SAMPLE  int16 eog raw, int16 emg raw              (12-byte frame)
+#   FRAME_EVENT   uint8 blink code, uint16 emgNormalized*1000
+#   FRAME_TEXT    ASCII status text (banners, "Calibration complete.")
+#   FRAME_BLINK   uint32 millis() of one blink, uint16 emgNormalized*1000
+#                 (RAW_BLINKS 1: the host groups blinks, see blink_decoder.py)
+#
+# The firmware encoder is sendFrame() in "EOG EMG combined filter.ino"
+# (BINARY_PROTOCOL 1). FrameDecoder works on whole read() chunks: sync
+# words, lengths and checksums of every candidate frame are checked with
+# NumPy at once, and runs of sample frames are returned as a view of the
+# chunk instead of being unpacked one by one.
+# -----------------------------
+
+SYNC = b"\xa5\x5a"
+HEADER_SIZE = 6
+TRAILER_SIZE = 2
+OVERHEAD = HEADER_SIZE + TRAILER_SIZE
+
+FRAME_SAMPLE = 1
+FRAME_EVENT = 2
+FRAME_TEXT = 3
+FRAME_BLINK = 4
+
+SAMPLE_PAYLOAD = 4
+SAMPLE_FRAME_SIZE = OVERHEAD + SAMPLE_PAYLOAD
+EVENT = struct.Struct("<BH")
+BLINK = struct.Struct("<IH")
+
+
+def fletcher16(data):
+    sum1 = sum2 = 0
+    for byte in data:
+        sum1 = (sum1 + byte) % 255
+        sum2 = (sum2 + sum1) % 255
+    return sum1, sum2
+
+
+# -----------------------------
+# Encoder (host side copy of sendFrame(), used by simulators and benchmarks)
+# -----------------------------
+def encode_frame(seq, frame_type, payload):
+    body = struct.pack("<HBB", seq & 0xFFFF, frame_type, len(payload)) + payload
+    sum1, sum2 = fletcher16(body)
+    return SYNC + body + bytes((sum1, sum2))
+
+
+def encode_event(seq, code, emg=0.0):
+    return encode_frame(seq, FRAME_EVENT, EVENT.pack(code, int(round(max(emg, 0.0) * 1000)) & 0xFFFF))
+
+
+def encode_blink(seq, ms, emg=0.0):
+    return encode_frame(seq, FRAME_BLINK, BLINK.pack(ms & 0xFFFFFFFF, int(round(max(emg, 0.0) * 1000)) & 0xFFFF))
+
+
+def encode_text(seq, text):
+    return encode_frame(seq, FRAME_TEXT, text.encode()[:255])
+
+
+def encode_samples(first_seq, eog, emg):
+    """Many sample frames at once, as one bytes object."""
+    n = len(eog)
+    frames = np.zeros((n, SAMPLE_FRAME_SIZE), dtype=np.uint8)
+    seq = (first_seq + np.arange(n)) & 0xFFFF
+    frames[:, 0], frames[:, 1] = 0xA5, 0x5A
+    frames[:, 2], frames[:, 3] = seq & 0xFF, seq >> 8
+    frames[:, 4], frames[:, 5] = FRAME_SAMPLE, SAMPLE_PAYLOAD
+    payload = np.stack([np.asarray(eog), np.asarray(emg)], axis=1).astype("<i2")
+    frames[:, 6:10] = payload.view(np.uint8).reshape(n, 4)
+    body = frames[:, 2:10].astype(np.int64)
+    sum1 = np.cumsum(body, axis=1)
+    frames[:, 10] = sum1[:, -1] % 255
+    frames[:, 11] = sum1.sum(axis=1) % 255
+    return frames.tobytes()
+
+
+# -----------------------------
+# Decoder
+# -----------------------------
+class DecodedChunk:
+    __slots__ = ("samples", "sample_seq", "events", "texts", "blinks")
+
+    def __init__(self, samples, sample_seq, events, texts, blinks=()):
+        self.samples = samples          # (n, 2) int16 [eog, emg]
+        self.sample_seq = sample_seq    # (n,) uint16 frame sequence numbers
+        self.events = events            # [(seq, code, emg)]
+        self.texts = texts              # [(seq, str)]
+        self.blinks = blinks            # [(seq, millis, emg)]
+
+
+EMPTY_SAMPLES = np.zeros((0, 2), dtype="<i2")
+EMPTY_SEQ = np.zeros(0, dtype=np.int64)
+
+
+class FrameDecoder:
+    def __init__(self):
+        self.pending = b""
+        self.last_seq = None
+        self.frames = 0
+        self.dropped = 0          # frames missing according to seq gaps
+        self.bad_checksum = 0     # frames that failed the checksum
+        self.skipped_bytes = 0    # noise between frames
+
+    def feed(self, chunk):
+        buf = self.pending + bytes(chunk) if self.pending else bytes(chunk)
+        a = np.frombuffer(buf, dtype=np.uint8)
+        n = len(a)
+        if n < OVERHEAD:
+            self.pending = buf
+            return DecodedChunk(EMPTY_SAMPLES, EMPTY_SEQ, [], [])
+
+        starts = np.flatnonzero((a[:-1] == 0xA5) & (a[1:] == 0x5A))
+        has_header = starts + HEADER_SIZE <= n
+        lengths = np.zeros(len(starts), dtype=np.int64)
+        lengths[has_header] = a[starts[has_header] + 5]
+        ends = starts + OVERHEAD + lengths
+        complete = has_header & (ends <= n)
+
+        # Fletcher-16 of every candidate from two prefix sums:
+        #   sum1 = sum(d), sum2 = sum((end - j) * d_j) over the checksummed span.
+        d = a.astype(np.int64)
+        P = np.concatenate(([0], np.cumsum(d)))
+        Q = np.concatenate(([0], np.cumsum(d * np.arange(n))))
+        cs, ce = starts[complete] + 2, ends[complete] - TRAILER_SIZE
+        sum1 = (P[ce] - P[cs]) % 255
+        sum2 = (ce * (P[ce] - P[cs]) - (Q[ce] - Q[cs])) % 255
+        good = (sum1 == a[ce]) & (sum2 == a[ce + 1])
+
+        f_starts, f_ends = starts[complete][good], ends[complete][good]
+        if len(f_starts) > 1 and np.any(f_starts[1:] < f_ends[:-1]):
+            # A sync pattern inside a payload happened to pass the checksum.
+            keep = np.zeros(len(f_starts), dtype=bool)
+            edge = 0
+            for i in range(len(f_starts)):
+                if f_starts[i] >= edge:
+                    keep[i] = True
+                    edge = f_ends[i]
+            f_starts, f_ends = f_starts[keep], f_ends[keep]
+
+        # Failed candidates that sit inside a good frame are just sync-like
+        # payload bytes; the rest are corrupted frames.
+        bad = starts[complete][~good]
+        owner = np.searchsorted(f_starts, bad, side="right") - 1
+        inside = (owner >= 0) & (bad < f_ends[np.maximum(owner, 0)]) if len(f_starts) else np.zeros(len(bad), dtype=bool)
+        self.bad_checksum += int(np.count_nonzero(~inside))
+
+        consumed = int(f_ends[-1]) if len(f_starts) else 0
+        waiting = starts[~complete]
+        waiting = waiting[waiting >= consumed]
+        if len(waiting):
+            cut = int(waiting[0])
+        elif a[-1] == 0xA5 and consumed < n:
+            cut = n - 1   # maybe the first half of a sync word
+        else:
+            cut = n
+        self.skipped_bytes += cut - int(np.sum(f_ends - f_starts))
+        self.pending = buf[cut:]
+
+        if not len(f_starts):
+            return DecodedChunk(EMPTY_SAMPLES, EMPTY_SEQ, [], [])
+
+        seq = a[f_starts + 2].astype(np.int64) | (a[f_starts + 3].astype(np.int64) << 8)
+        prev = np.concatenate(([seq[0] - 1 if self.last_seq is None else self.last_seq], seq[:-1]))
+        gaps = (seq - prev - 1) % 65536
+        self.dropped += int(gaps.sum())
+        self.last_seq = int(seq[-1])
+        self.frames += len(f_starts)
+
+        types = a[f_starts + 4]
+        is_sample = (types == FRAME_SAMPLE) & ((f_ends - f_starts) == SAMPLE_FRAME_SIZE)
+        s_starts = f_starts[is_sample]
+        samples = self._samples(buf, a, s_starts)
+
+        events, texts, blinks = [], [], []
+        view = memoryview(buf)
+        for i in np.flatnonzero(~is_sample):
+            start, end = int(f_starts[i]), int(f_ends[i])
+            payload = view[start + HEADER_SIZE:end - TRAILER_SIZE]
+            if types[i] == FRAME_EVENT and len(payload) == EVENT.size:
+                code, emg = EVENT.unpack(payload)
+                events.append((int(seq[i]), code, emg / 1000.0))
+            elif types[i] == FRAME_TEXT:
+                texts.append((int(seq[i]), bytes(payload).decode(errors="ignore")))
+            elif types[i] == FRAME_BLINK and len(payload) == BLINK.size:
+                ms, emg = BLINK.unpack(payload)
+                blinks.append((int(seq[i]), ms, emg / 1000.0))
+        return DecodedChunk(samples, seq[is_sample], events, texts, blinks)
+
+    @staticmethod
+    def _samples(buf, a, s_starts):
+        k = len(s_starts)
+        if k == 0:
+            return EMPTY_SAMPLES
+        if k == 1 or np.all(np.diff(s_starts) == SAMPLE_FRAME_SIZE):
+            # Back-to-back sample frames: a strided view straight into the chunk.
+            return np.ndarray((k, 2), dtype="<i2", buffer=buf,
+                              offset=int(s_starts[0]) + HEADER_SIZE,
+                              strides=(SAMPLE_FRAME_SIZE, 2))
+        idx = s_starts[:, None] + HEADER_SIZE + np.arange(SAMPLE_PAYLOAD)
+        return a[idx].view("<i2")
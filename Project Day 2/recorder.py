@@ -0,0 +1,258 @@
+import sys
+import mmap
+import time
+import struct
+import argparse
+
+# -----------------------------
+# Session recorder + deterministic replay
+#
+# A recording is one append-only, memory-mapped file:
+#
+#   header   "BLNKREC1", uint64 committed length, uint64 start (time.time_ns)
+#   records  uint64 t_ns (monotonic, relative to start), uint8 kind,
+#            uint32 length, payload
+#
+#   REC_SERIAL   raw bytes exactly as read() returned them from the port
+#   REC_EVENT    one decoded line ("2", "1,0.153", "EOG Calibration complete.")
+#   REC_SAMPLES  int16 pairs [eog, emg] little-endian, from binary frames
+#
+# The committed length in the header is updated after every record, so
+# a file from a crashed session is still readable up to the last record.
+# ReplaySerial plays the REC_SERIAL stream back through the same API as
+# serial.Serial, so the frontends cannot tell it from the Arduino.
+# -----------------------------
+
+MAGIC = b"BLNKREC1"
+FILE_HEADER = struct.Struct("<8sQQ")
+RECORD = struct.Struct("<QBI")
+GROW = 1 << 20
+
+REC_SERIAL = 1
+REC_EVENT = 2
+REC_SAMPLES = 3
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w+b")
+        self.size = GROW
+        self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.start_ns = time.monotonic_ns()
+        self.end = FILE_HEADER.size
+        FILE_HEADER.pack_into(self.map, 0, MAGIC, self.end, time.time_ns())
+
+    def write(self, kind, payload, t_ns=None):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        t = (time.monotonic_ns() if t_ns is None else t_ns) - self.start_ns
+        need = self.end + RECORD.size + len(payload)
+        if need > self.size:
+            self._grow(need)
+        RECORD.pack_into(self.map, self.end, max(t, 0), kind, len(payload))
+        start = self.end + RECORD.size
+        self.map[start:start + len(payload)] = payload
+        self.end = need
+        struct.pack_into("<Q", self.map, 8, self.end)
+
+    def _grow(self, need):
+        while self.size < need:
+            self.size += max(GROW, self.size // 2)
+        self.map.close()
+        self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+
+    def close(self):
+        if self.map is None:
+            return
+        self.map.flush()
+        self.map.close()
+        self.map = None
+        self.file.truncate(self.end)
+        self.file.close()
+
+
+def read_recording(path):
+    """Yield (t_ns, kind, payload) for every record; payloads are memoryviews into the map."""
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, end, _ = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a blink recording")
+    view = memoryview(data)
+    pos = FILE_HEADER.size
+    while pos + RECORD.size <= end:
+        t_ns, kind, length = RECORD.unpack_from(view, pos)
+        pos += RECORD.size
+        yield t_ns, kind, view[pos:pos + length]
+        pos += length
+
+
+# -----------------------------
+# Recording tee around a live port
+# -----------------------------
+class RecordingSerial:
+    """Wraps a serial port and records every byte read from it."""
+
+    def __init__(self, ser, recorder):
+        self.serial = ser
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self.serial, name)
+
+    def read(self, size=1):
+        data = self.serial.read(size)
+        if data:
+            self.recorder.write(REC_SERIAL, data)
+        return data
+
+    def readline(self):
+        data = self.serial.readline()
+        if data:
+            self.recorder.write(REC_SERIAL, data)
+            line = data.decode(errors="ignore").strip()
+            if line:
+                self.recorder.write(REC_EVENT, line)
+        return data
+
+    def close(self):
+        self.serial.close()
+        self.recorder.close()
+
+
+# -----------------------------
+# Replay transport
+# -----------------------------
+class ReplaySerial:
+    """serial.Serial look-alike fed from a recording.
+
+    speed=1 plays in real time, speed=4 four times faster, speed=0 as fast
+    as the reader asks. loop=True starts over at the end (soak tests).
+    The clock starts at the first read, not when the port is opened.
+    """
+
+    def __init__(self, path, speed=1.0, timeout=0.1, loop=False):
+        self.port = f"replay:{path}"
+        self.baudrate = 115200
+        self.timeout = timeout
+        self.speed = speed
+        self.loop = loop
+        self.chunks = [(t, bytes(p)) for t, kind, p in read_recording(path) if kind == REC_SERIAL]
+        self.is_open = True
+        self._rewind()
+
+    def _rewind(self):
+        self.index = 0
+        self.buffer = bytearray()   # released bytes; the unread ones start at pos
+        self.pos = 0
+        self.started = None
+
+    def _due(self, t_ns):
+        if not self.speed:
+            return 0.0
+        return self.started + t_ns / 1e9 / self.speed
+
+    def _release(self):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        while self.index < len(self.chunks) and self._due(self.chunks[self.index][0]) <= now:
+            self.buffer += self.chunks[self.index][1]
+            self.index += 1
+        if self.loop and self.index == len(self.chunks) and not self._unread():
+            self._rewind()
+
+    def _wait(self, deadline):
+        """Sleep until the next chunk is due; False if it is not due before the deadline."""
+        if self.index >= len(self.chunks):
+            return False
+        due = self._due(self.chunks[self.index][0])
+        delay = min(due, deadline) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return due <= deadline
+
+    def _unread(self):
+        return len(self.buffer) - self.pos
+
+    def _take(self, size):
+        data = bytes(self.buffer[self.pos:self.pos + size])
+        self.pos += len(data)
+        if self.pos > 65536 and self.pos * 2 > len(self.buffer):
+            del self.buffer[:self.pos]      # drop what was read, now and then
+            self.pos = 0
+        return data
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return self._unread()
+
+    @property
+    def finished(self):
+        return not self.loop and self.index >= len(self.chunks) and not self._unread()
+
+    def read(self, size=1):
+        deadline = time.monotonic() + (self.timeout or 0)
+        self._release()
+        while self._unread() < size and self._wait(deadline):
+            self._release()
+        return self._take(size)
+
+    def readline(self):
+        deadline = time.monotonic() + (self.timeout or 0)
+        self._release()
+        start = self.pos
+        end = self.buffer.find(b"\n", start)
+        while end < 0 and self._wait(deadline):
+            start = len(self.buffer)
+            self._release()
+            end = self.buffer.find(b"\n", start)
+        return self._take((end + 1 if end >= 0 else len(self.buffer)) - self.pos)
+
+    def reset_input_buffer(self):
+        self.buffer = bytearray()
+        self.pos = 0
+
+    def close(self):
+        self.is_open = False
+
+
+def summarize(path):
+    counts, first, last = {}, None, 0
+    for t_ns, kind, payload in read_recording(path):
+        counts[kind] = counts.get(kind, 0) + (len(payload) if kind == REC_SERIAL else 1)
+        first = t_ns if first is None else first
+        last = t_ns
+    names = {REC_SERIAL: "serial bytes", REC_EVENT: "events", REC_SAMPLES: "sample blocks"}
+    print(f"{path}: {(last - (first or 0)) / 1e9:.1f} s")
+    for kind, count in sorted(counts.items()):
+        print(f"  {names.get(kind, kind)}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record an Arduino session, or inspect a recording.")
+    parser.add_argument("path", help="recording file")
+    parser.add_argument("--port", help="record from this serial port until Ctrl+C")
+    parser.add_argument("--baud", type=int, default=115200)
+    args = parser.parse_args()
+
+    if not args.port:
+        summarize(args.path)
+        sys.exit(0)
+
+    import serial
+    rec = Recorder(args.path)
+    ser = RecordingSerial(serial.Serial(args.port, args.baud, timeout=0.1), rec)
+    print(f"Recording {args.port} to {args.path} (Ctrl+C to stop)")
+    try:
+        while True:
+            ser.readline()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ser.close()
+    summarize(args.path)
@@ -0,0 +1,149 @@
+# -----------------------------
+# Row/column scanning state machine shared by all keyboards
+#
+#   blink 1  advance   next row (row scan) / next key (column scan)
+#   blink 2  select    pick the row / commit the key and go back to row scan
+#   blink 3  back      previous row / previous key (allow_back=True only)
+#
+# Every position (row scan on row r, or column scan on key r,c) is a node.
+# All (mode, row, col, code) transitions are worked out once when the
+# engine is built and stored as Action records in a flat list indexed by
+# node * STRIDE + code, so step() is one list lookup and four attribute
+# stores: no branching on the mode and nothing allocated per blink.
+#
+# The frontends differ a little and say so through the options:
+#   Qt keyboards   ScanEngine(rows, first_row=1, allow_back=False)
+#                  (row 0, the digits, is never scanned)
+#   webs.py        ScanEngine(rows)
+# What a committed key does to the text (DEL on empty text, ENTER) stays
+# in the frontend; the engine only reports which key was chosen.
+# -----------------------------
+
+ADVANCE = 1
+SELECT = 2
+BACK = 3
+STRIDE = 4          # codes 0..3; anything else is ignored
+
+ROW_SCAN = 0
+COL_SCAN = 1
+
+# Action kinds
+IGNORED = 0         # code means nothing here, highlight unchanged
+MOVE = 1            # highlight moved
+EMIT = 2            # key committed, highlight back on the first row
+
+
+class Action:
+    __slots__ = ("kind", "key", "node", "mode", "row", "col", "selecting_row")
+
+    def __init__(self, kind, key, node, mode, row, col):
+        self.kind = kind
+        self.key = key
+        self.node = node            # position after the transition
+        self.mode = mode
+        self.row = row
+        self.col = col
+        self.selecting_row = mode == ROW_SCAN
+
+    def __repr__(self):
+        kind = ("IGNORED", "MOVE", "EMIT")[self.kind]
+        return f"Action({kind}, key={self.key!r}, row={self.row}, col={self.col}, selecting_row={self.selecting_row})"
+
+
+class ScanState:
+    """Where the highlight is. Updated in place by ScanEngine.step()."""
+    __slots__ = ("node", "row", "col", "selecting_row")
+
+    def __init__(self, node=0, row=0, col=0, selecting_row=True):
+        self.node = node
+        self.row = row
+        self.col = col
+        self.selecting_row = selecting_row
+
+
+class ScanEngine:
+    def __init__(self, rows, first_row=0, allow_back=True):
+        self.rows = [list(r) for r in rows]
+        self.first_row = first_row
+        self.allow_back = allow_back
+
+        # Node numbering: row-scan nodes first, then every key.
+        self.nodes = []             # (mode, row, col)
+        self.index = {}
+        for r in range(len(self.rows)):
+            self._add_node(ROW_SCAN, r, 0)
+        for r, keys in enumerate(self.rows):
+            for c in range(len(keys)):
+                self._add_node(COL_SCAN, r, c)
+
+        # Resting action per node (kind IGNORED, same node): returned for
+        # codes with no meaning so callers always get a record back.
+        self.rest = [Action(IGNORED, None, i, *self.nodes[i]) for i in range(len(self.nodes))]
+
+        self.transitions = {}       # (mode, row, col, code) -> Action
+        self.table = [None] * (len(self.nodes) * STRIDE)
+        for i, (mode, r, c) in enumerate(self.nodes):
+            for code in range(STRIDE):
+                action = self._transition(i, mode, r, c, code)
+                self.transitions[(mode, r, c, code)] = action
+                self.table[i * STRIDE + code] = action
+        self.home = self.index[(ROW_SCAN, first_row, 0)]
+
+    def _add_node(self, mode, r, c):
+        self.index[(mode, r, c)] = len(self.nodes)
+        self.nodes.append((mode, r, c))
+
+    def _move(self, mode, r, c):
+        return Action(MOVE, None, self.index[(mode, r, c)], mode, r, c)
+
+    def _transition(self, node, mode, r, c, code):
+        scanned = len(self.rows) - self.first_row
+        if mode == ROW_SCAN:
+            if code == ADVANCE:
+                return self._move(ROW_SCAN, self.first_row + (r - self.first_row + 1) % scanned, 0)
+            if code == BACK and self.allow_back:
+                return self._move(ROW_SCAN, self.first_row + (r - self.first_row - 1) % scanned, 0)
+            if code == SELECT:
+                return self._move(COL_SCAN, r, 0)
+        else:
+            width = len(self.rows[r])
+            if code == ADVANCE:
+                return self._move(COL_SCAN, r, (c + 1) % width)
+            if code == BACK and self.allow_back:
+                return self._move(COL_SCAN, r, (c - 1) % width)
+            if code == SELECT:
+                return Action(EMIT, self.rows[r][c], self.index[(ROW_SCAN, self.first_row, 0)],
+                              ROW_SCAN, self.first_row, 0)
+        return self.rest[node]
+
+    # -- hot path ------------------------------------------------------
+    def new_state(self):
+        state = ScanState()
+        self.reset(state)
+        return state
+
+    def reset(self, state):
+        self._apply(state, self.rest[self.home])
+
+    def goto(self, state, node):
+        """Put the highlight back on an earlier position (see scheduler.py)."""
+        self._apply(state, self.rest[node])
+
+    def step(self, state, code):
+        """Apply a blink code to `state` in place and return the Action taken."""
+        if 0 <= code < STRIDE:
+            action = self.table[state.node * STRIDE + code]
+        else:
+            action = self.rest[state.node]
+        state.node = action.node
+        state.row = action.row
+        state.col = action.col
+        state.selecting_row = action.selecting_row
+        return action
+
+    @staticmethod
+    def _apply(state, action):
+        state.node = action.node
+        state.row = action.row
+        state.col = action.col
+        state.selecting_row = action.selecting_row
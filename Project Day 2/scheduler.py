@@ -0,0 +1,199 @@
+import time
+from collections import deque
+
+from scan_engine import ADVANCE, SELECT, BACK
+
+# -----------------------------
+# Automatic scanning
+#
+# The highlight advances by itself every `dwell` and one code selects,
+# so a key costs two selects instead of a blink sequence per step.
+#
+# ScanScheduler keeps tick n due at  origin + n * dwell  on the monotonic
+# clock. Deadlines are absolute: a late timer or a slow Streamlit rerun
+# makes that tick late, never the ones after it, and due() reports how
+# many ticks have passed so the caller catches up to where the highlight
+# should be. Lateness of every tick (run time - deadline) is kept for
+# jitter statistics.
+#
+# AutoScan drives a ScanEngine with it. The firmware sends a code
+# BLINK_LAG_MS after the first blink of the sequence, so the code is
+# applied to the position that was highlighted when the user blinked
+# (arrival - lag), not the one showing when the line came in. When the
+# host groups raw blinks itself (blink_decoder.py) the first blink's
+# arrival is known and passed as `blinked` instead. The time
+# from a position being highlighted to that blink is the user's reaction
+# latency; with adapt=True the dwell follows it (margin x its running
+# average), and a DEL right after a key (a miss) lengthens it.
+#
+#   code 1   select (the shortest sequence; a lone blink is not sent)
+#   code 2   back to the first row
+#   code 3   passed on to the engine (back, if the frontend allows it)
+#
+#   auto = AutoScan(engine, state, ScanScheduler(600))
+#   auto.tick()                       # from a timer: advance if due
+#   action = auto.code(1, arrived_ns) # a line from the serial port
+#   action = auto.code(1, arrived_ns, blinked_ns)
+# -----------------------------
+
+BLINK_LAG_MS = 1000         # BLINK_SEQUENCE_TIMEOUT_MS in the firmware
+MIN_DWELL_MS = 20
+MAX_DWELL_MS = 5000
+
+
+class ScanScheduler:
+    def __init__(self, dwell_ms, adapt=False, margin=1.5, min_ms=MIN_DWELL_MS, max_ms=MAX_DWELL_MS,
+                 clock=time.monotonic_ns):
+        self.clock = clock
+        self.dwell_ns = int(dwell_ms * 1e6)
+        self.adapt = adapt
+        self.margin = margin
+        self.min_ns = int(min_ms * 1e6)
+        self.max_ns = int(max_ms * 1e6)
+        self.late_ns = deque(maxlen=2000)
+        self.reaction_ns = deque(maxlen=200)
+        self.reaction_avg = None
+        self.speed = 1.0            # dwell multiplier from EMG tension (emg_control.py)
+        self.ticks = 0
+        self.restart()
+
+    # -- schedule ------------------------------------------------------
+    def restart(self, now=None):
+        """Next tick a full dwell after `now` (after a code, so the first item gets its time)."""
+        self.origin = self.clock() if now is None else now
+        self.n = 0
+
+    def deadline(self, n=None):
+        return self.origin + (self.n + 1 if n is None else n) * int(self.dwell_ns * self.speed)
+
+    def due(self, now=None):
+        """Number of ticks whose deadline has passed since the last call."""
+        now = self.clock() if now is None else now
+        count = 0
+        while self.deadline() <= now:
+            self.n += 1
+            self.late_ns.append(now - self.deadline(self.n))
+            count += 1
+        self.ticks += count
+        return count
+
+    def ms_until_next(self, now=None):
+        now = self.clock() if now is None else now
+        return max(0.0, (self.deadline() - now) / 1e6)
+
+    def set_dwell(self, dwell_ns):
+        """Change the dwell from the current tick on (the ticks already run keep their times)."""
+        dwell_ns = min(max(int(dwell_ns), self.min_ns), self.max_ns)
+        self.origin = self.deadline(self.n)
+        self.n = 0
+        self.dwell_ns = dwell_ns
+
+    def set_speed(self, speed, now=None):
+        """Scale the dwell by `speed`, the time left to the next tick too; False if it barely changed.
+
+        A faster scan never gets below the dwell the user's measured reaction
+        needs (margin x its average), and waits for a measurement: a key that
+        goes by before the user can react gets picked wrong."""
+        floor = self.margin * self.reaction_avg if self.reaction_avg is not None else self.dwell_ns
+        speed = min(1.0, max(speed, floor / self.dwell_ns))
+        if abs(speed - self.speed) < 0.02:
+            return False
+        now = self.clock() if now is None else now
+        left = max(self.deadline() - now, 0)
+        step = int(self.dwell_ns * speed)
+        self.origin = now + int(left * speed / self.speed) - step
+        self.n = 0
+        self.speed = speed
+        return True
+
+    # -- adaptation ----------------------------------------------------
+    def reaction(self, latency_ns):
+        self.reaction_ns.append(latency_ns)
+        avg = self.reaction_avg
+        self.reaction_avg = latency_ns if avg is None else 0.8 * avg + 0.2 * latency_ns
+        if self.adapt:
+            self.set_dwell(self.margin * self.reaction_avg)
+
+    def missed(self):
+        if self.adapt:
+            self.set_dwell(self.dwell_ns * 1.1)
+
+    def stats(self):
+        """Tick lateness and reaction latency percentiles (ms)."""
+        late = sorted(self.late_ns)
+        reaction = sorted(self.reaction_ns)
+
+        def pct(values, q):
+            return values[min(len(values) - 1, int(len(values) * q))] / 1e6 if values else None
+
+        return {
+            "ticks": self.ticks,
+            "dwell_ms": self.dwell_ns / 1e6,
+            "late_p50_ms": pct(late, 0.5),
+            "late_p95_ms": pct(late, 0.95),
+            "late_p99_ms": pct(late, 0.99),
+            "late_max_ms": late[-1] / 1e6 if late else None,
+            "reaction_p50_ms": pct(reaction, 0.5),
+        }
+
+
+class AutoScan:
+    def __init__(self, engine, state, scheduler, lag_ms=BLINK_LAG_MS):
+        self.engine = engine
+        self.state = state
+        self.scheduler = scheduler
+        self.lag_ns = int(lag_ms * 1e6)
+        # (time highlighted, node) of recent positions, to look up what
+        # was showing when the user blinked.
+        self.history = deque(maxlen=256)
+        self.history.append((scheduler.origin, state.node))
+        self.last_key = None
+
+    def tick(self, now=None):
+        """Advance the highlight for every tick due by `now`; returns how many moved it."""
+        n = self.scheduler.due(now)
+        for i in range(n):
+            self.engine.step(self.state, ADVANCE)
+            self.history.append((self.scheduler.deadline(self.scheduler.n - n + i + 1), self.state.node))
+        return n
+
+    def skip(self, now=None):
+        """Move the highlight on at once (an EMG skip); the next tick a full dwell later."""
+        now = self.scheduler.clock() if now is None else now
+        self.tick(now)
+        self.engine.step(self.state, ADVANCE)
+        self.scheduler.restart(now)
+        self.history.append((now, self.state.node))
+
+    def position_at(self, t):
+        """(time highlighted, node) of the position showing at time t."""
+        entry = self.history[0]
+        for entry_t, node in reversed(self.history):
+            if entry_t <= t:
+                return entry_t, node
+        return entry
+
+    def code(self, code, arrived=None, blinked=None):
+        """Apply a code that arrived at `arrived` (first blink at `blinked`); returns the engine Action."""
+        arrived = self.scheduler.clock() if arrived is None else arrived
+        self.tick(arrived)
+        if blinked is None:
+            blinked = arrived - self.lag_ns
+        if code == ADVANCE:
+            entered, node = self.position_at(blinked)
+            self.engine.goto(self.state, node)
+            self.scheduler.reaction(max(0, blinked - entered))
+            action = self.engine.step(self.state, SELECT)
+            if action.key == "DEL" and self.last_key not in (None, "DEL"):
+                self.scheduler.missed()
+            if action.key is not None:
+                self.last_key = action.key
+        elif code == SELECT:
+            self.engine.reset(self.state)
+            action = self.engine.rest[self.state.node]
+        else:
+            action = self.engine.step(self.state, code if code == BACK else -1)
+        self.scheduler.restart(arrived)
+        self.history.clear()
+        self.history.append((arrived, self.state.node))
+        return action
@@ -0,0 +1,164 @@
+import os
+import json
+import tempfile
+
+# -----------------------------
+# settings.json next to this file: the one settings file every frontend
+# reads (webs2.py edits it).
+#
+# SCHEMA gives every setting its type, default and allowed values; a
+# value that is missing or does not fit reads as the default. Unknown
+# keys are kept as they are.
+#
+# SettingsStore keeps the parsed values in memory. refresh() is one
+# stat() of the file: only when its mtime/size/inode changed is it read
+# and parsed again, and it returns the names whose values changed, so a
+# frontend can call it on every timer tick or Streamlit render and apply
+# just those. save() writes a temp file in the same directory and
+# renames it over settings.json, so a reader never sees half a file.
+#
+# Values given on a command line go in `overrides` and win over the file.
+#
+#   store = default_store()
+#   store.get("scan_speed")
+#   for name in store.refresh(): ...
+#   store.save(scan_speed=450)
+# -----------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SETTINGS_FILE = os.path.join(HERE, "settings.json")
+LEGACY_FILE = os.path.join(HERE, "blink_settings.json")   # what webs2.py used to write
+
+BAUD_RATES = (300, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+# name -> (type, default, allowed values or None)
+SCHEMA = {
+    "serial_port": (str, "", None),                                 # empty: auto-detect (device_manager.py)
+    "baud_rate": (int, 115200, BAUD_RATES),
+    "poll_ms": (int, 20, range(1, 1001)),                           # Qt serial poll interval
+    "selection_mode": (str, "scan", ("scan", "binary", "ternary")), # see partition_engine.py
+    "auto_scan": (bool, False, None),                               # highlight advances by itself, code 1 selects
+    "scan_speed": (int, 600, range(20, 5001)),                      # auto scan dwell per position, ms (scheduler.py)
+    "adaptive_dwell": (bool, True, None),                           # dwell follows the measured reaction time
+    "trace": (bool, False, None),                                   # hot-path tracer on (tracer.py)
+    "emg_control": (bool, False, None),                             # jaw clench confirms/skips/speeds up (emg_control.py)
+    "emg_rest": (float, 0.02, None),                                # this user's EMG level relaxed ...
+    "emg_clench": (float, 0.2, None),                               # ... and clenching (emg_control.py calibrate)
+    "user": (str, "default", None),                                 # whose history the sessions go to
+    "history": (bool, False, None),                                 # keep sessions (and all typed text) in history.db (history_store.py)
+}
+
+
+def coerce(name, value):
+    """`value` as SCHEMA says `name` should be, or its default."""
+    kind, default, allowed = SCHEMA[name]
+    try:
+        if kind is bool and not isinstance(value, bool):
+            raise ValueError(value)
+        value = kind(value)
+    except (TypeError, ValueError):
+        return default
+    if allowed is not None and value not in allowed:
+        return default
+    return value
+
+
+class SettingsStore:
+    def __init__(self, path=SETTINGS_FILE, overrides=None, legacy=LEGACY_FILE):
+        self.path = path
+        self.overrides = {k: v for k, v in (overrides or {}).items() if v is not None}
+        self.raw = {}
+        self.values = {name: default for name, (_, default, _) in SCHEMA.items()}
+        self.stamp = ()             # never a _stamp(): the first refresh() always reads (None is a missing file)
+        self.version = 0
+        self.reads = 0
+        self.legacy = (self._read(legacy) if legacy else None) or {}
+        self.refresh()
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def refresh(self):
+        """Re-read the file if it changed; returns the names whose values changed."""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return set()
+        raw = self._read(self.path) if stamp else {}
+        if raw is None:
+            return set()            # not valid JSON (an editor mid-save): keep what we have
+        self.stamp = stamp
+        self.reads += 1
+        self.raw = raw
+        values = {}
+        for name in SCHEMA:
+            if name in raw:
+                values[name] = coerce(name, raw[name])
+            elif name in self.legacy:
+                values[name] = coerce(name, self.legacy[name])
+            else:
+                values[name] = SCHEMA[name][1]
+        changed = {name for name in SCHEMA if values[name] != self.values[name]}
+        self.values = values
+        if changed:
+            self.version += 1
+        return changed
+
+    def get(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.values[name]
+
+    __getitem__ = get
+
+    def snapshot(self):
+        return {name: self.get(name) for name in SCHEMA}
+
+    def save(self, **updates):
+        """Write `updates` into the file atomically (other keys are kept)."""
+        data = self._read(self.path) or {}
+        for name, value in updates.items():
+            data[name] = coerce(name, value) if name in SCHEMA else value
+        folder = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=".settings-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return self.refresh()
+
+
+_store = None
+
+
+def default_store():
+    """The process-wide store for settings.json."""
+    global _store
+    if _store is None:
+        _store = SettingsStore()
+    return _store
+
+
+def load_settings(path=SETTINGS_FILE):
+    """Settings as a plain dict (the file's values with defaults filled in)."""
+    store = default_store() if path == SETTINGS_FILE else SettingsStore(path)
+    store.refresh()
+    return store.snapshot()
+
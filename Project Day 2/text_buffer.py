@@ -0,0 +1,143 @@
+from collections import deque
+
+# -----------------------------
+# Typed text for long sessions
+#
+# The keyboards only ever type at the end of the text (there are no
+# cursor keys), so the cursor is the end and the buffer is a list of
+# frozen chunks plus an open tail:
+#
+#   chunks   str of exactly `chunk` characters each, never copied again
+#   tail     list of the characters after them (up to 2 x chunk)
+#
+# insert() extends the tail and freezes its first `chunk` characters
+# once it reaches 2 x chunk; delete() pops from the tail and thaws the
+# last chunk only when the tail is empty. Both are O(1) amortized: after
+# a freeze or a thaw, `chunk` keystrokes pass before the next one. Memory
+# is the text itself (one byte per character for ASCII) plus a pointer
+# per tail character.
+#
+# Every edit is (start, removed, inserted) and goes to the listeners,
+# so a frontend redraws only what changed, or just the tail it shows
+# (tail(n) copies n characters, not the text). Edits are also kept,
+# up to `undo_edits`, for undo(): one call takes back a word, i.e.
+# everything since the last edit that ended in a space or newline.
+#
+#   buf = TextBuffer()
+#   buf.subscribe(lambda start, removed, inserted: ...)
+#   buf.insert("HELLO ")
+#   buf.delete()
+#   buf.undo()
+#   buf.tail(200)       # what is on screen
+#   str(buf)            # the whole text, O(n): for saving only
+#
+#   python bench_text.py    # 1M keystrokes: per-keystroke cost, memory
+# -----------------------------
+
+CHUNK = 4096
+UNDO_EDITS = 1000
+CONTEXT_CHARS = 64          # enough text for last_word() and any n-gram context
+
+
+class TextBuffer:
+    def __init__(self, text="", chunk=CHUNK, undo_edits=UNDO_EDITS):
+        self.chunk = chunk
+        self.chunks = []
+        self.tail_chars = []
+        self.frozen = 0             # characters in chunks
+        self.edits = deque(maxlen=undo_edits)
+        self.listeners = []
+        self._insert(text)
+
+    def __len__(self):
+        return self.frozen + len(self.tail_chars)
+
+    def __str__(self):
+        return "".join(self.chunks) + "".join(self.tail_chars)
+
+    def subscribe(self, listener):
+        """listener(start, removed, inserted) after every edit."""
+        self.listeners.append(listener)
+
+    # -- reading -------------------------------------------------------
+    def tail(self, n):
+        """The last n characters (fewer if the text is shorter)."""
+        if n <= len(self.tail_chars):
+            return "".join(self.tail_chars[len(self.tail_chars) - n:]) if n > 0 else ""
+        parts = ["".join(self.tail_chars)]
+        need = n - len(self.tail_chars)
+        for chunk in reversed(self.chunks):
+            if need <= 0:
+                break
+            parts.append(chunk[-need:])
+            need -= len(chunk)
+        return "".join(reversed(parts))
+
+    def context(self):
+        """Enough of the end for the word being typed and the next-letter model."""
+        return self.tail(CONTEXT_CHARS)
+
+    # -- editing -------------------------------------------------------
+    def insert(self, text):
+        if text:
+            start = len(self)
+            self._insert(text)
+            self._edited(start, "", text)
+
+    def delete(self, n=1):
+        """Remove the last n characters; returns them."""
+        removed = self._delete(n)
+        if removed:
+            self._edited(len(self), removed, "")
+        return removed
+
+    def clear(self):
+        if len(self):
+            removed = str(self)
+            self.chunks, self.tail_chars, self.frozen = [], [], 0
+            self.edits.clear()      # not undone word by word
+            for listener in self.listeners:
+                listener(0, removed, "")
+
+    def undo(self):
+        """Take back the last word's edits; False if there is nothing to undo."""
+        if not self.edits:
+            return False
+        while True:
+            start, removed, inserted = self.edits.pop()
+            self._delete(len(inserted))
+            self._insert(removed)
+            for listener in self.listeners:
+                listener(start, inserted, removed)
+            if not self.edits or self._ends_word(self.edits[-1]):
+                return True
+
+    # -- internals -----------------------------------------------------
+    def _insert(self, text):
+        self.tail_chars.extend(text)
+        while len(self.tail_chars) >= 2 * self.chunk:
+            self.chunks.append("".join(self.tail_chars[:self.chunk]))
+            del self.tail_chars[:self.chunk]
+            self.frozen += self.chunk
+
+    def _delete(self, n):
+        removed = []
+        while n > 0 and len(self):
+            if not self.tail_chars:
+                self.tail_chars = list(self.chunks.pop())
+                self.frozen -= self.chunk
+            take = min(n, len(self.tail_chars))
+            removed.append("".join(self.tail_chars[len(self.tail_chars) - take:]))
+            del self.tail_chars[len(self.tail_chars) - take:]
+            n -= take
+        return "".join(reversed(removed))
+
+    def _edited(self, start, removed, inserted):
+        self.edits.append((start, removed, inserted))
+        for listener in self.listeners:
+            listener(start, removed, inserted)
+
+    @staticmethod
+    def _ends_word(edit):
+        inserted = edit[2]
+        return bool(inserted) and inserted[-1].isspace()
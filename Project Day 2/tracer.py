@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+
+# -----------------------------
+# Hot-path tracer
+#
+# Records individual spans (name, start, duration, thread) so one slow
+# timer tick or rerun can be found and looked at, where metrics.py only
+# has totals. Spans go into a ring buffer allocated up front: the newest
+# `capacity` spans are kept, recording one is a tuple in a fixed slot.
+#
+# The hot path uses begin()/end(), not a context manager:
+#
+#   t0 = TRACER.begin()             # 0 while tracing is off
+#   ...
+#   TRACER.end("read_serial", t0)   # does nothing for t0 == 0
+#
+# so with tracing off a span costs two calls that return at once.
+# Tracing is switched with TRACER.enabled (settings.json "trace" in
+# blink_keyboard.py, a checkbox in webs.py). dump() writes Chrome trace
+# JSON: open it at ui.perfetto.dev or chrome://tracing.
+#
+#   python tracer.py --demo trace.json      # a small made-up trace
+# -----------------------------
+
+CAPACITY = 1 << 16
+get_ident = threading.get_ident
+
+
+class Tracer:
+    def __init__(self, capacity=CAPACITY, enabled=False):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.ring = [None] * capacity   # (name, start ns, duration ns, thread id, arg)
+        self.thread_names = {}
+        self.clear()
+
+    def clear(self):
+        self.counter = itertools.count()    # next() is atomic: the reader thread records too
+        self.recorded = 0
+
+    def begin(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def end(self, name, start, arg=None):
+        if not start:
+            return
+        duration = time.perf_counter_ns() - start
+        i = next(self.counter)
+        self.recorded = i + 1
+        tid = get_ident()
+        self.ring[i % self.capacity] = (name, start, duration, tid, arg)
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+
+    def span(self, name, arg=None):
+        """Context manager version, for code that is not hot."""
+        return _Span(self, name, arg)
+
+    def events(self):
+        """Recorded spans, oldest first: (name, start_ns, duration_ns, thread id, arg)."""
+        n = self.recorded
+        count = min(n, self.capacity)
+        first = n - count
+        spans = [self.ring[k % self.capacity] for k in range(first, n)]
+        return [s for s in spans if s is not None]     # a slot another thread has not filled yet
+
+    def chrome(self):
+        """The spans as a Chrome trace ("X" complete events, microseconds)."""
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for name, start, duration, thread, arg in self.events():
+            tid = tids.setdefault(thread, len(tids) + 1)
+            event = {"name": name, "ph": "X", "ts": start / 1e3, "dur": duration / 1e3, "pid": pid, "tid": tid}
+            if arg is not None:
+                event["args"] = {"value": arg}
+            events.append(event)
+        for thread, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": self.thread_names.get(thread, str(thread))}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome(), f)
+        return path
+
+    def slowest(self, n=10):
+        return sorted(self.events(), key=lambda e: -e[2])[:n]
+
+
+class _Span:
+    def __init__(self, tracer, name, arg):
+        self.tracer = tracer
+        self.name = name
+        self.arg = arg
+
+    def __enter__(self):
+        self.start = self.tracer.begin()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.end(self.name, self.start, self.arg)
+
+
+TRACER = Tracer()
+
+
+def trace_path(prefix="trace"):
+    return time.strftime(f"{prefix}-%Y%m%d-%H%M%S.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a small made-up Chrome trace.")
+    parser.add_argument("--demo", default="trace.json")
+    args = parser.parse_args()
+
+    TRACER.enabled = True
+    for i in range(50):
+        t0 = TRACER.begin()
+        with TRACER.span("process_blink", arg=1 + i % 3):
+            time.sleep(0.001)
+        with TRACER.span("update_display"):
+            time.sleep(0.002 if i % 10 else 0.03)
+        TRACER.end("read_serial", t0)
+    print(f"{TRACER.recorded} spans -> {TRACER.dump(args.demo)}")
+    sys.exit(0)
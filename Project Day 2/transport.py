@@ -0,0 +1,190 @@
+import time
+from collections import deque
+
+from acquisition import RingReader, DEFAULT_NAME, KIND_SAMPLE
+from recorder import Recorder, RecordingSerial, ReplaySerial
+from device_manager import ReconnectingSerial
+from blink_decoder import SequenceDecoder, parse_blink_line, TIMING_FILE
+
+# -----------------------------
+# Where the frontends get their blink lines from.
+#
+#   "COM3", "/dev/ttyACM0"   -> the Arduino itself (pyserial), reopened
+#                               by itself if the cable drops (device_manager.py)
+#   "shm:" or "shm:<name>"   -> the acquisition daemon's shared-memory ring
+#   "replay:<file>[@speed]"  -> a recorder.py recording; speed 1 = real time,
+#                               4 = four times faster, 0 = as fast as possible
+#
+# record=<file> tees whatever is read into a new recording.
+#
+# Raw blink lines (firmware built with RAW_BLINKS 1) are grouped into
+# ordinary code lines by a DecodingSerial on top (blink_decoder.py), so
+# the frontends never see them; lines of the usual firmware pass through.
+# The learned blink timing is kept in `timing` (blink_timing.json, None
+# to learn per session only).
+#
+# Everything returned here looks enough like serial.Serial for the
+# frontends: in_waiting, readline(), close(), is_open.
+# -----------------------------
+
+SHM_PREFIX = "shm:"
+REPLAY_PREFIX = "replay:"
+
+
+class ShmSerial:
+    """Serial-like reader over the acquisition daemon's event ring."""
+
+    def __init__(self, name=DEFAULT_NAME, timeout=0.1):
+        self.name = name
+        self.port = SHM_PREFIX + name
+        self.timeout = timeout
+        self.reader = RingReader(name)
+        self.is_open = True
+        self.last_mono_ns = None   # daemon's arrival time of the last line returned
+        self._events = []
+
+    def _fill(self):
+        if not self._events:
+            self._events = [e for e in self.reader.poll() if e.kind != KIND_SAMPLE]
+            self._events.reverse()
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return sum(len(e.line) + 1 for e in self._events)
+
+    def readline(self):
+        # Like pyserial: wait up to `timeout` for a line, then give up.
+        deadline = time.monotonic() + (self.timeout or 0)
+        self._fill()
+        while not self._events and time.monotonic() < deadline:
+            time.sleep(0.002)
+            self._fill()
+        if not self._events:
+            return b""
+        event = self._events.pop()
+        self.last_mono_ns = event.mono_ns
+        return event.line + b"\n"
+
+    def reset_input_buffer(self):
+        self._events = []
+        self.reader.cursor = self.reader.head()
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.reader.close()
+
+
+class DecodingSerial:
+    """Groups raw blink lines into code lines; other lines pass through.
+
+    last_mono_ns is when the line was returned (a code commits on the
+    host, not when its last line arrived), last_blink_ns when the first
+    blink of its sequence arrived (None for lines passed through).
+    """
+
+    def __init__(self, serial, decoder):
+        self.serial = serial
+        self.decoder = decoder
+        self.timeout = getattr(serial, "timeout", 0.1)
+        self.last_mono_ns = None
+        self.last_blink_ns = None
+        self._ready = deque()       # (line bytes, mono ns, first blink ns)
+        self._partial = b""
+        self._emg = 0.0
+
+    def __getattr__(self, name):
+        # connected, stats(), reconnects, ... of the port underneath
+        return getattr(self.serial, name)
+
+    def _take(self, raw):
+        arrived = getattr(self.serial, "last_mono_ns", None) or time.monotonic_ns()
+        blink = parse_blink_line(raw.decode(errors="ignore").strip())
+        if blink is None:
+            self._ready.append((raw, arrived, None))
+            return
+        ms, self._emg = blink
+        self._commit(self.decoder.blink(ms, arrived))
+
+    def _commit(self, done):
+        if done:
+            code, first_ns = done
+            self._ready.append((f"{code},{self._emg:.3f}\n".encode(), time.monotonic_ns(), first_ns))
+
+    def _pump(self):
+        while self.serial.in_waiting:
+            data = self._partial + self.serial.readline()
+            if not data.endswith(b"\n"):
+                self._partial = data        # rest of the line not here yet
+                break
+            self._partial = b""
+            self._take(data)
+        self._commit(self.decoder.poll())
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return sum(len(line) for line, _, _ in self._ready)
+
+    def readline(self):
+        deadline = time.monotonic() + (self.timeout or 0)
+        self._pump()
+        while not self._ready:
+            if time.monotonic() >= deadline:
+                return b""
+            if self.decoder.pending:
+                time.sleep(0.002)           # a sequence may commit any moment
+                self._pump()
+                continue
+            data = self._partial + self.serial.readline()
+            self._partial = b""
+            if not data.endswith(b"\n"):
+                self._partial = data
+                continue
+            self._take(data)
+        line, self.last_mono_ns, self.last_blink_ns = self._ready.popleft()
+        return line
+
+    def reset_input_buffer(self):
+        self._ready.clear()
+        self._partial = b""
+        self.serial.reset_input_buffer()
+
+    def close(self):
+        if self.decoder.path and self.decoder.committed:
+            self.decoder.save()
+        self.serial.close()
+
+
+def open_replay(spec, timeout=0.1):
+    path, _, speed = spec.rpartition("@")
+    if not path:
+        path, speed = speed, "1"
+    return ReplaySerial(path, speed=float(speed), timeout=timeout)
+
+
+def open_serial(port, baud=115200, timeout=0.1, record=None, decode=True, timing=TIMING_FILE):
+    if port.startswith(SHM_PREFIX):
+        ser = ShmSerial(port[len(SHM_PREFIX):] or DEFAULT_NAME, timeout=timeout)
+    elif port.startswith(REPLAY_PREFIX):
+        ser = open_replay(port[len(REPLAY_PREFIX):], timeout=timeout)
+    else:
+        ser = ReconnectingSerial(port, baud, timeout=timeout)
+    if record:
+        ser = RecordingSerial(ser, Recorder(record))
+    if decode:
+        ser = DecodingSerial(ser, SequenceDecoder(path=timing))
+    return ser
+
+
+def set_baud(ser, baud):
+    """Change the baud rate of an open port in place; False if it has none (shm, replay)."""
+    if isinstance(ser, DecodingSerial):
+        ser = ser.serial
+    if isinstance(ser, RecordingSerial):
+        ser = ser.serial
+    if not hasattr(ser, "baudrate"):
+        return False
+    ser.baudrate = baud
+    return True
@@ -0,0 +1,222 @@
+import os
+import sys
+import tty
+import time
+import random
+import argparse
+import threading
+
+from blink_decoder import blink_line, DEBOUNCE_MS as BLINK_DEBOUNCE_MS
+
+# -----------------------------
+# Virtual Arduino on a pseudo-terminal
+#
+# Opens a pty and writes what the blink firmware would print, so the real
+# serial path (pyserial, its buffering, timeout=0.1 readline) can be
+# exercised and benchmarked without hardware:
+#
+#   python virtual_arduino.py                       # random codes, "code" lines
+#   python virtual_arduino.py --format code_emg     # "code,emg" like the combined firmware
+#   python virtual_arduino.py --format raw          # "B,millis,emg" per blink (RAW_BLINKS 1)
+#   python virtual_arduino.py --script "1 1 2 1 2"  # fixed sequence, then exit
+#   python virtual_arduino.py --interval 0.02 --count 10000 --noise 0.05   # load test
+#
+# The slave path is printed (and optionally symlinked with --link); pass it
+# to blink_keyboard.py, webs.py or acquisition.py as the port.
+# -----------------------------
+
+BANNERS = {
+    "code": "Stable Signed 4th-Order Butterworth EOG Blink Detector Ready!",
+    "code_emg": "EMG + EOG 4th-Order Butterworth Ready!",
+    "raw": "EMG + EOG 4th-Order Butterworth Ready!",
+}
+CALIBRATION = {
+    "code": "Calibration complete.",
+    "code_emg": "EOG Calibration complete.",
+    "raw": "EOG Calibration complete.",
+}
+
+
+def parse_script(text):
+    """'1 1 2' or '1@0.5 2@1.2' (code@seconds-after-previous)."""
+    steps = []
+    for token in text.replace(",", " ").split():
+        code, _, delay = token.partition("@")
+        steps.append((int(code), float(delay) if delay else None))
+    return steps
+
+
+class VirtualArduino:
+    def __init__(self, fmt="code", script=None, interval=1.5, jitter=0.2,
+                 code_weights=(0.6, 0.3, 0.1), noise=0.0, count=None, baud=115200,
+                 calibration_s=1.0, seed=None, on_emit=None, blink_gap_ms=320, blink_jitter_ms=60):
+        self.fmt = fmt
+        self.blink_gap_ms = blink_gap_ms        # "raw": time between the blinks of one code
+        self.blink_jitter_ms = blink_jitter_ms
+        self.script = list(script) if script else None
+        self.interval = interval
+        self.jitter = jitter
+        self.code_weights = code_weights
+        self.noise = noise
+        self.count = count if count is not None else (len(self.script) if self.script else None)
+        self.byte_time = 10.0 / baud if baud else 0.0   # 8N1: 10 bits per byte
+        self.calibration_s = calibration_s
+        self.rng = random.Random(seed)
+        self.on_emit = on_emit        # called with (monotonic_ns, code, line) for every code sent
+        self.emitted = []
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.link = None
+        self._stop = threading.Event()
+        self.thread = None
+        self.t0 = time.monotonic()              # millis() = 0
+
+    # -- output --------------------------------------------------------
+    def _write(self, data):
+        os.write(self.master, data)
+        if self.byte_time:
+            time.sleep(len(data) * self.byte_time)
+
+    def _corrupt(self, data, kind):
+        """Damage a line the way a flaky USB-serial link does."""
+        if kind == 0:                                    # dropped character
+            i = self.rng.randrange(len(data))
+            return data[:i] + data[i + 1:]
+        if kind == 1:                                    # stray byte
+            i = self.rng.randrange(len(data) + 1)
+            return data[:i] + bytes([self.rng.randrange(256)]) + data[i:]
+        if kind == 2:                                    # spurious text line first
+            return b"~\xff garbage\r\n" + data
+        return data.replace(b"\r\n", b"\n\r\n")          # extra empty line
+
+    def _send(self, line):
+        data = (line + "\r\n").encode()
+        if self.noise and self.rng.random() < self.noise:
+            kind = self.rng.randrange(5)
+            if kind == 4:                                # line split across two writes
+                cut = self.rng.randrange(1, len(data))
+                self._write(data[:cut])
+                time.sleep(self.rng.uniform(0.001, 0.05))
+                data = data[cut:]
+            else:
+                data = self._corrupt(data, kind)
+        self._write(data)
+
+    def _blinks(self, code, emg):
+        """code + 1 raw blink lines, as far apart as this user blinks; the last one's text."""
+        for i in range(code + 1):
+            if i:
+                gap = max(self.rng.gauss(self.blink_gap_ms, self.blink_jitter_ms), BLINK_DEBOUNCE_MS)
+                time.sleep(gap / 1e3)
+            line = blink_line(int((time.monotonic() - self.t0) * 1e3), emg)
+            self._send(line)
+        return line
+
+    def emit(self, code):
+        emg = self.rng.random() * 0.2
+        t = time.monotonic_ns()
+        if self.fmt == "raw":
+            line = self._blinks(code, emg)
+        else:
+            line = f"{code},{emg:.3f}" if self.fmt == "code_emg" else str(code)
+            self._send(line)
+        self.emitted.append((t, code))
+        if self.on_emit:
+            self.on_emit(t, code, line)
+
+    # -- schedule ------------------------------------------------------
+    def _steps(self):
+        if self.script:
+            for code, delay in self.script:
+                yield code, self.interval if delay is None else delay
+            return
+        sent = 0
+        while self.count is None or sent < self.count:
+            code = self.rng.choices((1, 2, 3), weights=self.code_weights)[0]
+            yield code, self.interval
+            sent += 1
+
+    def run(self):
+        self._send(BANNERS.get(self.fmt, BANNERS["code"]))
+        if self.calibration_s and self._stop.wait(self.calibration_s):
+            return
+        self._send(CALIBRATION.get(self.fmt, CALIBRATION["code"]))
+        next_time = time.monotonic()
+        for code, delay in self._steps():
+            spread = self.rng.gauss(0, self.jitter) if self.jitter else 0.0
+            next_time += max(delay + spread, 0.0)
+            if self._stop.wait(max(next_time - time.monotonic(), 0.0)):
+                return
+            self.emit(code)
+            if self.fmt == "raw":
+                next_time = time.monotonic()    # the pause is after the code's last blink
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def stop(self):
+        self._stop.set()
+        self.wait(1)
+
+    def make_link(self, path):
+        if os.path.islink(path):
+            os.unlink(path)
+        os.symlink(self.port, path)
+        self.link = path
+
+    def close(self):
+        self.stop()
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pretend to be the blink Arduino on a pseudo-terminal.")
+    parser.add_argument("--format", choices=["code", "code_emg", "raw"], default="code",
+                        help="EOG Filter.ino prints 'code', the combined firmware 'code,emg' (or 'B,millis,emg' per blink)")
+    parser.add_argument("--blink-gap", type=float, default=320, help="raw: mean ms between the blinks of one code")
+    parser.add_argument("--script", default=None, help="codes to send, e.g. '1 1 2' or '1@0.5 2@1.2'")
+    parser.add_argument("--interval", type=float, default=1.5, help="mean seconds between codes")
+    parser.add_argument("--jitter", type=float, default=0.2, help="std-dev of the interval, seconds")
+    parser.add_argument("--weights", default="0.6,0.3,0.1", help="probabilities of codes 1,2,3")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of lines to corrupt")
+    parser.add_argument("--count", type=int, default=None, help="stop after this many codes")
+    parser.add_argument("--baud", type=int, default=115200, help="pace writes like this baud rate (0 = no pacing)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--link", default=None, help="also create a symlink to the pty, e.g. /tmp/ttyBLINK")
+    args = parser.parse_args()
+
+    device = VirtualArduino(
+        fmt=args.format,
+        script=parse_script(args.script) if args.script else None,
+        interval=args.interval, jitter=args.jitter,
+        code_weights=tuple(float(w) for w in args.weights.split(",")),
+        noise=args.noise, count=args.count, baud=args.baud, seed=args.seed, blink_gap_ms=args.blink_gap,
+        on_emit=lambda t, code, line: print(f"sent {line}", flush=True),
+    )
+    if args.link:
+        device.make_link(args.link)
+    print(f"Virtual Arduino on {device.port}" + (f" (linked at {args.link})" if args.link else ""), flush=True)
+    try:
+        device.start()
+        while device.thread.is_alive():
+            device.wait(0.5)
+        time.sleep(0.5)   # let the reader drain the last line
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.close()
+    sys.exit(0)
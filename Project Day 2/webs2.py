@@ -1,42 +1,20 @@
 import streamlit as st
-import glob
-import platform
-import json
-import os
 
-SETTINGS_FILE = "blink_settings.json"
-
-# -----------------------------
-# Cross-platform auto serial detection
-# -----------------------------
-def find_arduino_port():
-    system = platform.system()
-    ports = []
-    if system == "Darwin":  # macOS
-        ports = glob.glob('/dev/cu.*')
-    elif system == "Linux":
-        ports = glob.glob('/dev/ttyUSB*') + glob.glob('/dev/ttyACM*')
-    elif system == "Windows":
-        import serial.tools.list_ports
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-
-    for p in ports:
-        if any(keyword in p.lower() for keyword in ["usbmodem", "usbserial", "arduino"]):
-            return p
-    return ports[0] if ports else None
+from device_manager import find_arduino_port   # cached: enumerates only when /dev changes
+from settings_store import SettingsStore, BAUD_RATES, SCHEMA
 
 # -----------------------------
 # Load / Save Settings
+# settings.json through settings_store: parsed once per change of the
+# file (a stat() per render otherwise), saved atomically. Running
+# keyboards pick up what is saved here without a restart.
 # -----------------------------
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as f:
-            return json.load(f)
-    return {}
+@st.cache_resource
+def get_store():
+    return SettingsStore()
 
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f)
+store = get_store()
+store.refresh()
 
 # -----------------------------
 # Streamlit UI
@@ -45,26 +23,51 @@ st.set_page_config(page_title="Blink Keyboard Settings", layout="wide")
 st.title("Blink Keyboard — Settings")
 
 # Load previous settings
-settings = load_settings()
-default_port = settings.get("serial_port", find_arduino_port() or "")
-default_baud = settings.get("baud_rate", 115200)
+default_port = store["serial_port"] or find_arduino_port() or ""
+default_baud = store["baud_rate"]
 
 # Serial port selection (auto-detected)
 st.write("### Serial Port")
 st.write("Automatically detected port (if available) is pre-selected.")
-ports = [default_port] if default_port else []
 user_port = st.text_input("Serial Port:", value=default_port)
 
 # Baud rate dropdown
 st.write("### Baud Rate")
-baud_options = [9600, 19200, 38400, 57600, 115200, 230400]
+baud_options = list(BAUD_RATES)
 baud = st.selectbox("Select Baud Rate:", baud_options, index=baud_options.index(default_baud))
 
+# Selection
+st.write("### Selection")
+modes = list(SCHEMA["selection_mode"][2])
+selection_mode = st.selectbox("Selection mode:", modes, index=modes.index(store["selection_mode"]),
+                              help="scan: rows, then keys. binary/ternary: each code picks half/a third of the keys.")
+auto_scan = st.checkbox("Auto scan (the highlight advances by itself, code 1 selects)", value=store["auto_scan"])
+scan_speed = st.number_input("Scan speed (dwell per position, ms):", min_value=20, max_value=5000,
+                             value=store["scan_speed"], step=50)
+adaptive_dwell = st.checkbox("Adapt the dwell to my reaction time", value=store["adaptive_dwell"])
+
+# Jaw clench (EMG)
+st.write("### Jaw clench (EMG)")
+emg_control = st.checkbox("Clench to confirm, hold to skip, tense to scan faster", value=store["emg_control"])
+emg_rest = st.number_input("EMG level relaxed:", min_value=0.0, max_value=1.0, value=store["emg_rest"],
+                           step=0.005, format="%.3f")
+emg_clench = st.number_input("EMG level clenching:", min_value=0.0, max_value=1.0, value=store["emg_clench"],
+                             step=0.005, format="%.3f", help="python emg_control.py calibrate <port> measures both")
+
+# History
+st.write("### History")
+user = st.text_input("User name:", value=store["user"], help="python history_store.py progress shows this user's progress")
+history = st.checkbox("Keep my sessions and typing tests (history.db)", value=store["history"])
+
+# Diagnostics
+st.write("### Diagnostics")
+trace = st.checkbox("Trace the hot path (written to trace-*.json when switched off again)", value=store["trace"])
+
 # Save button
 if st.button("Save Settings"):
-    settings["serial_port"] = user_port
-    settings["baud_rate"] = baud
-    save_settings(settings)
+    store.save(serial_port=user_port, baud_rate=baud, selection_mode=selection_mode, auto_scan=auto_scan,
+               scan_speed=scan_speed, adaptive_dwell=adaptive_dwell, trace=trace,
+               emg_control=emg_control, emg_rest=emg_rest, emg_clench=emg_clench, user=user, history=history)
     st.success(f"Settings saved! Serial port: {user_port}, Baud rate: {baud}")
 
 # Display current detected port info
@@ -1,7 +1,31 @@
+import os
+import sys
+import json
+import queue
+import threading
 import streamlit as st
-import serial
 import time as pytime
 import random
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Project Day 2"))
+from transport import open_serial, set_baud
+from acquisition import parse_event
+from scan_engine import ScanEngine, EMIT
+import completion
+from layout_optimizer import load_layout
+import ngram
+from partition_engine import PartitionEngine, ARITY, MODES as SELECTION_MODES, weights_for
+from settings_store import SettingsStore, BAUD_RATES
+from scheduler import ScanScheduler, AutoScan, MIN_DWELL_MS, MAX_DWELL_MS
+from emg_control import EmgControl
+from text_buffer import TextBuffer
+from history_store import HistoryStore
+import emg_control
+import metrics
+from tracer import TRACER, trace_path
+
+script_t0 = TRACER.begin()   # this run, for the trace (tracer.py)
 
 # -----------------------------
 # Page Config
@@ -13,10 +37,10 @@ st.sidebar.header("Connection / Settings")
 defaults = {
     "connected": False,
     "serial": None,
-    "current_word": "",
-    "row": 0,
-    "col": 0,
-    "selecting_row": True,
+    "buffer": None,
+    "scan": None,
+    "auto": None,
+    "emg": None,
     "scanning": False,
     "typed_box": "",
     "typing_mode": False,
@@ -24,51 +48,257 @@ defaults = {
     "typed_input": "",
     "start_time": None,
     "end_time": None,
+    "reader": None,
+    "last_serial_line": "",
+    "pending_arrivals": [],
+    "keyboard_view": None,
+    "refresh_stats": {"script": deque(maxlen=500), "fragment": deque(maxlen=500), "latency_ms": deque(maxlen=500)},
 }
 for k, v in defaults.items():
     st.session_state.setdefault(k, v)
+if st.session_state.buffer is None:
+    st.session_state.buffer = TextBuffer()   # typed text, see text_buffer.py
+SHOWN_CHARS = 2000  # end of the typed text sent to the page on a render
+
+PUSH_TICK = 0.05  # seconds between fragment checks of the reader queue
+
+# -----------------------------
+# Background serial reader (push mode)
+# One per port for the whole server: it blocks in readline() on its own
+# thread and copies every line, as it arrives, to the queue of each
+# browser session connected to the port, so nothing waits for the next
+# rerun and sessions never take each other's lines. A session's
+# Disconnect only drops its own queue; the port is closed when the last
+# session connected to it leaves.
+# -----------------------------
+SESSION_LINES = 10_000  # lines kept for a session that stopped draining (tab closed)
+
+class BlinkReader:
+    def __init__(self, port, baud, record=None):
+        self.serial = open_serial(port, baud, timeout=0.1, record=record)
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="blink-reader", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            t0 = TRACER.begin()
+            try:
+                raw = self.serial.readline()
+            except Exception as e:
+                if not self.running:
+                    break
+                self.error = e
+                pytime.sleep(0.5)
+                continue
+            line = raw.decode(errors="ignore").strip()
+            TRACER.end("readline", t0)
+            if line:
+                arrived = getattr(self.serial, "last_mono_ns", None) or pytime.monotonic_ns()
+                metrics.SERIAL_LINES.inc()
+                item = (line, arrived, getattr(self.serial, "last_blink_ns", None))
+                with self.lock:
+                    for session in self.sessions:
+                        session.put(item)
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1)
+        self.serial.close()
+
+class ReaderSession:
+    """One browser session's view of a shared BlinkReader: its own line queue."""
+    def __init__(self, reader):
+        self.reader = reader
+        self.lines = queue.Queue(SESSION_LINES)
+
+    @property
+    def serial(self):
+        return self.reader.serial
+
+    @property
+    def error(self):
+        return self.reader.error
+
+    def put(self, item):
+        try:
+            self.lines.put_nowait(item)
+        except queue.Full:
+            pass
+
+    def drain(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.lines.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def close(self):
+        release_reader(self)
+
+@st.cache_resource
+def get_readers():
+    return {"lock": threading.Lock(), "open": {}}   # (port, baud, record) -> BlinkReader
+
+def open_reader(port, baud, record=None):
+    readers = get_readers()
+    with readers["lock"]:
+        reader = readers["open"].get((port, baud, record))
+        if reader is None:
+            reader = readers["open"][port, baud, record] = BlinkReader(port, baud, record)
+        session = ReaderSession(reader)
+        with reader.lock:
+            reader.sessions.add(session)
+    return session
+
+def release_reader(session):
+    readers = get_readers()
+    reader = session.reader
+    with readers["lock"]:
+        with reader.lock:
+            reader.sessions.discard(session)
+            last = not reader.sessions
+        if last:
+            readers["open"] = {k: v for k, v in readers["open"].items() if v is not reader}
+            reader.close()
+
+# -----------------------------
+# Settings (settings.json, see settings_store.py). The sidebar starts
+# from the file, and whatever is saved to it later (webs2.py, an editor)
+# is copied into the widgets on the next render, so a running page
+# follows it. refresh() is a stat() unless the file changed.
+# -----------------------------
+@st.cache_resource
+def get_store():
+    return SettingsStore()
+
+store = get_store()
+SETTING_WIDGETS = {            # setting -> sidebar widget key
+    "serial_port": "port",
+    "baud_rate": "baud",
+    "selection_mode": "selection_mode",
+    "auto_scan": "auto_scan",
+    "scan_speed": "dwell_ms",
+    "adaptive_dwell": "adapt_dwell",
+    "emg_control": "emg_on",
+    "trace": "trace",
+}
+changed_settings = store.refresh()
+for name, key in SETTING_WIDGETS.items():
+    if key not in st.session_state or name in changed_settings:
+        st.session_state[key] = store[name]
+if not st.session_state.port:
+    st.session_state.port = "COM3"      # serial_port empty: auto-detect elsewhere, COM3 here as before
+if "baud_rate" in changed_settings and st.session_state.connected:
+    reader = st.session_state.reader
+    set_baud(reader.serial if reader else st.session_state.serial, store["baud_rate"])
 
 # -----------------------------
 # Sidebar controls
 # -----------------------------
-port = st.sidebar.text_input("Serial port (e.g. COM3 or /dev/ttyUSB0)", value="COM3")
+port = st.sidebar.text_input("Serial port (e.g. COM3, /dev/ttyUSB0, shm: or replay:<file>[@speed])", key="port")
+record_path = st.sidebar.text_input("Record session to (optional file)", value="")
+layout_path = st.sidebar.text_input("Layout file (optional, from layout_optimizer.py)", value="")
 
 # Baud dropdown
-baud_rates = [300, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
-baud = st.sidebar.selectbox("Baud rate", baud_rates, index=baud_rates.index(115200))
+baud = st.sidebar.selectbox("Baud rate", BAUD_RATES, key="baud")
 
 poll_interval = st.sidebar.slider(
     "Poll interval (s)", min_value=0.05, max_value=1.0, value=0.2, step=0.05
 )
 
 # Mode toggle
-mode = st.sidebar.radio("Mode", ["Blink Keyboard", "Typing Test"])
+mode = st.sidebar.radio("Mode", ["Blink Keyboard", "Typing Test", "Diagnostics"])
 st.session_state.typing_mode = (mode == "Typing Test")
 
+update_mode = st.sidebar.radio("Update mode", ["Push (background reader)", "Timed rerun (legacy)"],
+                               help="Legacy polls once per poll interval and reruns the whole page.")
+push_mode = update_mode.startswith("Push")
+
+selection_mode = st.sidebar.selectbox(
+    "Selection mode", SELECTION_MODES, key="selection_mode",
+    help="scan: rows, then keys. binary/ternary: each code picks half/a third of the keys (settings.json: selection_mode).")
+partition = selection_mode in ARITY
+
+auto_scan = st.sidebar.checkbox("Auto scan", key="auto_scan", disabled=partition,
+                                help="The highlight advances by itself; code 1 selects, code 2 goes back to the first row.")
+dwell_ms = st.sidebar.number_input("Dwell (ms)", min_value=MIN_DWELL_MS, max_value=MAX_DWELL_MS,
+                                   key="dwell_ms", step=50)
+adapt_dwell = st.sidebar.checkbox("Adapt dwell to reaction time", key="adapt_dwell")
+emg_on = st.sidebar.checkbox("Jaw clench (EMG) control", key="emg_on", disabled=partition,
+                             help="Clench to confirm, hold to skip rows, tense to scan faster "
+                                  "(calibrate with emg_control.py).")
+
+adaptive_mode = st.sidebar.selectbox("Adaptive key order", ngram.MODES,
+                                     help="Reorder keys by the next-letter model in ngram.json (ngram.py).")
+TRACER.enabled = st.sidebar.checkbox("Trace hot path", key="trace",
+                                     help="Record every read, blink and render (tracer.py) for a timeline view.")
+
+def disconnect():
+    if st.session_state.serial:
+        try:
+            st.session_state.serial.close()
+        except:
+            pass
+    if st.session_state.reader:
+        st.session_state.reader.close()
+    st.session_state.serial = None
+    st.session_state.reader = None
+    st.session_state.connected = False
+
 # Connect / Disconnect buttons
 if st.sidebar.button("Connect"):
+    disconnect()
     try:
-        if st.session_state.serial and st.session_state.serial.is_open:
-            st.session_state.serial.close()
-        st.session_state.serial = serial.Serial(port, baud, timeout=0.1)
+        if push_mode:
+            st.session_state.reader = open_reader(port, baud, record_path or None)
+        else:
+            st.session_state.serial = open_serial(port, baud, timeout=0.1, record=record_path or None)
         pytime.sleep(0.5)
         st.session_state.connected = True
         st.sidebar.success(f"Connected to {port} @ {baud}")
     except Exception as e:
-        st.session_state.connected = False
-        st.session_state.serial = None
+        disconnect()
         st.sidebar.error(f"Failed to connect: {e}")
 
 if st.sidebar.button("Disconnect"):
-    if st.session_state.serial:
-        try:
-            st.session_state.serial.close()
-        except:
-            pass
-    st.session_state.serial = None
-    st.session_state.connected = False
+    disconnect()
     st.sidebar.info("Disconnected")
 
+# -----------------------------
+# Metrics endpoint (metrics.py): Prometheus text at
+# http://127.0.0.1:<port>/metrics, started once per server process.
+# -----------------------------
+@st.cache_resource
+def metrics_server(port=metrics.METRICS_PORT):
+    try:
+        return metrics.serve(metrics.REGISTRY, port)
+    except OSError:
+        return None     # taken, e.g. by blink_keyboard.py
+
+metrics_server()
+
+# -----------------------------
+# Session history (history_store.py): one writer thread per server
+# process; every browser session is a session row for the user in
+# settings.json. Nothing here waits on the disk.
+# -----------------------------
+@st.cache_resource
+def get_history():
+    return HistoryStore()
+
+HISTORY = get_history() if store["history"] else None
+if HISTORY and st.session_state.get("history_user") != store["user"]:
+    if st.session_state.get("history_session"):
+        HISTORY.end_session(st.session_state.history_session)
+    st.session_state.history_session = HISTORY.start_session(store["user"], "web")
+    st.session_state.history_user = store["user"]
+    st.session_state.line_start = 0
+
 # -----------------------------
 # Typing Test Mode
 # -----------------------------
@@ -100,9 +330,53 @@ if st.session_state.typing_mode:
         correct = sum(t == y for t, y in zip(typed_words, target_words))
         accuracy = correct / max(len(target_words), 1) * 100
         st.success(f"⏱ **Time:** {duration:.1f}s | 📈 **WPM:** {wpm:.1f} | 🎯 **Accuracy:** {accuracy:.1f}%")
+        if HISTORY:
+            HISTORY.typing_test(st.session_state.history_session, store["user"], st.session_state.typing_text,
+                                typed, duration, wpm, accuracy)
 
     st.stop()  # End here if typing mode is active
 
+# -----------------------------
+# Diagnostics Mode: what metrics.py has collected in this process.
+# The reader thread keeps counting lines while this page is open.
+# -----------------------------
+def show_histogram(hist, label):
+    if not hist.count:
+        st.write(f"{label}: no samples yet")
+        return
+    p50, p95, p99 = (hist.quantile(q) * 1e3 for q in (0.5, 0.95, 0.99))
+    st.write(f"{label}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms (n={hist.count})")
+    bounds = [f"≤{b * 1e3:g} ms" for b in hist.buckets] + ["more"]
+    st.bar_chart(dict(zip(bounds, hist.counts)))
+
+if mode == "Diagnostics":
+    st.title("Diagnostics")
+    window = st.slider("Rate window (s)", min_value=5, max_value=120, value=30)
+
+    @st.fragment(run_every=1.0)
+    def diagnostics():
+        rates = metrics.REGISTRY.rates(window)
+        cpm = rates["blink_chars_total"] * 60
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Serial lines/s", f"{rates['blink_serial_lines_total']:.1f}")
+        c2.metric("Characters/min", f"{cpm:.1f}")
+        c3.metric("WPM (5 chars/word)", f"{cpm / 5:.1f}")
+        c4.metric("Parse errors", metrics.PARSE_ERRORS.total())
+        codes = {f"code {code}": n for code, n in sorted(metrics.BLINKS.values.items())}
+        if codes:
+            st.write("Blinks per code")
+            st.bar_chart(codes)
+        show_histogram(metrics.COMMIT_LATENCY, "Blink code → committed")
+        show_histogram(metrics.RENDER_TIME, "Keyboard render")
+
+    diagnostics()
+    server = metrics_server()
+    if server:
+        st.caption(f"Prometheus: http://127.0.0.1:{server.server_address[1]}/metrics")
+    else:
+        st.caption(f"Metrics endpoint not started: port {metrics.METRICS_PORT} is in use.")
+    st.stop()
+
 # -----------------------------
 # Blink Keyboard Mode
 # -----------------------------
@@ -114,16 +388,100 @@ keyboard_rows = [
     ["SPACE","DEL","ENTER"]
 ]
 
+@st.cache_data
+def get_layout(path):
+    return load_layout(path)[0]   # every row is scanned here, whatever first_row says
+
+if layout_path:
+    try:
+        keyboard_rows = get_layout(layout_path)
+    except Exception as e:
+        st.sidebar.error(f"Could not load layout: {e}")
+
+# Word predictions (if words.idx was built with completion.py) are the
+# first row, where the scan returns after every key.
+PREDICTION_SLOTS = 4
+
+@st.cache_resource
+def get_completer():
+    return completion.load_default()
+
+COMPLETER = get_completer()
+if COMPLETER:
+    keyboard_rows = [completion.slot_keys(PREDICTION_SLOTS)] + keyboard_rows
+
+def predictions():
+    if not COMPLETER:
+        return []
+    return COMPLETER.complete(completion.last_word(st.session_state.buffer.context()), PREDICTION_SLOTS)
+
+# Adaptive key order: the engine keeps the original rows as slots, the
+# keys shown on them are rearranged after every key (see ngram.py).
+@st.cache_resource
+def get_model():
+    return ngram.load_default()
+
+@st.cache_resource
+def get_model_saver():
+    # MODEL is shared by every session; one thread writes it for all of them.
+    return ngram.ModelSaver(MODEL)
+
+MODEL = get_model() if adaptive_mode != "off" or partition else None
+if adaptive_mode != "off" and MODEL is None:
+    st.sidebar.warning("No ngram.json; build it with: python ngram.py build corpus.txt")
+ADAPTIVE = None
+if MODEL and adaptive_mode != "off" and not partition:
+    ADAPTIVE = ngram.AdaptiveLayout(keyboard_rows, MODEL, 0, adaptive_mode,
+                                    pinned_rows=(0,) if COMPLETER else (), allow_back=True)
+
+def shown_rows():
+    if ADAPTIVE:
+        return ADAPTIVE.arrange(st.session_state.buffer.context())
+    return keyboard_rows
+
+def partition_weights():
+    return weights_for(SCAN.position, MODEL, st.session_state.buffer.context())
+
+if partition:
+    # The tree follows the text typed so far, so every rerun builds the
+    # same one until the next key is committed.
+    SCAN = PartitionEngine(keyboard_rows, ARITY[selection_mode])
+    SCAN.set_weights(partition_weights())
+else:
+    SCAN = ScanEngine(keyboard_rows)  # all rows scanned, code 3 goes back
+if st.session_state.scan is None or st.session_state.get("scan_rows") != (selection_mode, keyboard_rows):
+    st.session_state.scan = SCAN.new_state()
+    st.session_state.scan_rows = (selection_mode, keyboard_rows)
+
+# Auto scan: the scheduler stays in the session with the scan state and
+# is handed this rerun's engine. Codes are applied at their arrival time,
+# so the fragment's rerun rate only limits how often the highlight is
+# drawn, not which key a code selects.
+AUTO = None
+if auto_scan and not partition:
+    config = (dwell_ms, adapt_dwell, id(st.session_state.scan))
+    if st.session_state.auto is None or st.session_state.get("auto_config") != config:
+        st.session_state.auto = AutoScan(SCAN, st.session_state.scan, ScanScheduler(dwell_ms, adapt=adapt_dwell))
+        st.session_state.auto_config = config
+    AUTO = st.session_state.auto
+    AUTO.engine = SCAN
+
+# Jaw clench (emg_control.py): thresholds as calibrated in settings.json.
+EMG = None
+if emg_on and not partition:
+    config = (store["emg_rest"], store["emg_clench"])
+    if st.session_state.emg is None or st.session_state.get("emg_config") != config:
+        st.session_state.emg = EmgControl(*config)
+        st.session_state.emg_config = config
+    EMG = st.session_state.emg
+
 st.title("BlinkShift — EOG / EMG Keyboard")
 st.write("Use your Arduino EOG blink detector to navigate and select keys. Connect, Start Scanning, then blink.")
 
-st.markdown("**Typed text**")
-st.text_area("Typed Output", value=st.session_state.current_word, height=140, key="current_word")
-
 col1, col2 = st.columns(2)
 with col1:
     if st.button("▶ Start Scanning"):
-        if not st.session_state.connected or st.session_state.serial is None:
+        if not st.session_state.connected:
             st.warning("Please connect to the serial port first (sidebar).")
         else:
             st.session_state.scanning = True
@@ -131,75 +489,281 @@ with col2:
     if st.button("⏹ Stop Scanning"):
         st.session_state.scanning = False
 
-def read_serial_line():
+def read_serial_lines():
     ser = st.session_state.serial
+    lines = []
     if ser is None:
-        return None
+        return lines
+    tick = TRACER.begin()
     try:
-        if ser.in_waiting:
+        while ser.in_waiting:
+            t0 = TRACER.begin()
             raw = ser.readline().decode(errors="ignore").strip()
+            TRACER.end("readline", t0)
             if raw != "":
-                return raw
+                metrics.SERIAL_LINES.inc()
+                arrived = getattr(ser, "last_mono_ns", None) or pytime.monotonic_ns()
+                lines.append((raw, arrived, getattr(ser, "last_blink_ns", None)))
     except Exception as e:
         st.sidebar.error(f"Serial read error: {e}")
-    return None
+    TRACER.end("read_serial", tick, len(lines))
+    return lines
 
-def process_blink_code(code):
+def process_blink_code(code, arrived=None, blinked=None):
     try:
         blink = int(code)
     except:
         return
-    if blink == 1:
-        if st.session_state.selecting_row:
-            st.session_state.row = (st.session_state.row + 1) % len(keyboard_rows)
-        else:
-            st.session_state.col = (st.session_state.col + 1) % len(keyboard_rows[st.session_state.row])
-    elif blink == 2:
-        if st.session_state.selecting_row:
-            st.session_state.selecting_row = False
-            st.session_state.col = 0
-        else:
-            item = keyboard_rows[st.session_state.row][st.session_state.col]
-            if item == "SPACE":
-                st.session_state.current_word += " "
-            elif item == "DEL":
-                st.session_state.current_word = st.session_state.current_word[:-1]
-            elif item == "ENTER":
-                st.session_state.current_word += "\n"
-            else:
-                st.session_state.current_word += item
-            st.session_state.selecting_row = True
-            st.session_state.row = 0
-            st.session_state.col = 0
-    elif blink == 3:
-        if st.session_state.selecting_row:
-            st.session_state.row = (st.session_state.row - 1) % len(keyboard_rows)
+    t0 = TRACER.begin()
+    if AUTO:
+        action = AUTO.code(blink, arrived, blinked)
+    else:
+        action = SCAN.step(st.session_state.scan, blink)
+    if action.kind == EMIT:
+        buffer = st.session_state.buffer
+        typed_before = len(buffer)
+        key = action.key
+        if ADAPTIVE:
+            shown_rows()
+            key = ADAPTIVE.translate(key)
+        if MODEL and (ADAPTIVE or partition):
+            MODEL.observe(buffer.context(), key)
+            if key in ("SPACE", "ENTER"):
+                get_model_saver().request()   # keep what was learned, a word at a time
+        slot = completion.slot_index(key)
+        if slot is not None:
+            words = predictions()
+            if slot < len(words):
+                typed = completion.last_word(buffer.context())
+                buffer.insert(words[slot][len(typed):] + " ")
+        elif key == "SPACE":
+            buffer.insert(" ")
+        elif key == "DEL":
+            buffer.delete()
+        elif key == "ENTER":
+            if HISTORY:
+                start = min(st.session_state.line_start, len(buffer))
+                HISTORY.line(st.session_state.history_session, buffer.tail(len(buffer) - start))
+            buffer.insert("\n")
+            st.session_state.line_start = len(buffer)
         else:
-            st.session_state.col = (st.session_state.col - 1) % len(keyboard_rows[st.session_state.row])
+            buffer.insert(key)
+        added = len(buffer) - typed_before
+        if added > 0:
+            metrics.CHARS.inc(added)
+        if HISTORY:
+            HISTORY.key(st.session_state.history_session, key, added)
+        if arrived:
+            metrics.COMMIT_LATENCY.observe((pytime.monotonic_ns() - arrived) / 1e9)
+        if partition:
+            SCAN.set_weights(partition_weights())
+            SCAN.reset(st.session_state.scan)
+    if HISTORY:
+        HISTORY.blink(st.session_state.history_session, blink,
+                      (pytime.monotonic_ns() - arrived) / 1e6 if arrived else None)
+    TRACER.end("process_blink_code", t0, blink)
+
+def process_emg(level, arrived):
+    for action, started in EMG.update(level, arrived):
+        emg_control.apply(action, started, AUTO,
+                          lambda code, blinked: process_blink_code(code, arrived, blinked))
+    if AUTO:
+        AUTO.scheduler.set_speed(EMG.speed)
+
+def handle_lines(lines):
+    """Apply the lines; True if they (or an auto scan tick) may have changed the keyboard."""
+    changed = False
+    for line, arrived, blinked in lines:
+        kind, code, emg = metrics.count_event(parse_event(line)) or (None, None, None)
+        if code is not None:
+            process_blink_code(code, arrived, blinked)
+            st.session_state.pending_arrivals.append(arrived)
+            changed = True
+        if emg is not None and EMG:
+            process_emg(emg, arrived or pytime.monotonic_ns())
+            changed = True
+        if code is not None or emg is None:
+            st.session_state.last_serial_line = line    # not the EMG levels streaming in between
+    ticked = AUTO.tick() if AUTO else 0
+    return changed or ticked > 0
+
+# Partition selection: key colour = the code that picks its group.
+GROUP_COLORS = {1: ("#163F13", "#32CD32"), 2: ("#10243F", "#1E90FF"), 3: ("#3F2A10", "#FFA500")}
 
-placeholder = st.empty()
-with placeholder.container():
+def render_keyboard():
+    # The whole keyboard is one markdown element: a highlight change
+    # replaces a single block instead of 39 column cells.
+    t0 = TRACER.begin()
+    start = pytime.perf_counter()
+    view = build_keyboard()
+    draw_keyboard(view)
+    st.session_state.keyboard_view = view
+    # Everything drained before this render is now visible.
+    now = pytime.monotonic_ns()
+    for arrived in st.session_state.pending_arrivals:
+        st.session_state.refresh_stats["latency_ms"].append((now - arrived) / 1e6)
+    st.session_state.pending_arrivals = []
+    metrics.RENDER_TIME.observe(pytime.perf_counter() - start)
+    TRACER.end("render_keyboard", t0)
+
+def draw_keyboard(view):
+    st.markdown(view["heading"])
+    st.text_area("Typed Output", value=view["text"], height=140)
     st.write("### Virtual Keyboard")
-    for r, row_items in enumerate(keyboard_rows):
-        cols = st.columns(len(row_items))
+    if view["caption"]:
+        st.caption(view["caption"])
+    st.markdown(view["html"], unsafe_allow_html=True)
+
+def build_keyboard():
+    """What render_keyboard() draws, as strings."""
+    buffer = st.session_state.buffer
+    scan = st.session_state.scan
+    words = predictions()
+    groups = SCAN.groups(scan) if partition else None
+    html = ['<div style="font-size:18px; color:white;">']
+    for r, row_items in enumerate(shown_rows()):
+        html.append('<div style="display:flex; gap:4px; margin:4px 0;">')
         for c, key in enumerate(row_items):
-            style = "background-color:#111; color:white; font-size:18px; border-radius:6px; padding:10px; text-align:center; margin:2px;"
-            if st.session_state.selecting_row and r == st.session_state.row:
+            slot = completion.slot_index(key)
+            if slot is not None:
+                key = words[slot] if slot < len(words) else "&nbsp;"
+            style = "flex:1; background-color:#111; border-radius:6px; padding:10px; text-align:center;"
+            if partition:
+                code = groups.get((r, c))
+                if code:
+                    background, border = GROUP_COLORS[code]
+                    style = style.replace("#111", background) + f" border:2px solid {border};"
+                else:
+                    style = style.replace("#111", "#050505") + " color:#444;"
+            elif scan.selecting_row and r == scan.row:
                 style = style.replace("#111", "#222") + " border:2px solid #1E90FF;"
-            elif (not st.session_state.selecting_row) and r == st.session_state.row and c == st.session_state.col:
+            elif (not scan.selecting_row) and r == scan.row and c == scan.col:
                 style = style.replace("#111", "#163F13") + " border:2px solid #32CD32;"
-            cols[c].markdown(f'<div style="{style}">{key}</div>', unsafe_allow_html=True)
-
-if st.session_state.scanning and st.session_state.connected and st.session_state.serial:
-    serial_line = read_serial_line()
-    if serial_line:
-        st.sidebar.info(f"Serial: {serial_line}")
-        process_blink_code(serial_line)
-    st.session_state.current_word = st.session_state.current_word
-    pytime.sleep(poll_interval)
-    st.rerun()
-else:
+            html.append(f'<div style="{style}">{key}</div>')
+        html.append("</div>")
+    html.append("</div>")
+    return {
+        "heading": "**Typed text**" + (f" (last {SHOWN_CHARS} of {len(buffer)} characters)"
+                                       if len(buffer) > SHOWN_CHARS else ""),
+        "text": buffer.tail(SHOWN_CHARS),
+        "caption": ("Green: 1, blue: 2" + (", orange: 3" if ARITY[selection_mode] == 3 else " (3 goes back)")
+                    if partition else None),
+        "html": "".join(html),
+    }
+
+# -----------------------------
+# Refresh statistics: full script reruns vs fragment runs per second,
+# and blink-to-highlight latency (line arrival -> keyboard rendered).
+# With a "shm:" port the arrival time is the daemon's read timestamp.
+# -----------------------------
+def note_run(kind):
+    st.session_state.refresh_stats[kind].append(pytime.monotonic())
+
+def runs_per_second(kind, window=5.0):
+    now = pytime.monotonic()
+    return sum(1 for t in st.session_state.refresh_stats[kind] if now - t <= window) / window
+
+def current_port():
+    reader = st.session_state.reader
+    return reader.serial if reader is not None else st.session_state.serial
+
+def show_link_status():
+    # Real ports reopen themselves after a dropped cable (device_manager.py).
+    ser = current_port()
+    if ser is not None and not getattr(ser, "connected", True):
+        st.sidebar.warning(f"Serial lost, reconnecting... ({ser.stats()['down_ms'] / 1e3:.0f} s)")
+
+def show_refresh_stats():
+    with st.sidebar.expander("Refresh stats"):
+        latency = sorted(st.session_state.refresh_stats["latency_ms"])
+        st.write(f"Full reruns/s: {runs_per_second('script'):.1f}")
+        st.write(f"Fragment runs/s: {runs_per_second('fragment'):.1f}")
+        if latency:
+            p50 = latency[len(latency) // 2]
+            p95 = latency[min(len(latency) - 1, int(len(latency) * 0.95))]
+            st.write(f"Blink → highlight: p50 {p50:.0f} ms, p95 {p95:.0f} ms (n={len(latency)})")
+        ser = current_port()
+        if ser is not None and getattr(ser, "reconnects", None):
+            link = ser.stats()
+            st.write(f"Reconnects: {link['reconnects']}, p50 {link['p50_ms']:.0f} ms, max {link['max_ms']:.0f} ms")
+        if AUTO:
+            stats = AUTO.scheduler.stats()
+            if stats["ticks"]:
+                st.write(f"Auto scan: dwell {stats['dwell_ms']:.0f} ms, tick lateness p50 {stats['late_p50_ms']:.1f} ms, "
+                         f"p99 {stats['late_p99_ms']:.1f} ms")
+            if stats["reaction_p50_ms"] is not None:
+                st.write(f"Reaction time p50: {stats['reaction_p50_ms']:.0f} ms")
+        if st.button("Reset stats"):
+            for samples in st.session_state.refresh_stats.values():
+                samples.clear()
+
+def show_trace():
+    with st.sidebar.expander("Trace"):
+        st.write(f"{TRACER.recorded} spans recorded" + (" (newest kept)" if TRACER.recorded > TRACER.capacity else ""))
+        for name, start, duration, thread, arg in TRACER.slowest(5):
+            st.write(f"{name}: {duration / 1e6:.1f} ms" + (f" ({arg})" if arg is not None else ""))
+        st.download_button("Download Chrome trace", lambda: json.dumps(TRACER.chrome()), file_name=trace_path(),
+                           mime="application/json", disabled=not TRACER.recorded,
+                           help="Open at ui.perfetto.dev or chrome://tracing.")
+        if st.button("Clear trace"):
+            TRACER.clear()
+
+note_run("script")
+show_refresh_stats()
+show_trace()
+
+if push_mode:
+    # Only this fragment reruns; it drains whatever the background reader
+    # queued, the rest of the page is untouched. Streamlit can only update
+    # a session by rerunning something in it, so the fragment still runs
+    # every PUSH_TICK while scanning, and a fragment run that draws nothing
+    # clears what it drew before. When no line came in and the highlight
+    # did not move, the last keyboard is drawn again as it was instead of
+    # being rebuilt (and not counted as a render).
+    st.session_state.keyboard_view = None   # full rerun: settings or layout may have changed
+
+    @st.fragment(run_every=PUSH_TICK if st.session_state.scanning else None)
+    def keyboard_fragment():
+        note_run("fragment")
+        t0 = TRACER.begin()
+        reader = st.session_state.reader
+        changed = False
+        if st.session_state.scanning and reader is not None:
+            if reader.error:
+                st.sidebar.error(f"Serial read error: {reader.error}")
+            show_link_status()
+            changed = handle_lines(reader.drain())
+        if changed or st.session_state.keyboard_view is None:
+            render_keyboard()
+        else:
+            draw_keyboard(st.session_state.keyboard_view)
+        if st.session_state.last_serial_line:
+            st.caption(f"Serial: {st.session_state.last_serial_line}")
+        TRACER.end("fragment", t0)
+
+    keyboard_fragment()
     if not st.session_state.connected:
         st.info("Not connected. Use the sidebar to connect to the Arduino.")
     elif not st.session_state.scanning:
         st.info("Scanning is stopped. Click ▶ Start Scanning to begin reading blinks from Arduino.")
+else:
+    placeholder = st.empty()
+    with placeholder.container():
+        render_keyboard()
+
+    if st.session_state.scanning and st.session_state.connected and st.session_state.serial:
+        serial_lines = read_serial_lines()
+        show_link_status()
+        handle_lines(serial_lines)
+        if serial_lines and st.session_state.last_serial_line:
+            st.sidebar.info(f"Serial: {st.session_state.last_serial_line}")
+        TRACER.end("script", script_t0)
+        pytime.sleep(poll_interval)
+        st.rerun()
+    else:
+        if not st.session_state.connected:
+            st.info("Not connected. Use the sidebar to connect to the Arduino.")
+        elif not st.session_state.scanning:
+            st.info("Scanning is stopped. Click ▶ Start Scanning to begin reading blinks from Arduino.")
+
+TRACER.end("script", script_t0)